@@ -1,22 +1,28 @@
 import os
-from fastapi import FastAPI, Request, Response
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.responses import FileResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel, Field, field_validator, validator
 import uvicorn
 import pandas as pd
 from io import BytesIO
-from jinja2 import Template
-from xhtml2pdf import pisa
 from exceptions.location_not_found import LocationNotFoundException
 from utils.api_weather import fetch_data  # Importar la función desde el archivo auxiliar
-from pathlib import Path
+from utils.pdf_renderer import pdf_renderer, PdfRendererBusyError, PdfRenderTimeoutError
 from geopy.geocoders import Nominatim
 
 # Initialize the geocoder
 geolocator = Nominatim(user_agent="myGeocoder")
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pool de procesos para generar los PDF fuera del event loop
+    pdf_renderer.start()
+    yield
+    pdf_renderer.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -107,27 +113,26 @@ async def get_weather_pdf(request: Request, city: str):
         location = extract_location_from_city(city_data.city)
         weather_data = await fetch_data(location.latitude, location.longitude)
 
-        # Cargar la plantilla HTML desde el archivo externo
-        template_path = Path("views/pdf_template.html")
-        html_template = template_path.read_text(encoding="utf-8")
-        template = Template(html_template)
-        rendered_html = template.render(weather_data=weather_data, city=city)
-        
-        # Convertir el HTML a PDF con xhtml2pdf
-        pdf_buffer = BytesIO()
-        pisa_status = pisa.CreatePDF(rendered_html, dest=pdf_buffer)
-        if pisa_status.err:
-            return {"error": "Error al generar el PDF"}
-        pdf_buffer.seek(0)
+        # Renderizar la plantilla compilada y convertirla a PDF en el pool de procesos
+        pdf = await pdf_renderer.render("pdf_template.html", weather_data=weather_data, city=city)
         
         # Enviar el archivo PDF al cliente
         return Response(
-            pdf_buffer.getvalue(),
+            pdf,
             media_type="application/pdf",
             headers={"Content-Disposition": "attachment; filename=weather_data.pdf"}
         )
+    except PdfRendererBusyError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except PdfRenderTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         return {"error": str(e)}
 
+@app.get("/weather/pdf/stats")
+def get_weather_pdf_stats():
+    # Métricas del pool de procesos que genera los PDF
+    return pdf_renderer.stats()
+
 if __name__ == "__main__":
     uvicorn.run(app, host="127.0.0.1", port=8000)
@@ -0,0 +1,125 @@
+import asyncio
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+from xhtml2pdf import pisa
+
+# Configuración del pool de procesos que genera los PDF
+PDF_RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", 2))
+# Número máximo de PDF en cola o generándose; por encima se rechazan las peticiones (429)
+PDF_RENDER_MAX_PENDING = int(os.getenv("PDF_RENDER_MAX_PENDING", 8))
+# Segundos máximos de espera por un PDF (504 si se superan)
+PDF_RENDER_TIMEOUT = float(os.getenv("PDF_RENDER_TIMEOUT", 30))
+
+TEMPLATES_DIR = "views"
+TEMPLATES_CACHE_DIR = os.getenv("PDF_TEMPLATES_CACHE_DIR", os.path.join(tempfile.gettempdir(), "practica_weather_templates"))
+
+class PdfRenderError(Exception):
+    def __init__(self, message="Error al generar el PDF"):
+        super().__init__(message)
+
+class PdfRendererBusyError(Exception):
+    def __init__(self, message="Too many PDF documents are being generated, try again later."):
+        super().__init__(message)
+
+class PdfRenderTimeoutError(Exception):
+    def __init__(self, message="The PDF document took too long to generate."):
+        super().__init__(message)
+
+# Entorno de Jinja2 de cada proceso: las plantillas se compilan una vez y se guardan en memoria
+# y en la caché de bytecode en disco compartida por todos los procesos
+_environment: Environment | None = None
+
+def _get_environment() -> Environment:
+    global _environment
+    if _environment is None:
+        os.makedirs(TEMPLATES_CACHE_DIR, exist_ok=True)
+        _environment = Environment(
+            loader=FileSystemLoader(TEMPLATES_DIR),
+            bytecode_cache=FileSystemBytecodeCache(TEMPLATES_CACHE_DIR),
+            auto_reload=False,
+        )
+    return _environment
+
+def _render_pdf(template_name: str, context: dict) -> bytes:
+    """Renderiza la plantilla y la convierte a PDF (se ejecuta en un proceso del pool)."""
+    rendered_html = _get_environment().get_template(template_name).render(**context)
+    pdf_buffer = BytesIO()
+    pisa_status = pisa.CreatePDF(rendered_html, dest=pdf_buffer)
+    if pisa_status.err:
+        raise PdfRenderError()
+    return pdf_buffer.getvalue()
+
+class PdfRenderer:
+    """Genera PDF en un ProcessPoolExecutor para no bloquear el event loop con trabajo de CPU."""
+
+    def __init__(self, workers: int, max_pending: int, timeout: float):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executor: ProcessPoolExecutor | None = None
+        self._pending = 0
+        self.rendered = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self._total_render_time = 0.0
+        self._max_render_time = 0.0
+
+    def start(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_get_environment)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _finished(self, future, started: float):
+        # El hueco de la cola se libera cuando el proceso termina, aunque la petición ya haya expirado
+        self._pending -= 1
+        elapsed = time.perf_counter() - started
+        if future.cancelled() or future.exception() is not None:
+            self.failed += 1
+            return
+        self.rendered += 1
+        self._total_render_time += elapsed
+        self._max_render_time = max(self._max_render_time, elapsed)
+
+    async def render(self, template_name: str, **context) -> bytes:
+        """Genera el PDF de la plantilla con el contexto indicado.
+        Raises PdfRendererBusyError when max_pending documents are already queued
+        and PdfRenderTimeoutError when the document is not ready after timeout seconds.
+        """
+        if self._pending >= self.max_pending:
+            self.rejected += 1
+            raise PdfRendererBusyError()
+        self.start()
+        self._pending += 1
+        started = time.perf_counter()
+        future = asyncio.get_running_loop().run_in_executor(self._executor, _render_pdf, template_name, context)
+        future.add_done_callback(lambda f: self._finished(f, started))
+        try:
+            # shield: si la espera expira, el resultado se descarta pero el hueco se libera al terminar
+            return await asyncio.wait_for(asyncio.shield(future), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise PdfRenderTimeoutError()
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "rendered": self.rendered,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "avg_render_ms": self._total_render_time / self.rendered * 1000 if self.rendered else 0.0,
+            "max_render_ms": self._max_render_time * 1000,
+        }
+
+pdf_renderer = PdfRenderer(PDF_RENDER_WORKERS, PDF_RENDER_MAX_PENDING, PDF_RENDER_TIMEOUT)
@@ -4,14 +4,14 @@ from auth.jwt import verify_access_token
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
-    payload = verify_access_token(token)
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    payload = await verify_access_token(token)
     if not payload:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
     return payload
 
 def require_role(required_roles: list[str]):
-    def role_dependency(current_user: dict = Depends(get_current_user)):
+    async def role_dependency(current_user: dict = Depends(get_current_user)):
         if current_user.get("role") not in required_roles:
             raise HTTPException(status_code=403, detail="Insufficient permissions")
         return current_user
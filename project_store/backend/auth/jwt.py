@@ -34,9 +34,9 @@ def create_refresh_token(data: dict):
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, REFRESH_SECRET_KEY, algorithm=ALGORITHM)
 
-def verify_access_token(token: str):
+async def verify_access_token(token: str):
     try:
-        if token in revoked_tokens or is_token_revoked(token):  # Verificar si el token está revocado
+        if token in revoked_tokens or await is_token_revoked(token):  # Verificar si el token está revocado
             raise JWTError("Token has been revoked")
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         return payload
@@ -0,0 +1,100 @@
+"""Benchmark de las exportaciones de órdenes (routes/export.py): tiempo y tamaño del fichero en CSV, Excel, Parquet y Arrow IPC.
+
+Genera una base de datos SQLite temporal con --rows líneas de orden y un catálogo local sintético
+(los productos se resuelven en memoria, sin llamadas a la API externa ni a Redis).
+
+Uso (desde project_store/backend):
+    python -m benchmarks.bench_exports --rows 1000000
+    python -m benchmarks.bench_exports --rows 1000000 --formats csv parquet arrow
+"""
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+import pyarrow.parquet as pq
+from sqlalchemy import create_engine, insert
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel
+from models.order import Order
+from models.order_item import OrderItem
+from models.user import User
+import routes.export as export
+from utils.product_catalog import catalog
+
+PRODUCTS = 100
+# Filas por INSERT multi-fila al generar los datos
+SEED_BATCH_SIZE = 50000
+
+def _seed(path: str, rows: int, lines_per_order: int):
+    engine = create_engine(f"sqlite:///{path}")
+    SQLModel.metadata.create_all(engine)
+    orders = -(-rows // lines_per_order)
+    with engine.begin() as connection:
+        connection.execute(insert(User).values(id=1, username="admin1", email="admin1@example.com", hashed_password="-", role="admin"))
+        for start in range(0, orders, SEED_BATCH_SIZE):
+            connection.execute(insert(Order), [
+                {"id": order_id, "status": "paid", "user_id": 1}
+                for order_id in range(start + 1, min(start + SEED_BATCH_SIZE, orders) + 1)
+            ])
+        # Productos distintos dentro de cada orden y cantidades pseudoaleatorias para no sobrevalorar la compresión
+        lines = (
+            {"order_id": i // lines_per_order + 1, "product_id": (i // lines_per_order * 7 + i % lines_per_order) % PRODUCTS + 1,
+             "quantity": i * 2654435761 % 97 + 1}
+            for i in range(rows)
+        )
+        batch = []
+        for line in lines:
+            batch.append(line)
+            if len(batch) == SEED_BATCH_SIZE:
+                connection.execute(insert(OrderItem), batch)
+                batch = []
+        if batch:
+            connection.execute(insert(OrderItem), batch)
+    engine.dispose()
+
+def _writers(current_user: dict) -> dict:
+    return {
+        "csv": lambda path: export._write_csv(path, current_user),
+        "excel": lambda path: export._write_excel(path, None),
+        "parquet": lambda path: export._write_arrow(path, current_user, "parquet"),
+        "arrow": lambda path: export._write_arrow(path, current_user, "arrow"),
+    }
+
+async def main(rows: int, lines_per_order: int, formats: list[str]):
+    # Los módulos de la aplicación activan el log de SQL en DEBUG: se silencia para medir solo la exportación
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
+    catalog.update([
+        {"id": product_id, "title": f"Product {product_id}", "description": f"Description of product {product_id}", "price": product_id * 1.25}
+        for product_id in range(1, PRODUCTS + 1)
+    ])
+    extensions = {"csv": "csv", "excel": "xlsx", "parquet": "parquet", "arrow": "arrows"}
+    with tempfile.TemporaryDirectory() as directory:
+        database = os.path.join(directory, "bench.db")
+        start = time.perf_counter()
+        _seed(database, rows, lines_per_order)
+        print(f"{rows} order lines seeded in {time.perf_counter() - start:.1f}s")
+        # Las exportaciones abren su propia sesión con el engine del módulo: se apunta a la base de datos temporal
+        export.engine = create_async_engine(f"sqlite+aiosqlite:///{database}")
+        writers = _writers({"user_id": 1, "role": "admin"})
+        try:
+            for format in formats:
+                path = os.path.join(directory, f"orders.{extensions[format]}")
+                start = time.perf_counter()
+                await writers[format](path)
+                elapsed = time.perf_counter() - start
+                size = os.path.getsize(path) / 1024 / 1024
+                details = f"  {pq.ParquetFile(path).num_row_groups} row groups" if format == "parquet" else ""
+                print(f"{format:<8} {elapsed:>8.2f}s {size:>9.1f} MiB {rows / elapsed:>12.0f} rows/s{details}")
+                os.remove(path)
+        finally:
+            await export.engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--lines-per-order", type=int, default=10, help=f"At most {PRODUCTS}")
+    parser.add_argument("--formats", nargs="+", choices=["csv", "excel", "parquet", "arrow"], default=["csv", "excel", "parquet", "arrow"])
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.lines_per_order, args.formats))
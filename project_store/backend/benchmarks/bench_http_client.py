@@ -0,0 +1,95 @@
+"""Benchmark del cliente HTTP de productos: un httpx.AsyncClient nuevo por llamada (comportamiento anterior)
+frente al cliente compartido con keep-alive de utils/http_client.py.
+
+Levanta un servidor stub local que imita https://dummyjson.com/products/{id} en otro proceso y mide peticiones/segundo.
+Con --base-url se mide contra un servidor real (p. ej. https://dummyjson.com), donde además se ahorra el handshake TLS.
+
+Uso (desde project_store/backend):
+    python -m benchmarks.bench_http_client --requests 2000 --concurrency 10
+    python -m benchmarks.bench_http_client --requests 200 --base-url https://dummyjson.com
+"""
+import argparse
+import asyncio
+import multiprocessing
+import socket
+import time
+import httpx
+import uvicorn
+from utils.http_client import close_http_client, http_get, open_http_client
+
+async def _stub_app(scope, receive, send):
+    """Aplicación ASGI mínima que devuelve un producto para cualquier ruta."""
+    if scope["type"] != "http":
+        return
+    product_id = scope["path"].rstrip("/").rsplit("/", 1)[-1]
+    body = f'{{"id": {product_id if product_id.isdigit() else 1}, "title": "Product", "description": "Stub", "price": 9.99}}'.encode()
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": body})
+
+def _serve(port: int):
+    uvicorn.run(_stub_app, host="127.0.0.1", port=port, log_level="warning")
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def _wait_until_up(base_url: str):
+    async with httpx.AsyncClient() as client:
+        for _ in range(100):
+            try:
+                await client.get(f"{base_url}/products/1")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError("The stub server did not start")
+
+async def _run(label: str, get, base_url: str, requests: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            response = await get(f"{base_url}/products/{i % 100 + 1}")
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {requests / elapsed:>10.1f} req/s  ({elapsed:.2f}s)")
+    return requests / elapsed
+
+async def _per_call_client(url: str) -> httpx.Response:
+    # Comportamiento anterior: un cliente (y una conexión TCP nueva) por cada llamada
+    async with httpx.AsyncClient(verify=False) as client:
+        return await client.get(url)
+
+async def main(requests: int, concurrency: int, base_url: str = None):
+    server = None
+    if base_url is None:
+        port = _free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        server = multiprocessing.Process(target=_serve, args=(port,), daemon=True)
+        server.start()
+    try:
+        await _wait_until_up(base_url)
+        print(f"{requests} requests, concurrency {concurrency}, server at {base_url}")
+        before = await _run("new client per call", _per_call_client, base_url, requests, concurrency)
+        client = open_http_client()
+        # Calentamiento: abre las conexiones keep-alive antes de medir
+        await _run("shared client (warm-up)", lambda url: http_get(url, client=client), base_url, concurrency, concurrency)
+        after = await _run("shared keep-alive client", lambda url: http_get(url, client=client), base_url, requests, concurrency)
+        print(f"speed-up: x{after / before:.2f}")
+    finally:
+        await close_http_client()
+        if server is not None:
+            server.terminate()
+            server.join()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    # Por defecto la misma concurrencia que PRODUCT_FETCH_CONCURRENCY en utils/api_dummy_products.py
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--base-url", default=None, help="Real server to benchmark instead of the local stub")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.base_url))
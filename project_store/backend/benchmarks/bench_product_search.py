@@ -0,0 +1,90 @@
+"""Benchmark del índice invertido de búsqueda de productos (utils/product_search.py) sobre un catálogo sintético.
+
+Mide el tiempo de construcción, la memoria del índice (tracemalloc) y las consultas/segundo,
+comparadas con un recorrido lineal del catálogo que busca los términos como subcadena.
+
+Uso (desde project_store/backend):
+    python -m benchmarks.bench_product_search --products 100000 --queries 2000
+"""
+import argparse
+import random
+import string
+import time
+import tracemalloc
+from utils.product_search import ProductSearchIndex, tokenize
+
+def _vocabulary(size: int, rng: random.Random) -> list[str]:
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 10))))
+    return sorted(words)
+
+def _catalog(products: int, vocabulary: list[str], rng: random.Random) -> list[dict]:
+    return [
+        {
+            "id": product_id,
+            "title": " ".join(rng.choices(vocabulary, k=rng.randint(2, 6))),
+            "description": " ".join(rng.choices(vocabulary, k=rng.randint(10, 30))),
+            "price": round(rng.uniform(1, 1000), 2),
+        }
+        for product_id in range(1, products + 1)
+    ]
+
+def _queries(count: int, vocabulary: list[str], rng: random.Random) -> list[str]:
+    """Mezcla de consultas de una palabra, de un prefijo y de dos palabras."""
+    queries = []
+    for i in range(count):
+        if i % 3 == 0:
+            queries.append(rng.choice(vocabulary))
+        elif i % 3 == 1:
+            queries.append(rng.choice(vocabulary)[:3])
+        else:
+            queries.append(" ".join(rng.sample(vocabulary, 2)))
+    return queries
+
+def _linear_search(products: list[dict], q: str) -> list[int]:
+    terms = tokenize(q)
+    return [
+        product["id"] for product in products
+        if all(term in f"{product['title']} {product['description']}".lower() for term in terms)
+    ]
+
+def _qps(label: str, search, queries: list[str]) -> float:
+    start = time.perf_counter()
+    for q in queries:
+        search(q)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<20} {len(queries) / elapsed:>12.1f} queries/s  ({elapsed:.2f}s for {len(queries)} queries)")
+    return len(queries) / elapsed
+
+def main(products: int, queries: int, vocabulary_size: int, seed: int):
+    rng = random.Random(seed)
+    vocabulary = _vocabulary(vocabulary_size, rng)
+    catalog = _catalog(products, vocabulary, rng)
+    print(f"{products} products, vocabulary of {vocabulary_size} words")
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    index = ProductSearchIndex()
+    index.update(catalog)
+    index.search(vocabulary[0])  # construye el vocabulario ordenado para los prefijos
+    build = time.perf_counter() - start
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"index build          {build:>12.2f} s")
+    print(f"index memory         {memory / 1024 / 1024:>12.1f} MiB")
+
+    sample = _queries(queries, vocabulary, rng)
+    indexed = _qps("inverted index", index.search, sample)
+    # El recorrido lineal es mucho más lento: se mide con menos consultas
+    linear = _qps("linear scan", lambda q: _linear_search(catalog, q), sample[:max(queries // 100, 10)])
+    print(f"speed-up: x{indexed / linear:.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    main(args.products, args.queries, args.vocabulary, args.seed)
@@ -1,64 +1,284 @@
-from sqlmodel import Session, select, text
-from models.order import Order
+from collections import Counter
+from datetime import datetime, timezone
+from sqlalchemy import literal_column
+from sqlalchemy.dialects.postgresql import JSON, aggregate_order_by
+from sqlalchemy.orm import selectinload
+from sqlmodel import func, insert, select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+from models.order import Order, OrderBase
+from models.order_event import ORDER_CREATED, ORDER_STATUS_CHANGED, OrderEvent
+from models.order_item import OrderItem
 from models.user import User
 from crud.user import get_user_by_id
+from crud.stat import get_order_data_version, get_user_order_counts, increment_order_data_versions, increment_user_order_counts
+from utils.pagination import decode_cursor
+from utils.order_cache import invalidate_user_orders
+from utils.order_events import publish_order_events
 
-def create_order(session: Session, order: Order):
+ORDER_STATUSES = ['in progress', 'paid', 'delivered', 'cancelled']
+# Ciclo de vida: in progress -> paid -> delivered; cualquier estado puede pasar a cancelled
+ORDER_TRANSITIONS = {
+    'in progress': {'paid', 'cancelled'},
+    'paid': {'delivered', 'cancelled'},
+    'delivered': {'cancelled'},
+    'cancelled': set(),
+}
+# Filas por sentencia en las inserciones masivas (límite de parámetros por sentencia de PostgreSQL)
+BULK_INSERT_BATCH_SIZE = 1000
+
+def _validate_status(status: str):
+    if not status in ORDER_STATUSES:
+        raise ValueError("Invalid order status. Possible values are: 'in progress', 'paid', 'delivered', 'cancelled'.")
+
+def _validate_transition(from_status: str, to_status: str):
+    # Un estado de partida desconocido (datos antiguos) no admite ninguna transición: error de validación, no KeyError
+    if not to_status in ORDER_TRANSITIONS.get(from_status, ()):
+        raise ValueError(f"Invalid status transition from '{from_status}' to '{to_status}'.")
+
+async def _record_events(session: AsyncSession, events: list[dict]) -> list[dict]:
+    """Añade los eventos al registro order_event en la transacción en curso. No hace commit.
+    Returns the inserted events, to be published with publish_order_events() once committed.
+    """
+    created_at = datetime.now(timezone.utc)
+    rows = []
+    for start in range(0, len(events), BULK_INSERT_BATCH_SIZE):
+        statement = insert(OrderEvent).values([
+            {**event, "created_at": created_at} for event in events[start:start + BULK_INSERT_BATCH_SIZE]
+        ]).returning(*OrderEvent.__table__.columns)
+        rows.extend((await session.exec(statement)).all())
+    return [dict(row._mapping) for row in rows]
+
+def _created_event(order) -> dict:
+    return {"order_id": order.id, "user_id": order.user_id, "event_type": ORDER_CREATED, "from_status": None, "to_status": order.status}
+
+async def create_order(session: AsyncSession, order: Order):
+    _validate_status(order.status)
     session.add(order)
-    session.commit()
-    session.refresh(order)
+    # flush para obtener el ID de la orden antes de registrar el evento
+    await session.flush()
+    events = await _record_events(session, [_created_event(order)])
+    await increment_user_order_counts(session, {order.user_id: 1})
+    await increment_order_data_versions(session, [order.user_id])
+    await session.commit()
+    await publish_order_events(events)
+    await invalidate_user_orders([order.user_id])
+    await session.refresh(order)
     return order
 
-def get_orders(session: Session):
-    return session.exec(select(Order)).all()
+async def create_orders(session: AsyncSession, orders: list[OrderBase]) -> list[Order]:
+    """Crea muchas órdenes con INSERT ... VALUES multi-fila (por lotes) y un único commit."""
+    for order in orders:
+        _validate_status(order.status)
+    created_at = datetime.now(timezone.utc)
+    rows = []
+    for start in range(0, len(orders), BULK_INSERT_BATCH_SIZE):
+        statement = insert(Order).values([
+            {"status": order.status, "user_id": order.user_id, "created_at": created_at}
+            for order in orders[start:start + BULK_INSERT_BATCH_SIZE]
+        ]).returning(Order.id, Order.status, Order.user_id, Order.created_at)
+        rows.extend((await session.exec(statement)).all())
+    events = await _record_events(session, [_created_event(row) for row in rows])
+    await increment_user_order_counts(session, Counter(order.user_id for order in orders))
+    await increment_order_data_versions(session, [order.user_id for order in orders])
+    await session.commit()
+    await publish_order_events(events)
+    await invalidate_user_orders({order.user_id for order in orders})
+    return [Order(id=row.id, status=row.status, user_id=row.user_id, created_at=row.created_at) for row in rows]
 
-def get_order_by_id(session: Session, id: int, user_id: int):
+async def get_orders(session: AsyncSession):
+    return (await session.exec(select(Order))).all()
+
+async def get_order_by_id(session: AsyncSession, id: int, user_id: int, load_items: bool = False):
     statement = select(Order)
     if id is not None:
         statement = statement.where(Order.id == id)
     if user_id is not None:
         statement = statement.where(Order.user_id == user_id)
-    return session.exec(statement).first()
+    if load_items:
+        # Carga ansiosa de las líneas: una segunda consulta en lugar del lazy load al acceder a order.items
+        statement = statement.options(selectinload(Order.items))
+    return (await session.exec(statement)).first()
 
-def get_orders_filtered(session: Session, id: int, user_id: int, skip: int, limit: int):
-    statement = select(Order)
+def _filter_orders(statement, id: int, user_id: int, skip: int, limit: int, after: str = None):
+    """Aplica los filtros y la paginación comunes a los listados de órdenes."""
     if id is not None:
         statement = statement.where(Order.id == id)
     if user_id is not None:
         statement = statement.where(Order.user_id == user_id)
+    if after is not None:
+        # Paginación por cursor: continúa tras el último ID devuelto usando el índice de la clave primaria
+        statement = statement.where(Order.id > decode_cursor(after, ["id"])["id"])
     if skip is not None and skip >= 0:
         statement = statement.offset(skip)
     if limit is not None and limit >= 0:
         statement = statement.limit(limit)
-    return session.exec(statement.order_by(Order.id.asc())).all()
+    return statement.order_by(Order.id.asc())
+
+async def get_orders_filtered(session: AsyncSession, id: int, user_id: int, skip: int, limit: int, after: str = None, load_items: bool = False):
+    statement = _filter_orders(select(Order), id, user_id, skip, limit, after)
+    if load_items:
+        # selectinload: las líneas de todas las órdenes de la página se cargan con un único SELECT ... WHERE order_id IN (...)
+        statement = statement.options(selectinload(Order.items))
+    return (await session.exec(statement)).all()
+
+def _order_to_dict(order: Order) -> dict:
+    return {
+        "id": order.id,
+        "status": order.status,
+        "user_id": order.user_id,
+        "created_at": order.created_at,
+        "items": [{"product_id": item.product_id, "quantity": item.quantity} for item in order.items],
+    }
+
+async def _get_orders_with_items_json(session: AsyncSession, id: int, user_id: int, skip: int, limit: int, after: str = None) -> list[dict]:
+    """Variante para PostgreSQL: una única consulta que agrega las líneas de cada orden en un array JSON."""
+    items = (
+        select(func.coalesce(
+            func.json_agg(aggregate_order_by(
+                func.json_build_object("product_id", OrderItem.product_id, "quantity", OrderItem.quantity),
+                OrderItem.product_id,
+            )),
+            literal_column("'[]'::json"),
+            type_=JSON,
+        ))
+        .where(OrderItem.order_id == Order.id)
+        .scalar_subquery()
+    )
+    statement = _filter_orders(
+        select(Order.id, Order.status, Order.user_id, Order.created_at, items.label("items")),
+        id, user_id, skip, limit, after
+    )
+    return [dict(row._mapping) for row in (await session.exec(statement)).all()]
+
+async def get_orders_with_items(session: AsyncSession, id: int, user_id: int, skip: int, limit: int, after: str = None) -> list[dict]:
+    """Órdenes con sus líneas ({"product_id", "quantity"}) sin consultas N+1.
+    En PostgreSQL se resuelve con una única consulta (json_agg); en otros motores con selectinload (dos consultas).
+    """
+    if session.get_bind().dialect.name == "postgresql":
+        return await _get_orders_with_items_json(session, id, user_id, skip, limit, after)
+    orders = await get_orders_filtered(session, id, user_id, skip, limit, after, load_items=True)
+    return [_order_to_dict(order) for order in orders]
 
-def update_order(session: Session, order_id: int, order_data: dict):
-    order = session.get(Order, order_id)
+async def update_order(session: AsyncSession, order_id: int, order_data: dict):
+    # FOR UPDATE: dos cambios de estado concurrentes no pueden validar la transición sobre el mismo estado de partida
+    order = await session.get(Order, order_id, with_for_update=True)
     if not order:
         return None
-    if not order_data['status'] in ['in progress', 'paid', 'delivered', 'cancelled']:
-        raise ValueError("Invalid order status. Possible values are: 'in progress', 'paid', 'delivered', 'cancelled'.")
+    _validate_status(order_data['status'])
+    previous_status = order.status
+    if order_data['status'] != previous_status:
+        _validate_transition(previous_status, order_data['status'])
+    previous_user_id = order.user_id
     for key, value in order_data.items():
         setattr(order, key, value)
-    session.commit()
-    session.refresh(order)
+    if order.user_id != previous_user_id:
+        await increment_user_order_counts(session, {previous_user_id: -1, order.user_id: 1})
+    events = []
+    if order.status != previous_status:
+        events = await _record_events(session, [{
+            "order_id": order.id, "user_id": order.user_id, "event_type": ORDER_STATUS_CHANGED,
+            "from_status": previous_status, "to_status": order.status
+        }])
+    await increment_order_data_versions(session, [previous_user_id, order.user_id])
+    await session.commit()
+    await publish_order_events(events)
+    await invalidate_user_orders([previous_user_id, order.user_id])
+    await session.refresh(order)
     return order
 
-def delete_order(session: Session, order_id: int, user_id: int):
-    order = get_order_by_id(session, order_id, user_id)
+async def update_orders_status(session: AsyncSession, status: str, from_status: str = None, ids: list[int] = None,
+                               user_id: int = None, created_before: datetime = None) -> list[int]:
+    """Cambia el estado de todas las órdenes que cumplen los filtros y admiten la transición,
+    con un UPDATE ... RETURNING por estado de origen (como máximo tres) y sus eventos en la misma transacción.
+    Con ids el cambio es todo o nada: si alguna orden no existe o no admite la transición no se aplica ninguno.
+    Returns the IDs of the updated orders.
+    """
+    _validate_status(status)
+    if from_status is None and not ids:
+        raise ValueError("Either from_status or ids must be provided.")
+    if from_status is not None:
+        _validate_status(from_status)
+        _validate_transition(from_status, status)
+        sources = [from_status]
+    else:
+        sources = [source for source, targets in ORDER_TRANSITIONS.items() if status in targets]
+    events = []
+    for source in sources:
+        # Un UPDATE por estado de origen: así cada evento conoce su from_status sin leer antes las filas
+        statement = update(Order).where(Order.status == source).values(status=status)
+        if ids:
+            statement = statement.where(Order.id.in_(ids))
+        if user_id is not None:
+            statement = statement.where(Order.user_id == user_id)
+        if created_before is not None:
+            statement = statement.where(Order.created_at < created_before)
+        statement = statement.returning(Order.id, Order.user_id).execution_options(synchronize_session=False)
+        events.extend(
+            {"order_id": row.id, "user_id": row.user_id, "event_type": ORDER_STATUS_CHANGED, "from_status": source, "to_status": status}
+            for row in (await session.exec(statement)).all()
+        )
+    if ids:
+        rejected = sorted(set(ids) - {event["order_id"] for event in events})
+        if rejected:
+            await session.rollback()
+            raise ValueError(f"Invalid status transition to '{status}' for orders: {', '.join(map(str, rejected))}.")
+    events = await _record_events(session, events)
+    await increment_order_data_versions(session, [event["user_id"] for event in events])
+    await session.commit()
+    await publish_order_events(events)
+    await invalidate_user_orders({event["user_id"] for event in events})
+    return sorted(event["order_id"] for event in events)
+
+async def delete_order(session: AsyncSession, order_id: int, user_id: int):
+    order = await get_order_by_id(session, order_id, user_id)
     if order:
-        anonymous_user = session.exec(select(User).where(User.username == "anonymous")).first()
+        anonymous_user = (await session.exec(select(User).where(User.username == "anonymous"))).first()
         if anonymous_user:
+            previous_user_id = order.user_id
+            await increment_user_order_counts(session, {order.user_id: -1, anonymous_user.id: 1})
+            await increment_order_data_versions(session, [order.user_id, anonymous_user.id])
             order.user_id = anonymous_user.id
-            session.commit()
+            await session.commit()
+            await invalidate_user_orders([previous_user_id, anonymous_user.id])
     return order
 
-def get_order_by_user_id(session: Session, user_id: int):
-    user = get_user_by_id(session, user_id)
+async def get_order_events(session: AsyncSession, order_id: int):
+    statement = select(OrderEvent).where(OrderEvent.order_id == order_id).order_by(OrderEvent.id.asc())
+    return (await session.exec(statement)).all()
+
+async def get_order_by_user_id(session: AsyncSession, user_id: int):
+    user = await get_user_by_id(session, user_id)
     if not user:
         return []
     statement = select(Order).where(Order.user_id == user.id)
-    return session.exec(statement).all()
+    return (await session.exec(statement)).all()
+
+async def get_orders_by_users(session: AsyncSession):
+    # Se lee de la tabla de resumen en lugar de agrupar toda la tabla order
+    return await get_user_order_counts(session)
+
+async def iter_order_lines(session: AsyncSession, user_id: int = None, batch_size: int = 1000):
+    """Recorre las líneas de las órdenes (order_id, product_id, quantity) con un cursor de servidor (stream),
+    devolviendo lotes de como máximo batch_size filas para no cargar toda la tabla en memoria.
+    """
+    statement = (
+        select(OrderItem.order_id, OrderItem.product_id, OrderItem.quantity)
+        .join(Order, Order.id == OrderItem.order_id)
+    )
+    if user_id is not None:
+        statement = statement.where(Order.user_id == user_id)
+    statement = statement.order_by(OrderItem.order_id, OrderItem.product_id).execution_options(yield_per=batch_size)
+    result = await session.stream(statement)
+    async for partition in result.partitions():
+        yield partition
+
+
+async def count_order_lines(session: AsyncSession, user_id: int = None) -> int:
+    statement = select(func.count()).select_from(OrderItem).join(Order, Order.id == OrderItem.order_id)
+    if user_id is not None:
+        statement = statement.where(Order.user_id == user_id)
+    return (await session.exec(statement)).one()
 
-def get_orders_by_users(session: Session):
-    return session.exec(text('SELECT user_id, COUNT(*) as order_count FROM "order" GROUP BY user_id')).all()
\ No newline at end of file
+async def get_orders_data_version(session: AsyncSession, user_id: int = None) -> int:
+    """Versión de los datos exportables de las órdenes: cambia con cualquier escritura de órdenes o líneas (ver crud/stat.py)."""
+    return await get_order_data_version(session, user_id)
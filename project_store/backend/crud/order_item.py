@@ -1,64 +1,193 @@
-from sqlmodel import Session, select
+from sqlmodel import delete, select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+from models.order import Order
 from models.order_item import OrderItem
-from sqlmodel import func
+from crud.stat import dialect_insert, get_top_products, increment_order_data_versions, increment_product_quantities
+from utils.product_rank import product_rank
+from utils.pagination import decode_cursor
+from utils.order_cache import invalidate_user_orders
 
-def _create_order_item(session: Session, order_item: OrderItem):
-    session.add(order_item)
-    session.commit()
-    session.refresh(order_item)
-    return order_item
+async def _record_rank(quantities: dict[int, int], created_at):
+    """Actualiza el ranking por ventanas (Redis) tras confirmar la escritura."""
+    if created_at is not None:
+        await product_rank.record(quantities, created_at)
+
+def _order_item_key(order_id: int, product_id: int):
+    return (OrderItem.order_id == order_id) & (OrderItem.product_id == product_id)
 
-def create_order_item(session: Session, order_item: OrderItem):
-    existing_order_item = session.exec(select(OrderItem).where((OrderItem.order_id == order_item.order_id) & (OrderItem.product_id == order_item.product_id))).first()
-    if not existing_order_item:
-        return _create_order_item(session, order_item)
-    else:
-        existing_order_item.quantity = existing_order_item.quantity + order_item.quantity
-        session.commit()
-        session.refresh(existing_order_item)
-        return existing_order_item
+def _order_item_from_row(row) -> OrderItem:
+    return OrderItem(order_id=row.order_id, product_id=row.product_id, quantity=row.quantity)
 
-def update_order_item(session: Session, order_item: OrderItem):
-    existing_order_item = session.exec(select(OrderItem).where((OrderItem.order_id == order_item.order_id) & (OrderItem.product_id == order_item.product_id))).first()
-    if not existing_order_item:
-        return _create_order_item(session, order_item)
-    elif order_item.quantity <= 0:
-        return delete_order_item_by_order_id_and_product_id(session, existing_order_item.order_id, existing_order_item.product_id)
-    else:
-        existing_order_item.quantity = order_item.quantity
-        session.commit()
-        session.refresh(existing_order_item)
-        return existing_order_item
+async def _lock_order(session: AsyncSession, order_id: int, key_share: bool = False, user_id: int = None) -> Order | None:
+    """Bloquea la orden antes de leer o escribir sus líneas y la devuelve recargada
+    (None si no existe o, con user_id, si no pertenece al usuario: la comprobación de propiedad va en la misma consulta).
+    Todas las escrituras de líneas bloquean primero la orden, así el orden de bloqueo es siempre el mismo:
+        - key_share=False (FOR UPDATE): cambios en bloque que leen las líneas antes de escribirlas;
+          las escrituras concurrentes de líneas de la orden esperan a su commit.
+        - key_share=True (FOR KEY SHARE, el bloqueo que toma la clave foránea al insertar una línea):
+          las escrituras de una línea no se bloquean entre sí, pero esperan a los cambios en bloque.
+    SQLite no tiene bloqueos de fila: una escritura sin cambios abre la transacción con el bloqueo de escritura de la base de datos.
+    """
+    condition = Order.id == order_id
+    if user_id is not None:
+        condition = condition & (Order.user_id == user_id)
+    if session.get_bind().dialect.name == "sqlite":
+        await session.exec(update(Order).where(condition).values(id=Order.id).execution_options(synchronize_session=False))
+    statement = (
+        select(Order).where(condition)
+        .with_for_update(key_share=key_share).execution_options(populate_existing=True)
+    )
+    return (await session.exec(statement)).first()
 
-def delete_order_item_by_order_id_and_product_id(session: Session, order_id: int, product_id: int):
-    order_item = session.exec(select(OrderItem).where((OrderItem.order_id == order_id) & (OrderItem.product_id == product_id))).first()
-    if order_item:
-        session.delete(order_item)
-        session.commit()
+async def _save_order_item(session: AsyncSession, order: Order | None, order_item: OrderItem, delta: int):
+    """Actualiza el resumen de cantidades, confirma, registra el delta en el ranking por ventanas
+    e invalida los listados cacheados del propietario de la orden (bloqueada con _lock_order)."""
+    await increment_product_quantities(session, {order_item.product_id: delta})
+    if order is not None:
+        await increment_order_data_versions(session, [order.user_id])
+    await session.commit()
+    if order is not None:
+        await _record_rank({order_item.product_id: delta}, order.created_at)
+        await invalidate_user_orders([order.user_id])
     return order_item
 
-def get_order_items_by_order_id(session: Session, order_id: int):
-    return session.exec(select(OrderItem).where(OrderItem.order_id == order_id)).all()
+async def create_order_item(session: AsyncSession, order_item: OrderItem):
+    order = await _lock_order(session, order_item.order_id, key_share=True)
+    # Una única sentencia atómica: inserta la línea o suma la cantidad a la existente (sin lost updates)
+    statement = dialect_insert(session, OrderItem).values(
+        order_id=order_item.order_id, product_id=order_item.product_id, quantity=order_item.quantity
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=["order_id", "product_id"],
+        set_={"quantity": OrderItem.__table__.c.quantity + statement.excluded.quantity}
+    ).returning(OrderItem.order_id, OrderItem.product_id, OrderItem.quantity)
+    row = (await session.exec(statement)).one()
+    return await _save_order_item(session, order, _order_item_from_row(row), order_item.quantity)
+
+async def _set_order_item_quantity(session: AsyncSession, order_item: OrderItem):
+    """Fija la cantidad de una línea existente. Returns (row, previous_quantity) or (None, None) if it does not exist."""
+    key = _order_item_key(order_item.order_id, order_item.product_id)
+    if session.get_bind().dialect.name == "postgresql":
+        # UPDATE ... FROM (SELECT ... FOR UPDATE): bloquea la fila y devuelve la cantidad anterior en la misma sentencia
+        previous = select(OrderItem.order_id, OrderItem.product_id, OrderItem.quantity).where(key).with_for_update().subquery("previous")
+        statement = (
+            update(OrderItem)
+            .where((OrderItem.order_id == previous.c.order_id) & (OrderItem.product_id == previous.c.product_id))
+            .values(quantity=order_item.quantity)
+            .returning(OrderItem.order_id, OrderItem.product_id, OrderItem.quantity, previous.c.quantity.label("previous_quantity"))
+            .execution_options(synchronize_session=False)
+        )
+        row = (await session.exec(statement)).first()
+        return (row, row.previous_quantity) if row else (None, None)
+    # SQLite no permite devolver columnas del FROM en RETURNING: lectura previa (un único escritor a la vez, ver _lock_order)
+    previous_quantity = (await session.exec(select(OrderItem.quantity).where(key))).first()
+    if previous_quantity is None:
+        return None, None
+    statement = (
+        update(OrderItem).where(key).values(quantity=order_item.quantity)
+        .returning(OrderItem.order_id, OrderItem.product_id, OrderItem.quantity)
+        .execution_options(synchronize_session=False)
+    )
+    return (await session.exec(statement)).first(), previous_quantity
 
-def get_order_items_by_product_id(session: Session, product_id: int):
-    return session.exec(select(OrderItem).where(OrderItem.product_id == product_id)).all()
+async def update_order_item(session: AsyncSession, order_item: OrderItem):
+    if order_item.quantity <= 0:
+        return await delete_order_item_by_order_id_and_product_id(session, order_item.order_id, order_item.product_id)
+    order = await _lock_order(session, order_item.order_id, key_share=True)
+    while True:
+        row, previous_quantity = await _set_order_item_quantity(session, order_item)
+        if row is not None:
+            return await _save_order_item(session, order, _order_item_from_row(row), order_item.quantity - previous_quantity)
+        # La línea no existe: se inserta; si otra petición la ha creado entretanto se vuelve a actualizar
+        statement = dialect_insert(session, OrderItem).values(
+            order_id=order_item.order_id, product_id=order_item.product_id, quantity=order_item.quantity
+        ).on_conflict_do_nothing(index_elements=["order_id", "product_id"]).returning(
+            OrderItem.order_id, OrderItem.product_id, OrderItem.quantity
+        )
+        row = (await session.exec(statement)).first()
+        if row is not None:
+            return await _save_order_item(session, order, _order_item_from_row(row), order_item.quantity)
 
-def get_order_item_by_order_id_and_product_id(session: Session, order_id: int, product_id: int):
-    return session.exec(select(OrderItem).where((OrderItem.order_id == order_id) & (OrderItem.product_id == product_id))).first()
+async def delete_order_item_by_order_id_and_product_id(session: AsyncSession, order_id: int, product_id: int):
+    order = await _lock_order(session, order_id, key_share=True)
+    # DELETE ... RETURNING: la cantidad borrada se descuenta una sola vez aunque haya borrados concurrentes
+    statement = (
+        delete(OrderItem).where(_order_item_key(order_id, product_id))
+        .returning(OrderItem.order_id, OrderItem.product_id, OrderItem.quantity)
+        .execution_options(synchronize_session=False)
+    )
+    row = (await session.exec(statement)).first()
+    if row is None:
+        await session.rollback()
+        return None
+    return await _save_order_item(session, order, _order_item_from_row(row), -row.quantity)
 
-def products_ranking(session: Session):
-    result = session.exec(
-        select(
-            OrderItem.product_id,
-            func.sum(OrderItem.quantity).label("total_quantity")
+async def set_order_item_quantities(session: AsyncSession, order_id: int, quantities: dict, user_id: int = None):
+    """Fija en bloque las cantidades de las líneas de una orden ({product_id: quantity}, 0 elimina la línea)
+    en una única transacción: bloqueo de la orden (con la comprobación de propiedad si se indica user_id),
+    lectura de las cantidades actuales, un upsert multi-fila, un DELETE y un commit.
+    Returns the upserted order items, or None if the order does not exist or does not belong to the user.
+    """
+    # Con la orden bloqueada ninguna otra petición puede insertar, modificar ni borrar sus líneas hasta el commit:
+    # las cantidades leídas siguen siendo las actuales cuando se calculan los deltas del resumen y del ranking
+    order = await _lock_order(session, order_id, user_id=user_id)
+    if order is None or not quantities:
+        await session.rollback()
+        return None if order is None else []
+    previous = dict((await session.exec(
+        select(OrderItem.product_id, OrderItem.quantity)
+        .where((OrderItem.order_id == order.id) & OrderItem.product_id.in_(list(quantities)))
+    )).all())
+    upserts = {product_id: quantity for product_id, quantity in quantities.items() if quantity > 0}
+    removals = [product_id for product_id, quantity in quantities.items() if quantity <= 0 and product_id in previous]
+    rows = []
+    if upserts:
+        statement = dialect_insert(session, OrderItem).values([
+            {"order_id": order.id, "product_id": product_id, "quantity": quantity}
+            for product_id, quantity in upserts.items()
+        ])
+        statement = statement.on_conflict_do_update(
+            index_elements=["order_id", "product_id"],
+            set_={"quantity": statement.excluded.quantity}
+        ).returning(OrderItem.order_id, OrderItem.product_id, OrderItem.quantity)
+        rows = (await session.exec(statement)).all()
+    if removals:
+        await session.exec(
+            delete(OrderItem)
+            .where((OrderItem.order_id == order.id) & OrderItem.product_id.in_(removals))
+            .execution_options(synchronize_session=False)
         )
-        .group_by(OrderItem.product_id)
-        .order_by(func.sum(OrderItem.quantity).desc())
-        .limit(10)
-    ).all()
+    deltas = {product_id: quantity - previous.get(product_id, 0) for product_id, quantity in upserts.items()}
+    deltas.update({product_id: -previous[product_id] for product_id in removals})
+    await increment_product_quantities(session, deltas)
+    await increment_order_data_versions(session, [order.user_id])
+    await session.commit()
+    await _record_rank(deltas, order.created_at)
+    await invalidate_user_orders([order.user_id])
+    return [_order_item_from_row(row) for row in rows]
+
+async def get_order_items_by_order_id(session: AsyncSession, order_id: int, limit: int = None, after: str = None):
+    statement = select(OrderItem).where(OrderItem.order_id == order_id)
+    if after is not None:
+        # Paginación por cursor sobre la clave primaria (order_id, product_id)
+        statement = statement.where(OrderItem.product_id > decode_cursor(after, ["product_id"])["product_id"])
+    if limit is not None and limit >= 0:
+        statement = statement.limit(limit)
+    return (await session.exec(statement.order_by(OrderItem.product_id.asc()))).all()
+
+async def get_order_item_by_order_id_and_product_id(session: AsyncSession, order_id: int, product_id: int):
+    return (await session.exec(select(OrderItem).where((OrderItem.order_id == order_id) & (OrderItem.product_id == product_id)))).first()
+
+async def products_ranking_window(session: AsyncSession, k: int = 10, window: str = "all"):
+    """Top K de productos en la ventana indicada.
+    The all-time ranking is read from the summary table (ProductQuantityStat), which is updated in the same
+    transaction as every write; the time windows are served from the ranking shared in Redis.
+    """
+    if window != "all":
+        return await product_rank.top(k, window)
+    result = await get_top_products(session, limit=k)
     # Add rank position to each result
-    ranked_result = [
-        {"rank": idx + 1, "product_id": row[0], "total_quantity": row[1]}
+    return [
+        {"rank": idx + 1, "product_id": row.product_id, "total_quantity": row.total_quantity}
         for idx, row in enumerate(result)
-    ]
-    return ranked_result
\ No newline at end of file
+    ]
\ No newline at end of file
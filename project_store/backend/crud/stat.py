@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy import text
+from sqlmodel import delete, func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from models.order import Order
+from models.order_item import OrderItem
+from models.stat import OrderDataVersion, ProductQuantityStat, UserOrderStat
+from utils.product_rank import RANK_WINDOWS, product_rank
+
+def dialect_insert(session: AsyncSession, model):
+    """INSERT del dialecto de la base de datos (PostgreSQL o SQLite) para poder usar ON CONFLICT."""
+    if session.get_bind().dialect.name == "sqlite":
+        return sqlite.insert(model)
+    return postgresql.insert(model)
+
+async def _increment(session: AsyncSession, model, key: str, value: str, deltas: dict):
+    """Suma los deltas {key: delta} a la columna value con un único INSERT ... ON CONFLICT DO UPDATE."""
+    deltas = {k: delta for k, delta in deltas.items() if k is not None and delta != 0}
+    if not deltas:
+        return
+    # Filas en orden de clave: dos transacciones que actualizan las mismas filas las bloquean en el mismo orden
+    statement = dialect_insert(session, model).values([{key: k, value: delta} for k, delta in sorted(deltas.items())])
+    statement = statement.on_conflict_do_update(
+        index_elements=[key],
+        set_={value: getattr(model.__table__.c, value) + statement.excluded[value]}
+    )
+    await session.exec(statement)
+
+async def increment_user_order_counts(session: AsyncSession, deltas: dict):
+    """Actualiza el número de órdenes por usuario ({user_id: delta}). No hace commit."""
+    await _increment(session, UserOrderStat, "user_id", "order_count", deltas)
+
+async def increment_product_quantities(session: AsyncSession, deltas: dict):
+    """Actualiza la cantidad total pedida por producto ({product_id: delta}). No hace commit."""
+    await _increment(session, ProductQuantityStat, "product_id", "total_quantity", deltas)
+
+async def increment_order_data_versions(session: AsyncSession, user_ids):
+    """Incrementa la versión de los datos de las órdenes de los usuarios. No hace commit.
+    Llamar en la misma transacción que cualquier escritura de órdenes o líneas de orden.
+    """
+    await _increment(session, OrderDataVersion, "user_id", "version", {user_id: 1 for user_id in set(user_ids)})
+
+async def get_order_data_version(session: AsyncSession, user_id: int = None) -> int:
+    """Versión de los datos de las órdenes de un usuario, o de todas las órdenes si user_id es None.
+    La versión global es la suma de las de todos los usuarios (crece con cualquier escritura sin una fila global compartida).
+    """
+    if user_id is None:
+        statement = select(func.coalesce(func.sum(OrderDataVersion.version), 0))
+    else:
+        statement = select(func.coalesce(func.max(OrderDataVersion.version), 0)).where(OrderDataVersion.user_id == user_id)
+    return (await session.exec(statement)).one()
+
+async def get_user_order_counts(session: AsyncSession):
+    statement = select(UserOrderStat).where(UserOrderStat.order_count > 0).order_by(UserOrderStat.user_id)
+    return (await session.exec(statement)).all()
+
+async def get_top_products(session: AsyncSession, limit: int = 10):
+    statement = (
+        select(ProductQuantityStat)
+        .where(ProductQuantityStat.total_quantity > 0)
+        .order_by(ProductQuantityStat.total_quantity.desc(), ProductQuantityStat.product_id)
+        .limit(limit)
+    )
+    return (await session.exec(statement)).all()
+
+async def rebuild_stats(session: AsyncSession):
+    """Recalcula las tablas de resumen desde cero (tras una carga masiva o al crearlas sobre datos existentes)."""
+    if session.get_bind().dialect.name == "postgresql":
+        # Las escrituras concurrentes esperan al recálculo: sus incrementos se aplican sobre los totales ya recalculados
+        await session.exec(text("LOCK TABLE userorderstat, productquantitystat IN EXCLUSIVE MODE"))
+    await session.exec(delete(UserOrderStat))
+    await session.exec(delete(ProductQuantityStat))
+    user_counts = (await session.exec(select(Order.user_id, func.count()).group_by(Order.user_id))).all()
+    product_quantities = (await session.exec(
+        select(OrderItem.product_id, func.sum(OrderItem.quantity)).group_by(OrderItem.product_id)
+    )).all()
+    session.add_all([UserOrderStat(user_id=user_id, order_count=count) for user_id, count in user_counts])
+    session.add_all([ProductQuantityStat(product_id=product_id, total_quantity=total) for product_id, total in product_quantities])
+    await session.commit()
+
+async def backfill_stats(session: AsyncSession) -> bool:
+    """Rellena las tablas de resumen si están vacías pero ya hay órdenes o líneas (tablas recién creadas sobre una base de datos existente).
+    Returns True when the stats were rebuilt.
+    """
+    async def exists(column) -> bool:
+        return (await session.exec(select(column).limit(1))).first() is not None
+
+    if (await exists(Order.id) and not await exists(UserOrderStat.user_id)) or \
+            (await exists(OrderItem.order_id) and not await exists(ProductQuantityStat.product_id)):
+        await rebuild_stats(session)
+        return True
+    return False
+
+async def load_product_rank(session: AsyncSession):
+    """Reconstruye el ranking por ventanas (Redis) con las líneas de las órdenes recientes."""
+    since = datetime.now(timezone.utc) - timedelta(seconds=max(RANK_WINDOWS.values()))
+    recent = (await session.exec(
+        select(OrderItem.product_id, Order.created_at, OrderItem.quantity)
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(Order.created_at >= since)
+    )).all()
+    await product_rank.load(recent)
@@ -1,30 +1,32 @@
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from models.user import User
+from utils.pagination import decode_cursor
 
-def create_user(session: Session, user: User):
-    existing_user = session.exec(select(User).where(User.email == user.email)).first()
+async def create_user(session: AsyncSession, user: User):
+    existing_user = (await session.exec(select(User).where(User.email == user.email))).first()
     if existing_user:
         raise ValueError(f"An user with email '{user.email}' already exists.")
     session.add(user)
-    session.commit()
-    session.refresh(user)
+    await session.commit()
+    await session.refresh(user)
     return user
 
-def get_users(session: Session):
-    return session.exec(select(User).where(User.username != "anonymous")).all()
+async def get_users(session: AsyncSession):
+    return (await session.exec(select(User).where(User.username != "anonymous"))).all()
 
-def get_user_by_id(session: Session, user_id: int):
-    return session.exec(select(User).where((User.id == user_id) & (User.username != "anonymous"))).first()
+async def get_user_by_id(session: AsyncSession, user_id: int):
+    return (await session.exec(select(User).where((User.id == user_id) & (User.username != "anonymous")))).first()
 
-def get_user_by_username(session: Session, username: str):
+async def get_user_by_username(session: AsyncSession, username: str):
     statement = select(User).where((User.username == username) & (User.username != "anonymous"))
-    return session.exec(statement).first()
+    return (await session.exec(statement)).first()
 
-def get_user_by_email(session: Session, email: str):
+async def get_user_by_email(session: AsyncSession, email: str):
     statement = select(User).where((User.email == email) & (User.username != "anonymous"))
-    return session.exec(statement).first()
+    return (await session.exec(statement)).first()
 
-def get_users_filtered(session: Session, id: int, username: str, email: str, skip: int, limit: int):
+async def get_users_filtered(session: AsyncSession, id: int, username: str, email: str, skip: int, limit: int, after: str = None):
     statement = select(User)
     statement = statement.where(User.username != "anonymous")
     if id is not None:
@@ -33,44 +35,47 @@ def get_users_filtered(session: Session, id: int, username: str, email: str, ski
         statement = statement.where(User.username == username)
     if email is not None:
         statement = statement.where(User.email == email)
+    if after is not None:
+        # Paginación por cursor: continúa tras el último ID devuelto usando el índice de la clave primaria
+        statement = statement.where(User.id > decode_cursor(after, ["id"])["id"])
     if skip is not None and skip >= 0:
         statement = statement.offset(skip)
     if limit is not None and limit >= 0:
         statement = statement.limit(limit)
-    return session.exec(statement).all()
+    return (await session.exec(statement.order_by(User.id.asc()))).all()
 
-def update_user(session: Session, user_id: int, user_data: dict):
-    user = session.exec(select(User).where((User.id == user_id) & (User.username != "anonymous"))).first()
+async def update_user(session: AsyncSession, user_id: int, user_data: dict):
+    user = (await session.exec(select(User).where((User.id == user_id) & (User.username != "anonymous")))).first()
     if not user:
         return None
     for key, value in user_data.items():
         setattr(user, key, value)
-    session.commit()
-    session.refresh(user)
+    await session.commit()
+    await session.refresh(user)
     return user
 
-def update_user_by_username(session: Session, username: str, user_data: dict):
+async def update_user_by_username(session: AsyncSession, username: str, user_data: dict):
     statement = select(User).where((User.username == username) & (User.username != "anonymous"))
-    user = session.exec(statement).first()
+    user = (await session.exec(statement)).first()
     if not user:
         return None
     for key, value in user_data.items():
         setattr(user, key, value)
-    session.commit()
-    session.refresh(user)
+    await session.commit()
+    await session.refresh(user)
     return user
 
-def delete_user(session: Session, user_id: int):
-    user = session.exec(select(User).where((User.id == user_id) & (User.username != "anonymous"))).first()
+async def delete_user(session: AsyncSession, user_id: int):
+    user = (await session.exec(select(User).where((User.id == user_id) & (User.username != "anonymous")))).first()
     if user:
-        session.delete(user)
-        session.commit()
+        await session.delete(user)
+        await session.commit()
     return user
 
-def delete_user_by_username(session: Session, username: str):
+async def delete_user_by_username(session: AsyncSession, username: str):
     statement = select(User).where((User.username == username) & (User.username != "anonymous"))
-    user = session.exec(statement).first()
+    user = (await session.exec(statement)).first()
     if user:
-        session.delete(user)
-        session.commit()
+        await session.delete(user)
+        await session.commit()
     return user
\ No newline at end of file
@@ -1,6 +1,11 @@
 import os
-from sqlmodel import SQLModel, create_engine, Session
-from sqlalchemy import text
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import URL, text
+from sqlalchemy.schema import CreateIndex
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from db.pool import InstrumentedPool, instrument_pool
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -12,16 +17,65 @@ DB_HOST = os.getenv("DB_HOST", "")
 DB_PORT = os.getenv("DB_PORT", "")
 DB_NAME = os.getenv("DB_NAME", "")
 
-DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# Pool de conexiones: conexiones por proceso = DB_POOL_SIZE + DB_MAX_OVERFLOW (multiplicar por el número de workers de uvicorn)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+# Segundos de espera máxima por una conexión libre antes de fallar
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+# Segundos tras los que se recicla una conexión (-1 para no reciclarlas nunca)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+# Comprueba que la conexión sigue viva antes de entregarla
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# Configuración del pool con la que se crea el engine (también la que informa /api/admin/db-pool)
+DB_POOL_SETTINGS = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+}
+
+# Driver asíncrono (asyncpg): las consultas no bloquean el event loop
+# URL.create escapa los caracteres especiales de la contraseña y admite variables vacías (p. ej. al importar en los tests)
+DATABASE_URL = URL.create(
+    "postgresql+asyncpg",
+    username=DB_USER or None,
+    password=DB_PASSWORD or None,
+    host=DB_HOST or None,
+    port=int(DB_PORT) if DB_PORT else None,
+    database=DB_NAME or None,
+)
+
+engine = create_async_engine(
+    DATABASE_URL,
+    echo=False,
+    poolclass=InstrumentedPool,
+    **DB_POOL_SETTINGS,
+)
+# Métricas del pool expuestas en /api/admin/db-pool
+instrument_pool(engine)
 
-engine = create_engine(DATABASE_URL, echo=False)
+# Clave del advisory lock de PostgreSQL que serializa la creación del esquema entre workers que arrancan a la vez
+SCHEMA_LOCK_KEY = 7301
 
-def create_db_and_tables():
-    SQLModel.metadata.create_all(engine)
+async def create_db_and_tables(bind: AsyncEngine = engine):
+    """Crea las tablas que todavía no existen (checkfirst) y los índices declarados en los modelos que falten;
+    las tablas existentes y sus datos no se modifican.
+    """
+    async with bind.begin() as connection:
+        if connection.dialect.name == "postgresql":
+            await connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SCHEMA_LOCK_KEY})
+        await connection.run_sync(SQLModel.metadata.create_all, checkfirst=True)
+        # create_all no toca las tablas que ya existen: los índices añadidos después a los modelos se crean aquí
+        for table in SQLModel.metadata.sorted_tables:
+            for index in table.indexes:
+                await connection.execute(CreateIndex(index, if_not_exists=True))
 
-def drop_db_and_tables():
-    SQLModel.metadata.drop_all(engine)
+async def drop_db_and_tables():
+    async with engine.begin() as connection:
+        await connection.run_sync(SQLModel.metadata.drop_all)
 
-def get_session():
-    with Session(engine) as session:
-        yield session
\ No newline at end of file
+async def get_session():
+    # expire_on_commit=False: los objetos devueltos tras el commit no necesitan recargarse (no hay lazy load en async)
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        yield session
@@ -0,0 +1,153 @@
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# Límites superiores (ms) de los buckets de los histogramas de espera y de uso de conexiones
+LATENCY_BUCKETS_MS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+class _Histogram:
+    """Histograma de latencias en milisegundos con buckets fijos."""
+
+    def __init__(self, buckets: list[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, ms: float):
+        index = next((i for i, bound in enumerate(self.buckets) if ms <= bound), len(self.buckets))
+        self.counts[index] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max, 3),
+            "buckets": [
+                {"le_ms": bound, "count": count}
+                for bound, count in zip(self.buckets + ["+Inf"], self.counts)
+            ],
+        }
+
+class PoolMetrics:
+    """Métricas del pool de conexiones: esperas al pedir una conexión y tiempo que se mantiene en uso."""
+
+    def __init__(self, buckets: list[float] = LATENCY_BUCKETS_MS):
+        self._lock = threading.Lock()
+        self._buckets = buckets
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.checkins = 0
+            self.connects = 0
+            self.invalidations = 0
+            self.timeouts = 0
+            self.wait = _Histogram(self._buckets)
+            self.hold = _Histogram(self._buckets)
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self.wait.observe(seconds * 1000)
+            if timed_out:
+                self.timeouts += 1
+
+    def record_checkout(self):
+        with self._lock:
+            self.checkouts += 1
+
+    def record_checkin(self, held_seconds: float = None):
+        with self._lock:
+            self.checkins += 1
+            if held_seconds is not None:
+                self.hold.observe(held_seconds * 1000)
+
+    def record_connect(self):
+        with self._lock:
+            self.connects += 1
+
+    def record_invalidation(self):
+        with self._lock:
+            self.invalidations += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "checkout_wait": self.wait.as_dict(),
+                "connection_hold": self.hold.as_dict(),
+            }
+
+pool_metrics = PoolMetrics()
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool que mide cuánto espera cada petición hasta obtener una conexión.
+    SQLAlchemy no emite ningún evento antes de la espera, por eso se mide en _do_get.
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_metrics.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        pool_metrics.record_wait(time.perf_counter() - start)
+        return connection
+
+def instrument_pool(engine: AsyncEngine):
+    """Registra los eventos del pool que alimentan pool_metrics."""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        pool_metrics.record_connect()
+
+    @event.listens_for(sync_engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checked_out_at"] = time.perf_counter()
+        pool_metrics.record_checkout()
+
+    @event.listens_for(sync_engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        checked_out_at = connection_record.info.pop("checked_out_at", None)
+        pool_metrics.record_checkin(time.perf_counter() - checked_out_at if checked_out_at is not None else None)
+
+    @event.listens_for(sync_engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        pool_metrics.record_invalidation()
+
+def pool_status(engine: AsyncEngine, settings: dict) -> dict:
+    """Estado actual del pool del engine junto con las métricas acumuladas.
+    Args:
+        - engine: Engine whose pool is reported (only its public API is used)
+        - settings: Pool settings the engine was created with (pool_size, max_overflow, pool_timeout, pool_recycle, pool_pre_ping)
+    """
+    pool = engine.pool
+    status = {"pool_class": type(pool).__name__}
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            # overflow() es negativo mientras no se han abierto todas las conexiones base
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": settings["max_overflow"],
+            "timeout": settings["pool_timeout"],
+            "recycle": settings["pool_recycle"],
+            "pre_ping": settings["pool_pre_ping"],
+        })
+    status["metrics"] = pool_metrics.snapshot()
+    return status
@@ -0,0 +1,24 @@
+import os
+import redis.asyncio as redis
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# Conexión a Redis
+REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
+
+# Pool de conexiones compartido por la caché de productos y la revocación de tokens.
+# BlockingConnectionPool hace esperar a las peticiones cuando se agotan las conexiones en lugar de fallar.
+redis_pool = redis.BlockingConnectionPool(
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    max_connections=REDIS_MAX_CONNECTIONS,
+    decode_responses=True,
+)
+redis_client = redis.Redis(connection_pool=redis_pool)
+
+async def close_redis():
+    """Cierra las conexiones del pool de Redis."""
+    await redis_pool.aclose()
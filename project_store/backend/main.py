@@ -1,9 +1,20 @@
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, Depends, HTTPException
 from fastapi.responses import JSONResponse, HTMLResponse
 import uvicorn
-from routes import order, order_item, product, user, auth, export, stats
+from routes import order, order_item, product, user, auth, export, stats, admin
+from utils.http_client import open_http_client, close_http_client
+from db.redis import close_redis
+from utils.product_redis import listen_product_invalidations
+from utils.order_cache import listen_order_invalidations
+from utils.product_catalog import run_catalog_sync
+from utils.pdf_renderer import pdf_renderer
+from utils.export_jobs import export_jobs
+from sqlmodel.ext.asyncio.session import AsyncSession
+from db.database import create_db_and_tables, engine
+from crud.stat import backfill_stats, load_product_rank
 from fastapi.middleware.cors import CORSMiddleware
 
 # Configurar el logger
@@ -20,7 +31,49 @@ logger = logging.getLogger(__name__)
 # Omitir logs de SQLAlchemy
 logging.getLogger("sqlalchemy.engine").setLevel(logging.DEBUG)
 
-app = FastAPI()
+async def _init_db():
+    # Crea las tablas que falten en bases de datos existentes (resúmenes, eventos, versiones) sin tocar los datos
+    await create_db_and_tables()
+    async with AsyncSession(engine) as session:
+        if await backfill_stats(session):
+            logger.info("Tablas de resumen de estadísticas reconstruidas a partir de las órdenes existentes")
+
+async def _load_product_rank():
+    async with AsyncSession(engine) as session:
+        await load_product_rank(session)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Si la base de datos no se puede preparar la aplicación no arranca: sin las tablas fallarían todas las escrituras
+    await _init_db()
+    # Cliente HTTP compartido (pool de conexiones keep-alive) para las llamadas a la API externa
+    app.state.http_client = open_http_client()
+    # Invalidación de la caché local de productos entre workers (Redis pub/sub)
+    invalidation_task = asyncio.create_task(listen_product_invalidations())
+    # Invalidación de los listados de órdenes cacheados entre workers
+    order_invalidation_task = asyncio.create_task(listen_order_invalidations())
+    # Sincronización periódica del catálogo local de productos
+    catalog_sync_task = asyncio.create_task(run_catalog_sync())
+    # Pool de procesos para generar los PDF fuera del event loop
+    pdf_renderer.start()
+    # Cola y workers de las exportaciones en segundo plano
+    export_jobs.start()
+    # Ranking de productos por ventanas (Redis) reconstruido a partir de los datos existentes
+    try:
+        await _load_product_rank()
+    except Exception as e:
+        logger.error(f"Error cargando el ranking de productos: {str(e)}")
+    yield
+    await export_jobs.stop()
+    pdf_renderer.shutdown()
+    catalog_sync_task.cancel()
+    invalidation_task.cancel()
+    order_invalidation_task.cancel()
+    await close_http_client()
+    await close_redis()
+    await engine.dispose()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -28,6 +81,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # Cursor de la siguiente página en los listados paginados
 )
 
 # Middleware para registrar solicitudes y respuestas
@@ -53,6 +107,7 @@ app.include_router(order_item.router, prefix="/api/orders/{order_id}/products",
 app.include_router(product.router, prefix="/api/products", tags=["Products"])
 app.include_router(export.router, prefix="/api/exports", tags=["Exports"])
 app.include_router(stats.router, prefix="/api/stats", tags=["Stats"])
+app.include_router(admin.router, prefix="/api/admin", tags=["Admin"])
 
 # Manejo de excepciones globales
 @app.exception_handler(Exception)
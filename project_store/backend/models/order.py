@@ -1,4 +1,6 @@
 from datetime import datetime, timezone
+from pydantic import BaseModel
+from sqlalchemy import Index
 from sqlmodel import Relationship, SQLModel, Field
 from typing import TYPE_CHECKING, Optional
 from models.order_item import OrderItemResponse
@@ -15,9 +17,13 @@ class OrderBase(SQLModel):
 
 
 class Order(OrderBase, table=True):
+    # (user_id, id): listados de un usuario filtrados por user_id y paginados por id sin ordenar en memoria
+    __table_args__ = (Index("ix_order_user_id_id", "user_id", "id"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     created_at: datetime = Field(
         default_factory=lambda: datetime.now(timezone.utc),
+        index=True,
         description="Timestamp when the order was created"
     )
     items: list["OrderItem"] = Relationship(back_populates="order")  # Relación con Villain
@@ -27,6 +33,13 @@ class OrderResponse(OrderBase):
     created_at: datetime
     items: list["OrderItemResponse"]
 
+class OrderStatusTransition(BaseModel):
+    status: str = Field(..., description="New status of the matching orders (in progress, paid, delivered, cancelled)")
+    from_status: Optional[str] = Field(default=None, description="Only orders currently in this status")
+    ids: Optional[list[int]] = Field(default=None, description="Only these order IDs")
+    user_id: Optional[int] = Field(default=None, description="Only orders of this user")
+    created_before: Optional[datetime] = Field(default=None, description="Only orders created before this timestamp")
+
 # model_rebuild() es necesario cuando se usan referencias de tipo como string (ej. "OrderItemResponse")
 # para que Pydantic pueda resolverlas correctamente al generar esquemas (OpenAPI, validación, etc.)
 OrderResponse.model_rebuild()
\ No newline at end of file
@@ -0,0 +1,22 @@
+from datetime import datetime, timezone
+from sqlmodel import SQLModel, Field
+from typing import Optional
+
+# Tipos de evento del ciclo de vida de una orden
+ORDER_CREATED = "created"
+ORDER_STATUS_CHANGED = "status_changed"
+
+# Registro append-only de los eventos de las órdenes, escrito en la misma transacción que el cambio (ver crud/order.py)
+class OrderEvent(SQLModel, table=True):
+    __tablename__ = "order_event"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    order_id: int = Field(foreign_key="order.id", index=True, description="ID of the order")
+    user_id: int = Field(description="Owner of the order when the event happened")
+    event_type: str = Field(description="Event type (created, status_changed)")
+    from_status: Optional[str] = Field(default=None, description="Status before the event")
+    to_status: Optional[str] = Field(default=None, description="Status after the event")
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        description="Timestamp of the event"
+    )
@@ -12,7 +12,8 @@ if TYPE_CHECKING:
 
 class OrderItem(SQLModel, table=True):
     order_id: int = Field(foreign_key="order.id", primary_key=True, description="ID of the associated order")
-    product_id: int = Field(primary_key=True, description="ID of the product from the external DummyJSON API")
+    # La clave primaria (order_id, product_id) cubre las búsquedas por orden; product_id necesita su propio índice
+    product_id: int = Field(primary_key=True, index=True, description="ID of the product from the external DummyJSON API")
     quantity: int = Field(..., gt=0, description="Quantity of the product ordered")
     order: Optional["Order"] = Relationship(back_populates="items")
 
@@ -20,6 +21,10 @@ class OrderItemResponse(BaseModel):
     product: Product
     quantity: int
 
+class OrderItemQuantity(BaseModel):
+    product_id: int = Field(..., description="ID of the product from the external DummyJSON API")
+    quantity: int = Field(..., ge=0, description="New quantity of the product (0 removes it from the order)")
+
 # model_rebuild() es necesario cuando se usan referencias de tipo como string (ej. "OrderItemResponse")
 # para que Pydantic pueda resolverlas correctamente al generar esquemas (OpenAPI, validación, etc.)
 OrderItemResponse.model_rebuild()
\ No newline at end of file
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from sqlmodel import Field
+from sqlmodel import SQLModel, Field
 
 class AggregatedStat(BaseModel):
     user_id: int = Field(..., description="ID of the user")
@@ -8,4 +8,18 @@ class AggregatedStat(BaseModel):
 class RankedStat(BaseModel):
     product_id: int = Field(..., description="ID of the product")
     total_quantity: int = Field(..., description="Total quantity")
-    rank: int = Field(..., description="Rank based on the number of orders")
\ No newline at end of file
+    rank: int = Field(..., description="Rank based on the number of orders")
+
+# Tablas de resumen mantenidas de forma incremental en la misma transacción que las escrituras
+# de órdenes y líneas de orden (ver crud/stat.py)
+class UserOrderStat(SQLModel, table=True):
+    user_id: int = Field(primary_key=True, description="ID of the user")
+    order_count: int = Field(default=0, description="Number of orders of the user")
+
+class ProductQuantityStat(SQLModel, table=True):
+    product_id: int = Field(primary_key=True, description="ID of the product")
+    total_quantity: int = Field(default=0, index=True, description="Total quantity ordered of the product")
+
+class OrderDataVersion(SQLModel, table=True):
+    user_id: int = Field(primary_key=True, description="ID of the owner of the orders")
+    version: int = Field(default=0, description="Incremented on every write to the orders or order items of the user")
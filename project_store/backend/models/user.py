@@ -12,7 +12,7 @@ class User(UserBase, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     created_at: datetime = Field(default=datetime.now(timezone.utc), description="Creation date of the user")
     hashed_password: str
-    refresh_token: Optional[str] = None
+    refresh_token: Optional[str] = Field(default=None, index=True)
 
 class UserCreate(UserBase):
     password: str = Field(...)
@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Depends
+from auth.dependencies import require_role
+from db.database import DB_POOL_SETTINGS, engine
+from db.pool import pool_status
+from utils.order_cache import order_cache
+
+router = APIRouter()
+
+@router.get("/db-pool", status_code=200)
+def db_pool(current_user: dict = Depends(require_role(["admin"]))):
+    """
+    Status and metrics of the database connection pool:
+        * size, checked_out, checked_in, overflow: current pool usage.
+        * max_overflow, timeout, recycle, pre_ping: configured pool settings.
+        * metrics.checkout_wait: histogram of the time spent waiting for a free connection.
+        * metrics.connection_hold: histogram of the time connections stay checked out.
+    """
+    return pool_status(engine, DB_POOL_SETTINGS)
+
+@router.get("/order-cache", status_code=200)
+def order_cache_stats(current_user: dict = Depends(require_role(["admin"]))):
+    """
+    Hit/miss counters, memory usage and evictions of the per-user order listing cache.
+    """
+    return order_cache.stats()
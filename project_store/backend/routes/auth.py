@@ -1,7 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, Form, Request
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.responses import RedirectResponse
-from sqlmodel import Session
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.concurrency import run_in_threadpool
 from auth.jwt import create_access_token, create_refresh_token, verify_refresh_token, verify_access_token
 from auth.jwt import revoke_token as revoke_token_memory
 from auth.hashing import hash_password, verify_password
@@ -14,11 +16,12 @@ from auth.redis import revoke_token as revoke_token_redis
 router = APIRouter()
 
 @router.post("/register", response_model=UserResponse)
-def register(user: UserCreate, session: Session = Depends(get_session)):
-    existing_user = get_user_by_username(session, user.username)
+async def register(user: UserCreate, session: AsyncSession = Depends(get_session)):
+    existing_user = await get_user_by_username(session, user.username)
     if existing_user:
         raise HTTPException(status_code=400, detail="Username already exists")
-    hashed_password = hash_password(user.password)
+    # bcrypt es costoso en CPU: se ejecuta fuera del event loop
+    hashed_password = await run_in_threadpool(hash_password, user.password)
     new_user = User(
         username=user.username,
         email=user.email,
@@ -26,20 +29,20 @@ def register(user: UserCreate, session: Session = Depends(get_session)):
         role=user.role  # rol user
     )
     session.add(new_user)
-    session.commit()
-    session.refresh(new_user)
+    await session.commit()
+    await session.refresh(new_user)
     return new_user
 
 @router.post("/login")
-def login(form_data: OAuth2PasswordRequestForm = Depends(), session: Session = Depends(get_session)):
-    user = get_user_by_username(session, form_data.username)
-    if not user or not verify_password(form_data.password, user.hashed_password):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), session: AsyncSession = Depends(get_session)):
+    user = await get_user_by_username(session, form_data.username)
+    if not user or not await run_in_threadpool(verify_password, form_data.password, user.hashed_password):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     token = create_access_token({"sub": user.username, "user_id": user.id, "user_username": user.username}, role=user.role)
     refresh_token = create_refresh_token({"sub": user.username, "user_id": user.id, "user_username": user.username})
     user.refresh_token = refresh_token
     session.add(user)
-    session.commit()
+    await session.commit()
     return {
         "access_token": token,
         "refresh_token": refresh_token,
@@ -47,35 +50,35 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), session: Session = D
     }
 
 @router.post("/refresh")
-def refresh_token(refresh_token: str, session: Session = Depends(get_session)):
+async def refresh_token(refresh_token: str, session: AsyncSession = Depends(get_session)):
     payload = verify_refresh_token(refresh_token)
     if not payload:
         raise HTTPException(status_code=401, detail="Invalid or expired refresh token")
-    user = session.query(User).filter(User.refresh_token == refresh_token).first()
-    user = get_user_by_username(session, payload["sub"])
+    user = (await session.exec(select(User).where(User.refresh_token == refresh_token))).first()
+    user = await get_user_by_username(session, payload["sub"])
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     new_access_token = create_access_token({"sub": user.username, "user_id": user.id, "user_username": user.username}, role=user.role)
     return {"access_token": new_access_token, "token_type": "bearer"}
 
 @router.post("/logout")
-def logout(current_user: dict = Depends(get_current_user), token: str = Depends(oauth2_scheme), session: Session = Depends(get_session)):
-    user = get_user_by_username(session, current_user["sub"])
+async def logout(current_user: dict = Depends(get_current_user), token: str = Depends(oauth2_scheme), session: AsyncSession = Depends(get_session)):
+    user = await get_user_by_username(session, current_user["sub"])
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     user.refresh_token = None
     session.add(user)
-    session.commit()
+    await session.commit()
 
     # Revocar el token de acceso
     revoke_token_memory(token)
-    revoke_token_redis(token)
+    await revoke_token_redis(token)
 
     return {"message": "Successfully logged out"}
 
 @router.post("/forgot-password")
-def forgot_password(email: str = Form(...), session: Session = Depends(get_session)):
-    user = get_user_by_email(session, email)
+async def forgot_password(email: str = Form(...), session: AsyncSession = Depends(get_session)):
+    user = await get_user_by_email(session, email)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -86,18 +89,18 @@ def forgot_password(email: str = Form(...), session: Session = Depends(get_sessi
     return {"message": "Use this token to reset your password", "token": token}
 
 @router.post("/reset-password")
-def reset_password(token: str = Form(...), new_password: str = Form(...), session: Session = Depends(get_session)):
-    payload = verify_access_token(token)
+async def reset_password(token: str = Form(...), new_password: str = Form(...), session: AsyncSession = Depends(get_session)):
+    payload = await verify_access_token(token)
     if not payload or payload.get("role") != "reset":
         raise HTTPException(status_code=401, detail="Invalid or expired token")
     
-    user = get_user_by_username(session, payload["sub"])
+    user = await get_user_by_username(session, payload["sub"])
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     # Actualizar contraseña
-    user.hashed_password = hash_password(new_password)
+    user.hashed_password = await run_in_threadpool(hash_password, new_password)
     session.add(user)
-    session.commit()
+    await session.commit()
 
     return RedirectResponse(url="/", status_code=303)
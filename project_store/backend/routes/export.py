@@ -1,107 +1,399 @@
 
+import csv
+import logging
+import os
+from tempfile import NamedTemporaryFile
 from fastapi import APIRouter, Depends, HTTPException, Request, Response
-from sqlmodel import Session
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from sqlmodel.ext.asyncio.session import AsyncSession
 from models.order import Order, OrderBase, OrderResponse
-from db.database import get_session
+from db.database import engine, get_session
 from auth.dependencies import require_role
-from models.product import Product
-from utils.api_dummy_products import fetch_products
-from io import BytesIO
-from jinja2 import Template
-from xhtml2pdf import pisa
-from pathlib import Path
-import pandas as pd
+from crud.order import count_order_lines, get_orders_data_version, iter_order_lines
+from utils.api_dummy_products import fetch_products_by_ids
+from io import StringIO
+import xlsxwriter
+import pyarrow as pa
+import pyarrow.parquet as pq
+from utils.pdf_renderer import pdf_renderer, PdfRendererBusyError, PdfRenderTimeoutError
+from utils.export_jobs import export_jobs
+from utils.product_catalog import catalog
 from routes.order import find_all
 
 router = APIRouter()
 
+logger = logging.getLogger(__name__)
+
+# Columnas de las exportaciones tabulares (CSV/Excel)
+EXPORT_COLUMNS = ["order_id", "product_id", "title", "quantity", "price"]
+# Número máximo de filas de una hoja de Excel (incluida la cabecera)
+EXCEL_MAX_ROWS = 1048576
+# Esquema de las exportaciones columnares (Parquet/Arrow)
+ARROW_SCHEMA = pa.schema([
+    ("order_id", pa.int64()),
+    ("product_id", pa.int64()),
+    ("title", pa.string()),
+    ("quantity", pa.int64()),
+    ("price", pa.float64()),
+])
+# Filas por row group de Parquet (y por record batch de Arrow): se acumulan lotes hasta este tamaño antes de escribir
+EXPORT_ROW_GROUP_SIZE = int(os.getenv("EXPORT_ROW_GROUP_SIZE", 65536))
+# Tipos MIME de las exportaciones columnares
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
 @router.get("/excel")
-async def get_excel(session: Session = Depends(get_session), 
-                    current_user: dict = Depends(require_role(["admin", "cliente"]))):
+async def get_excel(current_user: dict = Depends(require_role(["admin", "cliente"]))):
+    path = None
     try:
-        # Retrieve data
-        data = await find_all(session=session, current_user=current_user)
-        row_data = _convert_to_row_data(data)
-
-        # Generate Excel file in memory
-        buffer = BytesIO()
-        df = pd.DataFrame(row_data)
-        with pd.ExcelWriter(buffer, engine="xlsxwriter") as writer:
-            df.to_excel(writer, index=False, sheet_name="Orders")
-        buffer.seek(0)
-        # Send Excel file to client
-        return Response(
-            buffer.getvalue(),
+        # Generate Excel file row by row in a temporary file
+        with NamedTemporaryFile(suffix=".xlsx", delete=False) as file:
+            path = file.name
+        await _write_excel(path, _export_user_id(current_user))
+        # Send Excel file to client in chunks and delete it afterwards
+        return FileResponse(
+            path,
             media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": "attachment; filename=orders_data.xlsx"}
+            filename="orders_data.xlsx",
+            background=BackgroundTask(os.remove, path)
         )
     except Exception as e:
-        return {"error": str(e)}
+        if path and os.path.exists(path):
+            os.remove(path)
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
 @router.get("/csv")
-async def get_csv(session: Session = Depends(get_session), 
-                  current_user: dict = Depends(require_role(["admin", "cliente"]))):
+async def get_csv(current_user: dict = Depends(require_role(["admin", "cliente"]))):
     try:
-        # Retrieve data
-        data = await find_all(session=session, current_user=current_user)
-        row_data = _convert_to_row_data(data)
-
-        # Generate CSV file in memory
-        buffer = BytesIO()
-        df = pd.DataFrame(row_data)
-        df.to_csv(buffer, index=False)
-        buffer.seek(0)
-        # Send CSV file to client
-        return Response(
-            buffer.getvalue(),
+        # Send CSV file to client while it is generated (errors before the first chunk return a 500)
+        return StreamingResponse(
+            await _open_stream(_stream_csv(_export_user_id(current_user))),
             media_type="text/csv",
             headers={"Content-Disposition": "attachment; filename=orders_data.csv"}
         )
     except Exception as e:
-        return {"error": str(e)}
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+
+@router.get("/parquet")
+async def get_parquet(current_user: dict = Depends(require_role(["admin", "cliente"]))):
+    try:
+        # Send Parquet file to client while it is generated (one row group every EXPORT_ROW_GROUP_SIZE rows, errors before the first chunk return a 500)
+        return StreamingResponse(
+            await _open_stream(_stream_arrow(_export_user_id(current_user), "parquet")),
+            media_type=PARQUET_MEDIA_TYPE,
+            headers={"Content-Disposition": "attachment; filename=orders_data.parquet"}
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+
+@router.get("/arrow")
+async def get_arrow(current_user: dict = Depends(require_role(["admin", "cliente"]))):
+    try:
+        # Send Arrow IPC stream to client while it is generated (one record batch every EXPORT_ROW_GROUP_SIZE rows, errors before the first chunk return a 500)
+        return StreamingResponse(
+            await _open_stream(_stream_arrow(_export_user_id(current_user), "arrow")),
+            media_type=ARROW_STREAM_MEDIA_TYPE,
+            headers={"Content-Disposition": "attachment; filename=orders_data.arrows"}
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
 @router.get("/pdf")
-async def get_pdf(session: Session = Depends(get_session), 
+async def get_pdf(session: AsyncSession = Depends(get_session), 
                   current_user: dict = Depends(require_role(["admin", "cliente"]))):
     try:
-        # Retrieve data
-        data = await find_all(session=session, current_user=current_user)
-        row_data = _convert_to_row_data_for_pdf(data)
-
-        # Load HTML template from external file
-        template_path = Path("views/pdf_template.html")
-        html_template = template_path.read_text(encoding="utf-8")
-        template = Template(html_template)
-        rendered_html = template.render(order_data=row_data)
-        
-        # Convert HTML to PDF with xhtml2pdf
-        pdf_buffer = BytesIO()
-        pisa_status = pisa.CreatePDF(rendered_html, dest=pdf_buffer)
-        if pisa_status.err:
-            return {"error": "Error al generar el PDF"}
-        pdf_buffer.seek(0)
-        
+        pdf = await _render_pdf(session, current_user)
+
         # Send PDF file to the client
         return Response(
-            pdf_buffer.getvalue(),
+            pdf,
             media_type="application/pdf",
             headers={"Content-Disposition": "attachment; filename=orders_data.pdf"}
         )
+    except PdfRendererBusyError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except PdfRenderTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
-        return {"error": str(e)}
-    
-def _convert_to_row_data(orders: list[OrderResponse]):
-    result = []
-    for order in orders:
-        for item in order.items:
-            result.append({
-                "order_id": order.id,
-                "product_id": item.product.id,
-                "title": item.product.title,
-                "quantity": item.quantity,
-                "price": item.product.price
-            })
-    return result
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+
+@router.get("/pdf/stats", status_code=200)
+def pdf_stats(current_user: dict = Depends(require_role(["admin"]))):
+    """
+    Metrics of the PDF renderer process pool.
+    """
+    return pdf_renderer.stats()
+
+@router.post("/jobs", status_code=202)
+async def create_job(format: str,
+                     session: AsyncSession = Depends(get_session),
+                     current_user: dict = Depends(require_role(["admin", "cliente"]))):
+    """
+    Create a background export job (format: csv, excel, pdf, parquet, arrow).
+    Identical requests over unchanged data reuse the same job or the cached result.
+    """
+    try:
+        # La versión incluye el ETag del catálogo porque la exportación contiene títulos y precios
+        data_version = f"{await get_orders_data_version(session, _export_user_id(current_user))}:{catalog.etag}"
+        job = await export_jobs.submit(current_user, format, data_version)
+        return _job_response(job)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+
+@router.get("/jobs/{job_id}", status_code=200)
+async def get_job(job_id: str, current_user: dict = Depends(require_role(["admin", "cliente"]))):
+    """
+    Status and progress of a background export job.
+    """
+    return _job_response(await _get_user_job(job_id, current_user))
+
+@router.get("/jobs/{job_id}/download")
+async def download_job(job_id: str, current_user: dict = Depends(require_role(["admin", "cliente"]))):
+    """
+    Download the file generated by a finished export job.
+    """
+    job = await _get_user_job(job_id, current_user)
+    path = export_jobs.result_path(job)
+    if path is None:
+        raise HTTPException(status_code=409, detail=f"Export job {job_id} has no file available (status: {job['status']}).")
+    extension = os.path.splitext(path)[1]
+    return FileResponse(path, media_type=export_jobs.media_type(job["format"]), filename=f"orders_data{extension}")
+
+async def _get_user_job(job_id: str, current_user: dict) -> dict:
+    job = await export_jobs.get(job_id)
+    if job is None or (current_user["role"] != "admin" and job["user_id"] != current_user["user_id"]):
+        raise HTTPException(status_code=404, detail=f"Export job {job_id} not found")
+    return job
+
+def _job_response(job: dict) -> dict:
+    return {
+        "job_id": job["id"],
+        "format": job["format"],
+        "status": job["status"],
+        "processed": job["processed"],
+        "total": job["total"],
+        "progress": job["processed"] / job["total"] if job["total"] else (1.0 if job["status"] == "done" else 0.0),
+        "error": job["error"],
+    }
+
+def _export_user_id(current_user: dict):
+    """Los administradores exportan todas las órdenes y los clientes solo las suyas."""
+    return None if current_user["role"] == "admin" else current_user["user_id"]
+
+async def _iter_export_columns(user_id: int = None, progress=None):
+    """Genera las líneas de exportación por lotes en formato columnar (una lista por columna de EXPORT_COLUMNS),
+    resolviendo los productos de cada lote de una vez.
+    Opens its own session because the response is streamed after the request dependencies are closed.
+    The optional progress(processed, total) callback is called after each batch.
+    """
+    async with AsyncSession(engine) as session:
+        total = await count_order_lines(session, user_id=user_id) if progress else None
+        processed = 0
+        async for lines in iter_order_lines(session, user_id=user_id):
+            order_ids, product_ids, quantities = (list(column) for column in zip(*lines))
+            products = await fetch_products_by_ids(product_ids)
+            processed += len(lines)
+            if progress:
+                progress(processed, total)
+            yield [
+                order_ids,
+                product_ids,
+                [products[product_id]["title"] for product_id in product_ids],
+                quantities,
+                [products[product_id]["price"] for product_id in product_ids],
+            ]
+
+async def _iter_export_rows(user_id: int = None, progress=None):
+    """Genera las filas de exportación por lotes (tuplas en el orden de EXPORT_COLUMNS)."""
+    async for columns in _iter_export_columns(user_id, progress):
+        yield list(zip(*columns))
+
+async def _open_stream(chunks):
+    """Genera el primer fragmento de una exportación antes de crear la respuesta.
+    Si la consulta o el primer lote fallan, la ruta todavía puede devolver un 500 en lugar de un 200 truncado.
+    Un error posterior ya no puede cambiar el código de estado: se registra y se interrumpe la respuesta
+    (sin el último chunk de la codificación chunked, el cliente no la da por completa).
+    """
+    try:
+        first = await anext(chunks)
+    except BaseException:
+        await chunks.aclose()
+        raise
+
+    async def stream():
+        try:
+            yield first
+            async for chunk in chunks:
+                yield chunk
+        except Exception:
+            logger.exception("Exportación interrumpida después de enviar la respuesta")
+            raise
+        finally:
+            await chunks.aclose()
+    return stream()
+
+async def _stream_csv(user_id: int = None, progress=None):
+    """Genera el CSV por trozos: la memoria usada depende del tamaño del lote, no del número de filas.
+    La cabecera se envía con el primer lote, de modo que el primer fragmento ya ha abierto la consulta.
+    """
+    buffer = StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(EXPORT_COLUMNS)
+    async for rows in _iter_export_rows(user_id, progress):
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    # Sin filas: solo la cabecera
+    if buffer.tell():
+        yield buffer.getvalue()
+
+async def _write_csv(path: str, current_user: dict, progress=None):
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        async for chunk in _stream_csv(_export_user_id(current_user), progress):
+            file.write(chunk)
+
+async def _write_excel(path: str, user_id: int = None, progress=None):
+    """Escribe el Excel fila a fila en modo constant_memory (xlsxwriter solo mantiene la fila actual en memoria).
+    When a sheet reaches EXCEL_MAX_ROWS the export continues in a new sheet.
+    """
+    workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+    worksheet = None
+    row = EXCEL_MAX_ROWS
+
+    def add_sheet():
+        number = len(workbook.worksheets()) + 1
+        sheet = workbook.add_worksheet("Orders" if number == 1 else f"Orders {number}")
+        sheet.write_row(0, 0, EXPORT_COLUMNS)
+        return sheet
+
+    try:
+        async for rows in _iter_export_rows(user_id, progress):
+            for values in rows:
+                if row >= EXCEL_MAX_ROWS:
+                    worksheet = add_sheet()
+                    row = 1
+                worksheet.write_row(row, 0, values)
+                row += 1
+        if worksheet is None:
+            add_sheet()
+    finally:
+        # Cerrar el libro comprime el fichero: se hace fuera del event loop
+        await run_in_threadpool(workbook.close)
+
+async def _write_arrow(path: str, current_user: dict, format: str, progress=None):
+    with open(path, "wb") as file:
+        async for chunk in _stream_arrow(_export_user_id(current_user), format, progress):
+            file.write(chunk)
+
+async def _render_pdf(session: AsyncSession, current_user: dict) -> bytes:
+    # Retrieve data
+    data = await find_all(session=session, current_user=current_user)
+    row_data = _convert_to_row_data_for_pdf(data)
+    # Render the compiled template and convert it to PDF in the renderer process pool
+    return await pdf_renderer.render("pdf_template.html", order_data=row_data)
+
+async def _write_pdf(path: str, current_user: dict, progress=None):
+    async with AsyncSession(engine) as session:
+        pdf = await _render_pdf(session, current_user)
+    with open(path, "wb") as file:
+        file.write(pdf)
+    if progress:
+        progress(1, 1)
+
+# Formatos disponibles para las exportaciones en segundo plano
+export_jobs.register("csv", "csv", "text/csv", _write_csv)
+export_jobs.register(
+    "excel",
+    "xlsx",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    lambda path, current_user, progress: _write_excel(path, _export_user_id(current_user), progress)
+)
+export_jobs.register("pdf", "pdf", "application/pdf", _write_pdf)
+export_jobs.register(
+    "parquet",
+    "parquet",
+    PARQUET_MEDIA_TYPE,
+    lambda path, current_user, progress: _write_arrow(path, current_user, "parquet", progress)
+)
+export_jobs.register(
+    "arrow",
+    "arrows",
+    ARROW_STREAM_MEDIA_TYPE,
+    lambda path, current_user, progress: _write_arrow(path, current_user, "arrow", progress)
+)
+
+class _ChunkSink:
+    """Destino de escritura para pyarrow que acumula los bytes escritos hasta que se envían al cliente."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def _write_row_group(writer, table: pa.Table, format: str):
+    if format == "parquet":
+        writer.write_table(table, row_group_size=EXPORT_ROW_GROUP_SIZE)
+    else:
+        # El writer IPC escribe un record batch por chunk de la tabla: se unen los lotes acumulados
+        writer.write_table(table.combine_chunks(), max_chunksize=EXPORT_ROW_GROUP_SIZE)
+
+async def _stream_arrow(user_id: int = None, format: str = "parquet", progress=None):
+    """Genera un Parquet o un stream Arrow IPC (comprimidos con zstd) a partir de los lotes de líneas.
+    Los lotes se acumulan hasta EXPORT_ROW_GROUP_SIZE filas antes de escribirlos para no generar miles de row groups pequeños.
+    """
+    sink = _ChunkSink()
+    if format == "parquet":
+        writer = pq.ParquetWriter(sink, ARROW_SCHEMA, compression="zstd")
+    else:
+        writer = pa.ipc.new_stream(sink, ARROW_SCHEMA, options=pa.ipc.IpcWriteOptions(compression="zstd"))
+    pending: list[pa.RecordBatch] = []
+    pending_rows = 0
+    try:
+        async for columns in _iter_export_columns(user_id, progress):
+            batch = pa.record_batch(columns, schema=ARROW_SCHEMA)
+            pending.append(batch)
+            pending_rows += batch.num_rows
+            if pending_rows < EXPORT_ROW_GROUP_SIZE:
+                continue
+            # Se escriben los row groups completos y el resto queda pendiente para el siguiente
+            table = pa.Table.from_batches(pending, schema=ARROW_SCHEMA)
+            complete = pending_rows - pending_rows % EXPORT_ROW_GROUP_SIZE
+            _write_row_group(writer, table.slice(0, complete), format)
+            rest = table.slice(complete)
+            pending, pending_rows = rest.to_batches(), rest.num_rows
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+        if pending_rows:
+            _write_row_group(writer, pa.Table.from_batches(pending, schema=ARROW_SCHEMA), format)
+    finally:
+        writer.close()
+    yield sink.drain()
 
 def _convert_to_row_data_for_pdf(orders: list[OrderResponse]):
     result = []
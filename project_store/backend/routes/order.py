@@ -1,19 +1,24 @@
 
 from typing import List
-from fastapi import APIRouter, Body, Depends, HTTPException
-from sqlmodel import Session
-from models.order import Order, OrderBase, OrderResponse
+from fastapi import APIRouter, Body, Depends, HTTPException, Response
+from sqlmodel.ext.asyncio.session import AsyncSession
+from models.order import Order, OrderBase, OrderResponse, OrderStatusTransition
+from models.order_event import OrderEvent
 from db.database import get_session
-from crud.order import create_order, delete_order, get_order_by_id, get_orders_filtered, update_order
+from crud.order import create_order, create_orders, delete_order, get_order_events, get_orders_with_items, update_order, update_orders_status
+# Alias: el endpoint get_order_by_id de este módulo ocultaría la función del CRUD
+from crud.order import get_order_by_id as get_order
 from auth.dependencies import require_role
 from models.order_item import OrderItemResponse
 from models.product import Product
-from utils.api_dummy_products import fetch_product_by_id
+from utils.api_dummy_products import fetch_products_by_ids
+from utils.pagination import fetch_limit, paginate
+from utils.order_cache import order_cache
 
 router = APIRouter()
 
 @router.post("/", response_model=Order, status_code=201)
-def create(session: Session = Depends(get_session), 
+async def create(session: AsyncSession = Depends(get_session), 
            current_user: dict = Depends(require_role(["admin", "cliente"]))):
     """
     Create a new order without products associated to it.
@@ -22,7 +27,49 @@ def create(session: Session = Depends(get_session),
         order = OrderBase(status="in progress", user_id=current_user["user_id"])
         order_data = Order(**order.model_dump())
         order_data.user_id = current_user["user_id"]
-        return create_order(session, order_data)
+        return await create_order(session, order_data)
+    except HTTPException as e:
+        raise e
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+
+@router.post("/bulk", response_model=list[Order], status_code=201)
+async def create_bulk(orders: list[OrderBase],
+                      session: AsyncSession = Depends(get_session),
+                      current_user: dict = Depends(require_role(["admin"]))):
+    """
+    Create many orders (without products) in one request and one transaction.
+    """
+    try:
+        return await create_orders(session, orders)
+    except HTTPException as e:
+        raise e
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+
+@router.put("/bulk/status", status_code=200)
+async def update_status_bulk(transition: OrderStatusTransition,
+                             session: AsyncSession = Depends(get_session),
+                             current_user: dict = Depends(require_role(["admin"]))):
+    """
+    Change the status of every order matching the filters that allows the transition
+    (in progress -> paid -> delivered, any -> cancelled); the rest are skipped.
+    With ids the change is all or nothing: if any of the orders does not exist or does not allow the transition,
+    none is changed and a 400 is returned.
+    Filters (from_status or ids is required):
+        * from_status: Only orders currently in this status.
+        * ids: Only these order IDs.
+        * user_id: Only orders of this user.
+        * created_before: Only orders created before this timestamp.
+    Example: {"status": "delivered", "from_status": "paid", "created_before": "2025-01-01T00:00:00Z"}
+    """
+    try:
+        updated_ids = await update_orders_status(session, **transition.model_dump())
+        return {"updated": len(updated_ids), "ids": updated_ids}
     except HTTPException as e:
         raise e
     except ValueError as e:
@@ -34,7 +81,9 @@ def create(session: Session = Depends(get_session),
 async def find_all(id: int = None, 
              skip: int = None, 
              limit: int = None, 
-             session: Session = Depends(get_session), 
+             after: str = None,
+             response: Response = None,
+             session: AsyncSession = Depends(get_session), 
              current_user: dict = Depends(require_role(["admin", "cliente"]))):
     """
     Find all Orders in the system.
@@ -43,28 +92,38 @@ async def find_all(id: int = None,
         * user_id: Filter by the Owner ID.
         * skip: Number of rows to omit (pagination).
         * limit: Maximum number of rows to return (pagination).
+        * after: Cursor returned in the X-Next-Cursor header of the previous page (keyset pagination).
     """
     try:
-        orders: List[Order] = []
-        if current_user["role"] == "admin" :
-            orders = get_orders_filtered(session, id=id, user_id=None, skip=skip, limit=limit)
-        else :
-            orders = get_orders_filtered(session, id=id, user_id=current_user["user_id"], skip=skip, limit=limit)
+        orders: List[dict] = []
+        user_id = None if current_user["role"] == "admin" else current_user["user_id"]
+        # Cache-aside por (usuario, filtros, cursor); la clave incluye la versión de las órdenes del usuario
+        cache_key = order_cache.key(user_id, id, skip, limit, after)
+        orders = order_cache.get(cache_key)
+        if orders is None:
+            # Órdenes y líneas en como máximo dos consultas (una sola con json_agg en PostgreSQL)
+            orders = await get_orders_with_items(session, id=id, user_id=user_id, skip=skip, limit=fetch_limit(limit), after=after)
+            order_cache.set(cache_key, orders)
+        orders, cursor = paginate(orders, limit, "id")
+        if response is not None and cursor:
+            response.headers["X-Next-Cursor"] = cursor
+        # Resolver todos los productos distintos de una vez en lugar de uno por item
+        products = await fetch_products_by_ids(
+            [item["product_id"] for order in orders for item in order["items"]]
+        )
         result_orders = []
         for order in orders:
             items_result = []
-            if order.items != None:
-                for item in order.items:
-                    product = await fetch_product_by_id(item.product_id)
-                    items_result.append(OrderItemResponse(
-                        product=product,
-                        quantity=item.quantity
-                    ))
+            for item in order["items"]:
+                items_result.append(OrderItemResponse(
+                    product=products[item["product_id"]],
+                    quantity=item["quantity"]
+                ))
             result_orders.append(OrderResponse(
-                status=order.status,
-                user_id=order.user_id,
-                id= order.id,
-                created_at=order.created_at,
+                status=order["status"],
+                user_id=order["user_id"],
+                id=order["id"],
+                created_at=order["created_at"],
                 items=items_result
             ))
         return result_orders
@@ -78,21 +137,22 @@ async def find_all(id: int = None,
 @router.get("/{order_id}", response_model=OrderResponse)
 async def get_order_by_id(
     order_id: int,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     current_user: dict = Depends(require_role(["admin", "cliente"])),
 ):
     try:
         order = None
         if current_user["role"] == "admin" :
-            order = get_order_by_id(session, order_id, None)
+            order = await get_order(session, order_id, None, load_items=True)
         else:
-            order = get_order_by_id(session, order_id, current_user["user_id"])
+            order = await get_order(session, order_id, current_user["user_id"], load_items=True)
         if order is None:
             raise HTTPException(status_code=400, detail=f"Order with ID {order_id} was not found.")
         result_items = []
         if (order.items != None):
+            products = await fetch_products_by_ids([item.product_id for item in order.items])
             for item in order.items:
-                product = await fetch_product_by_id(item.product_id)
+                product = products[item.product_id]
                 result_items.append(OrderItemResponse(
                     product=Product(
                         id=product['id'],
@@ -114,8 +174,27 @@ async def get_order_by_id(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
     
+@router.get("/{order_id}/events", response_model=list[OrderEvent])
+async def get_events(
+    order_id: int,
+    session: AsyncSession = Depends(get_session),
+    current_user: dict = Depends(require_role(["admin", "cliente"])),
+):
+    """
+    Lifecycle events (creation and status changes) of an order, oldest first.
+    """
+    try:
+        order = await get_order(session, order_id, None if current_user["role"] == "admin" else current_user["user_id"])
+        if order is None:
+            raise HTTPException(status_code=404, detail=f"Order with ID {order_id} not found")
+        return await get_order_events(session, order_id)
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+
 @router.put("/{order_id}", response_model=Order)
-def update(
+async def update(
     order_id: int,
     order_data: OrderBase = Body(
         ...,
@@ -124,14 +203,15 @@ def update(
             "user_id": "ID of the order's User ID"
         }
     ),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     current_user: dict = Depends(require_role(["admin"])),
 ):
     """
     Update an existing order.
+    Status changes must follow the order lifecycle: in progress -> paid -> delivered, any -> cancelled.
     """
     try:
-        return update_order(session, order_id, order_data.model_dump())
+        return await update_order(session, order_id, order_data.model_dump())
     except HTTPException as e:
         raise e
     except ValueError as e:
@@ -140,16 +220,16 @@ def update(
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
 @router.delete("/{order_id}", response_model=Order)
-def delete(
+async def delete(
     order_id: int,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     current_user: dict = Depends(require_role(["admin", "cliente"])),
 ):
     try:
         if current_user["role"] == "admin" :
-            return delete_order(session, order_id, None)
+            return await delete_order(session, order_id, None)
         else:
-            return delete_order(session, order_id, current_user["user_id"])
+            return await delete_order(session, order_id, current_user["user_id"])
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -1,24 +1,54 @@
 
-from fastapi import APIRouter, Body, Depends, HTTPException
-from sqlmodel import Session
+from fastapi import APIRouter, Body, Depends, HTTPException, Response
+from sqlmodel.ext.asyncio.session import AsyncSession
 from db.database import get_session
 from auth.dependencies import require_role
-from models.order_item import OrderItem
-from crud.order_item import create_order_item, delete_order_item_by_order_id_and_product_id, get_order_item_by_order_id_and_product_id, update_order_item
+from models.order_item import OrderItem, OrderItemQuantity
+from crud.order_item import create_order_item, delete_order_item_by_order_id_and_product_id, get_order_item_by_order_id_and_product_id, get_order_items_by_order_id, set_order_item_quantities, update_order_item
 from crud.order import get_order_by_id
+from utils.pagination import fetch_limit, paginate
 
 router = APIRouter()
 
+@router.get("/", response_model=list[OrderItem], status_code=200)
+async def find_all(order_id: int, # Captured from pre-path defined in main.py
+             limit: int = None,
+             after: str = None,
+             response: Response = None,
+             session: AsyncSession = Depends(get_session),
+             current_user: dict = Depends(require_role(["admin", "cliente"]))):
+    """
+    Find all Order Items of an order.
+    Filter options as queryParams:
+        * limit: Maximum number of rows to return (pagination).
+        * after: Cursor returned in the X-Next-Cursor header of the previous page (keyset pagination).
+    """
+    try:
+        order = await get_order_by_id(session, order_id, None if current_user["role"] == "admin" else current_user["user_id"])
+        if order is None:
+            raise HTTPException(status_code=404, detail=f"Order with ID {order_id} not found")
+        order_items = await get_order_items_by_order_id(session, order_id, limit=fetch_limit(limit), after=after)
+        order_items, cursor = paginate(order_items, limit, "product_id")
+        if response is not None and cursor:
+            response.headers["X-Next-Cursor"] = cursor
+        return order_items
+    except HTTPException as e:
+        raise e
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+
 @router.post("/", response_model=OrderItem, status_code=201)
-def create(task: OrderItem, 
-           session: Session = Depends(get_session),
+async def create(task: OrderItem, 
+           session: AsyncSession = Depends(get_session),
            current_user: dict = Depends(require_role(["admin", "cliente"]))):
     """
     Create a new Order Item.
     """
     try:
         order_item = OrderItem(**task.model_dump())
-        return create_order_item(session, order_item)
+        return await create_order_item(session, order_item)
     except HTTPException as e:
         raise e
     except ValueError as e:
@@ -27,7 +57,7 @@ def create(task: OrderItem,
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
 @router.put("/", response_model=OrderItem)
-def update(
+async def update(
     order_id: int, # Captured from pre-path defined in main.py
     order_item_data: dict = Body(
         ...,
@@ -37,7 +67,7 @@ def update(
             "quantity": "Quantity of the product ordered"
         }
     ),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     current_user: dict = Depends(require_role(["admin", "cliente"])),
 ):
     """
@@ -45,14 +75,14 @@ def update(
     """
     try:
         product_id = order_item_data["product_id"]
-        order_item_updateable = get_order_item_by_order_id_and_product_id(session, order_id, product_id)
+        order_item_updateable = await get_order_item_by_order_id_and_product_id(session, order_id, product_id)
         if order_item_updateable:
-            order = get_order_by_id(session, order_id, current_user["user_id"])
+            order = await get_order_by_id(session, order_id, current_user["user_id"])
             if current_user["role"] == "cliente" and order.user_id != current_user["user_id"]:
                 raise HTTPException(status_code=403, detail=f"Order Item not permitted")
             order_item_data["order_id"] = order_id
             order_item_obj = OrderItem(**order_item_data)
-            updated_order_item = update_order_item(session, order_item_obj)
+            updated_order_item = await update_order_item(session, order_item_obj)
             return updated_order_item
         else:
             raise HTTPException(status_code=404, detail=f"OrderItem with Order ID {order_id} and Product ID {product_id} not found")
@@ -61,23 +91,51 @@ def update(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
+@router.put("/bulk", response_model=list[OrderItem])
+async def update_bulk(
+    order_id: int, # Captured from pre-path defined in main.py
+    items: list[OrderItemQuantity],
+    session: AsyncSession = Depends(get_session),
+    current_user: dict = Depends(require_role(["admin", "cliente"])),
+):
+    """
+    Set the quantities of many products of an order in one request and one transaction.
+    Products with quantity 0 are removed from the order. If a product appears several times, the last quantity wins.
+    Returns the updated or created Order Items.
+    """
+    try:
+        quantities = {item.product_id: item.quantity for item in items}
+        # La comprobación de propiedad va en la consulta que bloquea la orden (una sola lectura para todo el carrito)
+        order_items = await set_order_item_quantities(
+            session, order_id, quantities, None if current_user["role"] == "admin" else current_user["user_id"]
+        )
+        if order_items is None:
+            raise HTTPException(status_code=404, detail=f"Order with ID {order_id} not found")
+        return order_items
+    except HTTPException as e:
+        raise e
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+
 @router.delete("/{product_id}", response_model=OrderItem)
-def delete(
+async def delete(
     order_id: int,
     product_id: int,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     current_user: dict = Depends(require_role(["admin", "cliente"])),
 ):
     """
     Permite eliminar un Order Item.
     """
     try:
-        order_item_to_delete = get_order_item_by_order_id_and_product_id(session, order_id, product_id)
+        order_item_to_delete = await get_order_item_by_order_id_and_product_id(session, order_id, product_id)
         if order_item_to_delete:
-            order = get_order_by_id(session, order_item_to_delete.order_id, current_user["user_id"])
+            order = await get_order_by_id(session, order_item_to_delete.order_id, current_user["user_id"])
             if current_user["role"] == "cliente" and order.user_id != current_user["user_id"]:
                 raise HTTPException(status_code=403, detail=f"Order with ID {order_id} not permitted")
-            deleted_order_item = delete_order_item_by_order_id_and_product_id(session, order_id, product_id)
+            deleted_order_item = await delete_order_item_by_order_id_and_product_id(session, order_id, product_id)
             return deleted_order_item    
         else:
             raise HTTPException(status_code=404, detail=f"Order with ID {order_id} and Product ID {product_id} not found")
@@ -1,11 +1,13 @@
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from models.order import Order, OrderBase
 from db.database import get_session
 from auth.dependencies import require_role
 from models.product import Product
 from utils.api_dummy_products import fetch_products
+from utils.product_redis import local_cache
+from utils.product_catalog import catalog
 
 router = APIRouter()
 
@@ -13,7 +15,7 @@ router = APIRouter()
 async def find_all(q: str = None, 
              skip: int = None, 
              limit: int = None, 
-             session: Session = Depends(get_session), 
+             session: AsyncSession = Depends(get_session), 
              current_user: dict = Depends(require_role(["admin", "cliente"]))):
     """
     Find all Products.
@@ -23,7 +25,11 @@ async def find_all(q: str = None,
         * limit: Maximum number of rows to return (pagination).
     """
     try:
-        products = await fetch_products(q, skip, limit)
+        # Se sirve desde el catálogo local; solo se consulta la API externa si aún no se ha sincronizado
+        if catalog.ready:
+            products = catalog.search(q=q, skip=skip, limit=limit)
+        else:
+            products = await fetch_products(q=q, limit=limit, skip=skip)
         result = []
         for p in products:
             result.append(Product(
@@ -39,3 +45,10 @@ async def find_all(q: str = None,
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+
+@router.get("/cache/stats", status_code=200)
+def cache_stats(current_user: dict = Depends(require_role(["admin"]))):
+    """
+    Hit/miss counters of the in-process product cache.
+    """
+    return local_cache.stats()
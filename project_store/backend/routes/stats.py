@@ -1,22 +1,22 @@
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlmodel.ext.asyncio.session import AsyncSession
 from db.database import get_session
 from auth.dependencies import require_role
 from crud.order import get_orders_by_users
 from models.stat import AggregatedStat, RankedStat
-from crud.order_item import products_ranking
+from crud.order_item import products_ranking_window
 
 router = APIRouter()
 
 @router.get("/by-user", response_model=list[AggregatedStat], status_code=200)
-async def find_by_user(session: Session = Depends(get_session), 
+async def find_by_user(session: AsyncSession = Depends(get_session), 
                           current_user: dict = Depends(require_role(["admin"]))):
     """
     Find aggregated stats by user.
     """
     try:
-        result = get_orders_by_users(session)
+        result = await get_orders_by_users(session)
         return result
     except HTTPException as e:
         raise e
@@ -26,13 +26,18 @@ async def find_by_user(session: Session = Depends(get_session),
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
     
 @router.get("/product-rank", response_model=list[RankedStat], status_code=200)
-async def find_by_user(session: Session = Depends(get_session), 
-                          current_user: dict = Depends(require_role(["admin"]))):
+async def find_product_rank(k: int = Query(10, gt=0),
+                            window: str = "all",
+                            session: AsyncSession = Depends(get_session),
+                            current_user: dict = Depends(require_role(["admin"]))):
     """
-    Find TOP 10 product rank.
+    Find TOP K product rank.
+    Filter options as queryParams:
+        * k: Number of products to return (default 10).
+        * window: Time window on the order creation date (all, hour, day, week).
     """
     try:
-        result = products_ranking(session)
+        result = await products_ranking_window(session, k, window)
         return result
     except HTTPException as e:
         raise e
@@ -1,21 +1,24 @@
 
-from fastapi import APIRouter, Body, Depends, HTTPException
-from sqlmodel import Session
+from fastapi import APIRouter, Body, Depends, HTTPException, Response
+from sqlmodel.ext.asyncio.session import AsyncSession
 from models.user import User, UserCreate, UserResponse
 from db.database import get_session
 from crud.user import create_user, delete_user, get_users_filtered, update_user
 from auth.dependencies import require_role
+from utils.pagination import fetch_limit, paginate
 
 
 router = APIRouter()
 
 @router.get("/", response_model=list[UserResponse], status_code=200)
-def find_all(id: int = None, 
+async def find_all(id: int = None, 
              username: str = None, 
              email: str = None, 
              skip: int = None, 
              limit: int = None, 
-             session: Session = Depends(get_session),
+             after: str = None,
+             response: Response = None,
+             session: AsyncSession = Depends(get_session),
              current_user: dict = Depends(require_role(["admin"])),):
     """
     Find all users in the system.
@@ -25,9 +28,14 @@ def find_all(id: int = None,
         * email: Filtra por el correo electrónico.
         * skip: Número de registros a omitir (paginación).
         * limit: Número máximo de registros a devolver (paginación).
+        * after: Cursor devuelto en la cabecera X-Next-Cursor de la página anterior (paginación por cursor).
     """
     try:
-        return get_users_filtered(session, id=id, username=username, email=email, skip=skip, limit=limit)
+        users = await get_users_filtered(session, id=id, username=username, email=email, skip=skip, limit=fetch_limit(limit), after=after)
+        users, cursor = paginate(users, limit, "id")
+        if response is not None and cursor:
+            response.headers["X-Next-Cursor"] = cursor
+        return users
     except HTTPException as e:
         raise e
     except ValueError as e:
@@ -37,15 +45,15 @@ def find_all(id: int = None,
 
 
 @router.post("/", response_model=UserResponse, status_code=201)
-def create(user: UserCreate, 
-           session: Session = Depends(get_session),
+async def create(user: UserCreate, 
+           session: AsyncSession = Depends(get_session),
            current_user: dict = Depends(require_role(["admin"])),):
     """
     Create a new user in the system.
     """
     try:
         user_data = User(**user.model_dump())
-        return create_user(session, user_data)
+        return await create_user(session, user_data)
     except HTTPException as e:
         raise e
     except ValueError as e:
@@ -54,7 +62,7 @@ def create(user: UserCreate,
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
 @router.put("/{user_id}", response_model=UserResponse)
-def update(
+async def update(
     user_id: int,
     user_data: dict = Body(
         ...,
@@ -64,11 +72,11 @@ def update(
             "password": "Password for the user"
         }
     ),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     current_user: dict = Depends(require_role(["admin"])),
 ):
     try:
-        updated_user = update_user(session, user_id, user_data)
+        updated_user = await update_user(session, user_id, user_data)
         if not updated_user:
             raise HTTPException(status_code=404, detail=f"User with ID {user_id} not found")
         return updated_user
@@ -78,13 +86,13 @@ def update(
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
 @router.delete("/{user_id}", response_model=UserResponse)
-def update(
+async def update(
     user_id: int,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     current_user: dict = Depends(require_role(["admin"])),
 ):
     try:
-        deleted_user = delete_user(session, user_id)
+        deleted_user = await delete_user(session, user_id)
         if not deleted_user:
             raise HTTPException(status_code=404, detail=f"User with ID {user_id} not found")
         return deleted_user
@@ -1,17 +1,25 @@
-from sqlmodel import SQLModel, Session
+import asyncio
+import shutil
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
 from db.database import engine, create_db_and_tables, drop_db_and_tables
 from models.user import User
 from auth.hashing import hash_password
 from models.order import Order
 from models.order_item import OrderItem
+from models.order_event import OrderEvent  # registra la tabla order_event para create_all
+from crud.stat import rebuild_stats
+from utils.export_jobs import EXPORT_JOBS_DIR
 
-def seed_data():
+async def seed_data():
     # Delete database and existing tables
-    drop_db_and_tables() 
+    await drop_db_and_tables() 
     # Create database and tables
-    create_db_and_tables()
+    await create_db_and_tables()
+    # Las versiones de los datos de las órdenes vuelven a empezar: se descartan las exportaciones cacheadas
+    shutil.rmtree(EXPORT_JOBS_DIR, ignore_errors=True)
 
-    with Session(engine) as session:
+    async with AsyncSession(engine, expire_on_commit=False) as session:
 
         # Create users
         try:
@@ -20,7 +28,7 @@ def seed_data():
             user2 = User(username="user2", email="user2@example.com", hashed_password=hash_password("password2"))
             admin1 = User(username="admin1", email="admin1@example.com", hashed_password=hash_password("password1"), role="admin")
             session.add_all([user0, user1, user2, admin1])
-            session.commit()
+            await session.commit()
         except Exception as e:
             print(f"Error creating users: {e}")
         
@@ -29,7 +37,7 @@ def seed_data():
             order_1 = Order(status="in progress", user_id=user1.id)
             order_2 = Order(status="in progress", user_id=user2.id)
             session.add_all([order_1, order_2])
-            session.commit()
+            await session.commit()
         except Exception as e:
             print(f"Error creating orders: {e}")
 
@@ -40,9 +48,18 @@ def seed_data():
             order_item_3 = OrderItem(order_id=order_2.id, product_id=1, quantity=3)
             order_item_4 = OrderItem(order_id=order_2.id, product_id=3, quantity=1)
             session.add_all([order_item_1, order_item_2, order_item_3, order_item_4])
-            session.commit()
+            await session.commit()
         except Exception as e:
             print(f"Error creating order items: {e}")
 
+        # Build the stats summary tables from the seeded data
+        try:
+            await rebuild_stats(session)
+        except Exception as e:
+            print(f"Error building stats: {e}")
+
+    # Cerrar las conexiones del pool antes de que termine el event loop
+    await engine.dispose()
+
 if __name__ == "__main__":
-    seed_data()
+    asyncio.run(seed_data())
@@ -0,0 +1,58 @@
+import os
+import pytest
+from fakeredis import FakeAsyncRedis
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+import auth.redis
+import utils.export_jobs
+import utils.order_cache
+import utils.order_events
+import utils.product_rank
+import utils.product_redis
+# Registran todas las tablas en SQLModel.metadata
+import models.order, models.order_event, models.order_item, models.stat
+from models.user import User
+
+# Módulos que importan el cliente compartido de db/redis.py
+REDIS_CLIENT_MODULES = [auth.redis, utils.export_jobs, utils.order_cache, utils.order_events, utils.product_rank, utils.product_redis]
+# Base de datos de los tests: SQLite (aiosqlite) en un fichero temporal por defecto;
+# TEST_DATABASE_URL permite usar una base de datos PostgreSQL vacía (postgresql+asyncpg://...)
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+@pytest.fixture(autouse=True)
+async def fake_redis(monkeypatch):
+    """Sustituye el cliente de Redis por uno en memoria (fakeredis) en todos los módulos que lo usan."""
+    client = FakeAsyncRedis(decode_responses=True)
+    for module in REDIS_CLIENT_MODULES:
+        monkeypatch.setattr(module, "redis_client", client)
+    yield client
+    await client.aclose()
+
+@pytest.fixture
+async def engine(tmp_path):
+    """Engine asíncrono con todas las tablas creadas (y eliminadas al terminar el test)."""
+    engine = create_async_engine(TEST_DATABASE_URL or f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    async with engine.begin() as connection:
+        await connection.run_sync(SQLModel.metadata.drop_all)
+        await connection.run_sync(SQLModel.metadata.create_all)
+    yield engine
+    async with engine.begin() as connection:
+        await connection.run_sync(SQLModel.metadata.drop_all)
+    await engine.dispose()
+
+@pytest.fixture
+async def session(engine):
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        yield session
+
+@pytest.fixture
+async def users(session):
+    """Usuarios de prueba: el usuario anonymous (propietario de las órdenes borradas) y dos clientes."""
+    users = [
+        User(username=username, email=f"{username}@example.com", hashed_password="not-a-real-hash")
+        for username in ("anonymous", "user1", "user2")
+    ]
+    session.add_all(users)
+    await session.commit()
+    return users
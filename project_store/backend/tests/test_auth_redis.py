@@ -0,0 +1,44 @@
+import asyncio
+import gc
+import logging
+from auth.jwt import create_access_token, verify_access_token
+from auth.redis import are_tokens_revoked, is_token_revoked, revoke_token
+
+async def test_revoked_token_is_rejected():
+    token = create_access_token({"sub": "user1", "user_id": 1}, "cliente")
+    other = create_access_token({"sub": "user2", "user_id": 2}, "cliente")
+
+    await revoke_token(token)
+
+    assert await is_token_revoked(token)
+    assert not await is_token_revoked(other)
+    assert await verify_access_token(token) is None
+    assert (await verify_access_token(other))["user_id"] == 2
+
+async def test_batch_revocation_check():
+    tokens = [create_access_token({"sub": f"user{i}", "user_id": i}, "cliente") for i in range(5)]
+    await revoke_token(tokens[1])
+    await revoke_token(tokens[3])
+
+    assert await are_tokens_revoked(tokens) == {token: i in (1, 3) for i, token in enumerate(tokens)}
+    assert await are_tokens_revoked([]) == {}
+
+async def test_token_checks_do_not_block_the_event_loop(caplog):
+    tokens = [create_access_token({"sub": f"user{i}", "user_id": i}, "cliente") for i in range(1000)]
+    await asyncio.gather(*(revoke_token(token) for token in tokens[::2]))
+    # En modo debug asyncio avisa de cualquier paso de una tarea que retenga el loop más de slow_callback_duration
+    loop = asyncio.get_running_loop()
+    loop.set_debug(True)
+    loop.slow_callback_duration = 0.05
+    # Una pasada completa del recolector de basura (con todos los módulos de los tests cargados) no es un bloqueo del código medido
+    gc.collect()
+    gc.disable()
+    try:
+        with caplog.at_level(logging.WARNING, logger="asyncio"):
+            results = await asyncio.gather(*(verify_access_token(token) for token in tokens))
+    finally:
+        gc.enable()
+        loop.set_debug(False)
+
+    assert [result is None for result in results] == [i % 2 == 0 for i in range(1000)]
+    assert [record.getMessage() for record in caplog.records if record.getMessage().startswith("Executing")] == []
@@ -0,0 +1,94 @@
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlmodel import select
+import crud.order
+import routes.order
+from auth.jwt import create_access_token
+from crud.order import create_orders, get_order_events, update_orders_status
+from crud.stat import get_user_order_counts
+from db.database import get_session
+from models.order import Order, OrderBase
+from models.order_event import OrderEvent
+
+@pytest.fixture
+async def api(session):
+    """Cliente HTTP de las rutas de órdenes sobre la sesión de los tests."""
+    app = FastAPI()
+    app.include_router(routes.order.router, prefix="/api/orders")
+
+    async def test_session():
+        yield session
+    app.dependency_overrides[get_session] = test_session
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+def _headers(user_id: int, role: str) -> dict:
+    return {"Authorization": f"Bearer {create_access_token({'user_id': user_id}, role)}"}
+
+async def _statuses(session) -> dict[int, str]:
+    session.expunge_all()
+    return {order.id: order.status for order in (await session.exec(select(Order))).all()}
+
+async def test_bulk_insert_returns_the_ids_of_the_created_rows(session, users, monkeypatch):
+    # Varios lotes de INSERT ... RETURNING
+    monkeypatch.setattr(crud.order, "BULK_INSERT_BATCH_SIZE", 3)
+    user1_id, user2_id = users[1].id, users[2].id
+    requested = [OrderBase(user_id=user1_id if i % 3 else user2_id, status="paid" if i % 2 else "in progress") for i in range(8)]
+
+    created = await create_orders(session, requested)
+
+    assert [(order.user_id, order.status) for order in created] == [(order.user_id, order.status) for order in requested]
+    assert len({order.id for order in created}) == 8
+    stored = {order.id: (order.user_id, order.status) for order in (await session.exec(select(Order))).all()}
+    assert stored == {order.id: (order.user_id, order.status) for order in created}
+    assert sorted((stat.user_id, stat.order_count) for stat in await get_user_order_counts(session)) == [(user1_id, 5), (user2_id, 3)]
+    assert [(event.event_type, event.to_status) for event in await get_order_events(session, created[1].id)] == [("created", "paid")]
+
+async def test_bulk_insert_with_an_invalid_status_writes_nothing(session, users):
+    with pytest.raises(ValueError):
+        await create_orders(session, [OrderBase(user_id=users[1].id), OrderBase(user_id=users[1].id, status="lost")])
+
+    assert await _statuses(session) == {}
+
+async def test_mixed_source_batch_with_an_invalid_transition_is_not_partially_applied(session, users):
+    created = await create_orders(session, [OrderBase(user_id=users[1].id, status=status) for status in ("in progress", "paid", "cancelled")])
+    ids = [order.id for order in created]
+    before = await _statuses(session)
+
+    # paid -> delivered es válida, pero in progress -> delivered y cancelled -> delivered no
+    with pytest.raises(ValueError, match=f"{ids[0]}, {ids[2]}"):
+        await update_orders_status(session, "delivered", ids=ids)
+
+    assert await _statuses(session) == before
+    assert (await session.exec(select(OrderEvent).where(OrderEvent.event_type == "status_changed"))).all() == []
+
+async def test_mixed_source_batch_records_the_source_status_of_each_order(session, users):
+    created = await create_orders(session, [OrderBase(user_id=users[1].id, status=status) for status in ("in progress", "paid", "delivered")])
+    ids = [order.id for order in created]
+
+    assert await update_orders_status(session, "cancelled", ids=ids) == ids
+
+    assert set((await _statuses(session)).values()) == {"cancelled"}
+    events = (await session.exec(select(OrderEvent).where(OrderEvent.event_type == "status_changed"))).all()
+    assert sorted((event.order_id, event.from_status, event.to_status) for event in events) == [
+        (ids[0], "in progress", "cancelled"), (ids[1], "paid", "cancelled"), (ids[2], "delivered", "cancelled"),
+    ]
+
+async def test_bulk_routes_are_admin_only(api, session, users):
+    user_id = users[1].id
+    client_headers = _headers(user_id, "cliente")
+
+    assert (await api.post("/api/orders/bulk", json=[{"user_id": user_id}], headers=client_headers)).status_code == 403
+    assert (await api.put("/api/orders/bulk/status", json={"status": "paid", "from_status": "in progress"}, headers=client_headers)).status_code == 403
+    assert (await api.post("/api/orders/bulk", json=[{"user_id": user_id}])).status_code == 401
+    assert await _statuses(session) == {}
+
+    admin_headers = _headers(users[0].id, "admin")
+    response = await api.post("/api/orders/bulk", json=[{"user_id": user_id}, {"user_id": user_id}], headers=admin_headers)
+    assert response.status_code == 201
+    ids = [order["id"] for order in response.json()]
+    response = await api.put("/api/orders/bulk/status", json={"status": "delivered", "ids": ids}, headers=admin_headers)
+    assert response.status_code == 400
+    response = await api.put("/api/orders/bulk/status", json={"status": "paid", "ids": ids}, headers=admin_headers)
+    assert response.json() == {"updated": 2, "ids": ids}
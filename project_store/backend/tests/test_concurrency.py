@@ -0,0 +1,49 @@
+import asyncio
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from crud.order import create_order
+from crud.order_item import create_order_item, set_order_item_quantities
+from models.order import Order
+from models.order_item import OrderItem
+from models.stat import ProductQuantityStat
+
+CONCURRENT_WRITES = 20
+
+async def _in_own_session(engine, write, *args):
+    """Ejecuta la escritura en su propia sesión (conexión y transacción), como una petición independiente."""
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        return await write(session, *args)
+
+async def _line_and_stat(session, order_id: int, product_id: int):
+    quantity = (await session.exec(
+        select(OrderItem.quantity).where((OrderItem.order_id == order_id) & (OrderItem.product_id == product_id))
+    )).first()
+    total = (await session.exec(select(ProductQuantityStat.total_quantity).where(ProductQuantityStat.product_id == product_id))).first()
+    return quantity, total
+
+async def test_concurrent_increments_of_one_line_are_not_lost(engine, session, users):
+    order = await create_order(session, Order(user_id=users[1].id))
+
+    await asyncio.gather(*(
+        _in_own_session(engine, create_order_item, OrderItem(order_id=order.id, product_id=1, quantity=1))
+        for _ in range(CONCURRENT_WRITES)
+    ))
+
+    assert await _line_and_stat(session, order.id, 1) == (CONCURRENT_WRITES, CONCURRENT_WRITES)
+
+
+async def test_bulk_quantities_and_concurrent_line_writes_keep_stats_exact(engine, session, users):
+    order = await create_order(session, Order(user_id=users[1].id))
+    await create_order_item(session, OrderItem(order_id=order.id, product_id=1, quantity=1))
+
+    # Los cambios en bloque leen las cantidades actuales para calcular los deltas mientras otras peticiones
+    # crean (producto 2) o incrementan (producto 1) líneas de la misma orden
+    writes = []
+    for i in range(CONCURRENT_WRITES):
+        writes.append(_in_own_session(engine, set_order_item_quantities, order.id, {1: 5, 2: 5, 3: i % 2}))
+        writes.append(_in_own_session(engine, create_order_item, OrderItem(order_id=order.id, product_id=1 + i % 2, quantity=1)))
+    await asyncio.gather(*writes)
+
+    for product_id in (1, 2, 3):
+        quantity, total = await _line_and_stat(session, order.id, product_id)
+        assert (quantity or 0) == (total or 0), product_id
@@ -0,0 +1,137 @@
+from contextlib import contextmanager
+from sqlalchemy import event, insert, update
+import pytest
+from crud.order import create_order, create_orders, delete_order, get_order_events, get_orders_with_items, update_order, update_orders_status
+from crud.order_item import create_order_item, delete_order_item_by_order_id_and_product_id, get_order_items_by_order_id, set_order_item_quantities, update_order_item
+from crud.stat import get_top_products, get_user_order_counts
+from models.order import Order, OrderBase
+from models.order_item import OrderItem
+from utils.order_events import ORDER_EVENTS_STREAM
+
+async def test_order_lifecycle_with_async_session(session, users):
+    _, user1, user2 = users
+    order = await create_order(session, Order(user_id=user1.id))
+    await create_order_item(session, OrderItem(order_id=order.id, product_id=1, quantity=2))
+    await create_order_item(session, OrderItem(order_id=order.id, product_id=1, quantity=3))
+    await create_order_item(session, OrderItem(order_id=order.id, product_id=2, quantity=1))
+    await update_order_item(session, OrderItem(order_id=order.id, product_id=2, quantity=4))
+    await delete_order_item_by_order_id_and_product_id(session, order.id, 2)
+    await update_order(session, order.id, {"status": "paid", "user_id": user2.id})
+
+    orders = await get_orders_with_items(session, id=None, user_id=user2.id, skip=None, limit=None)
+
+    assert [(order["status"], order["items"]) for order in orders] == [("paid", [{"product_id": 1, "quantity": 5}])]
+    assert [(stat.user_id, stat.order_count) for stat in await get_user_order_counts(session)] == [(user2.id, 1)]
+    assert [(stat.product_id, stat.total_quantity) for stat in await get_top_products(session)] == [(1, 5)]
+
+async def test_deleted_orders_move_to_the_anonymous_user(session, users):
+    anonymous, user1, _ = users
+    order = await create_order(session, Order(user_id=user1.id))
+
+    await delete_order(session, order.id, user1.id)
+
+    assert await get_orders_with_items(session, id=None, user_id=user1.id, skip=None, limit=None) == []
+    assert [(stat.user_id, stat.order_count) for stat in await get_user_order_counts(session)] == [(anonymous.id, 1)]
+
+
+@contextmanager
+def count_statements(engine):
+    """Cuenta las sentencias SQL enviadas a la base de datos dentro del bloque."""
+    statements = []
+
+    def before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+async def test_listing_orders_with_items_uses_a_constant_number_of_queries(engine, session, users):
+    counts = {}
+    for user, orders in ((users[1], 5), (users[2], 50)):
+        created = await create_orders(session, [OrderBase(user_id=user.id) for _ in range(orders)])
+        await session.exec(insert(OrderItem).values([
+            {"order_id": order.id, "product_id": product_id, "quantity": 1} for order in created for product_id in (1, 2, 3)
+        ]))
+        await session.commit()
+        session.expunge_all()
+
+        with count_statements(engine) as statements:
+            listed = await get_orders_with_items(session, id=None, user_id=user.id, skip=None, limit=None)
+        assert len(listed) == orders
+        assert all(len(order["items"]) == 3 for order in listed)
+        counts[orders] = len(statements)
+
+    # Sin N+1: las líneas se cargan en una sola consulta (json_agg en PostgreSQL, selectinload en el resto)
+    assert counts[5] == counts[50] <= 2
+
+async def test_bulk_quantities_check_ownership_in_the_locking_query(engine, session, users):
+    owner_id, other_id = users[1].id, users[2].id
+    order_id = (await create_order(session, Order(user_id=owner_id))).id
+
+    # Orden de otro usuario: no se escribe nada
+    assert await set_order_item_quantities(session, order_id, {1: 2}, other_id) is None
+    assert await get_order_items_by_order_id(session, order_id) == []
+
+    with count_statements(engine) as statements:
+        items = await set_order_item_quantities(session, order_id, {1: 2, 2: 3}, owner_id)
+    assert [(item.product_id, item.quantity) for item in items] == [(1, 2), (2, 3)]
+    # La orden se lee una única vez: la comprobación de propiedad va en el SELECT ... FOR UPDATE
+    order_reads = [statement for statement in statements if statement.lstrip().upper().startswith("SELECT") and 'FROM "order"' in statement]
+    assert len(order_reads) == 1
+
+async def test_status_changes_are_recorded_in_the_event_log(session, users):
+    order = await create_order(session, Order(user_id=users[1].id))
+    await update_order(session, order.id, {"status": "paid", "user_id": users[1].id})
+
+    events = await get_order_events(session, order.id)
+
+    assert [(event.event_type, event.from_status, event.to_status) for event in events] == [
+        ("created", None, "in progress"), ("status_changed", "in progress", "paid")
+    ]
+
+async def _published(fake_redis) -> list[dict]:
+    return [fields for _, fields in await fake_redis.xrange(ORDER_EVENTS_STREAM)]
+
+async def test_each_committed_event_is_published_once_to_the_stream(session, users, fake_redis):
+    order = await create_order(session, Order(user_id=users[1].id))
+    order_id, user_id = order.id, users[1].id
+    await fake_redis.delete(ORDER_EVENTS_STREAM)
+
+    await update_order(session, order_id, {"status": "paid", "user_id": user_id})
+
+    stored = (await get_order_events(session, order_id))[-1]
+    assert await _published(fake_redis) == [{
+        "id": str(stored.id), "order_id": str(order_id), "user_id": str(user_id), "event_type": "status_changed",
+        "from_status": "in progress", "to_status": "paid", "created_at": stored.created_at.isoformat(),
+    }]
+
+    # Sin cambio de estado o con una transición rechazada no se publica nada
+    await update_order(session, order_id, {"status": "paid", "user_id": user_id})
+    with pytest.raises(ValueError):
+        await update_order(session, order_id, {"status": "in progress", "user_id": user_id})
+    with pytest.raises(ValueError):
+        await update_orders_status(session, "in progress", ids=[order_id])
+    assert len(await _published(fake_redis)) == 1
+
+async def test_bulk_writes_publish_one_event_per_order(session, users, fake_redis):
+    created = await create_orders(session, [OrderBase(user_id=users[1].id) for _ in range(3)])
+    ids = [order.id for order in created]
+    await update_orders_status(session, "paid", from_status="in progress")
+
+    published = await _published(fake_redis)
+    assert [(int(event["order_id"]), event["event_type"]) for event in published] == (
+        [(id, "created") for id in ids] + [(id, "status_changed") for id in ids]
+    )
+    assert len({event["id"] for event in published}) == 6
+
+async def test_unknown_current_status_is_a_validation_error(session, users):
+    order = await create_order(session, Order(user_id=users[1].id))
+    # Estado guardado antes de que existiera la validación de estados
+    await session.exec(update(Order).where(Order.id == order.id).values(status="legacy"))
+    await session.commit()
+
+    with pytest.raises(ValueError, match="Invalid status transition from 'legacy' to 'paid'"):
+        await update_order(session, order.id, {"status": "paid", "user_id": users[1].id})
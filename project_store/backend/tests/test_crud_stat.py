@@ -0,0 +1,34 @@
+from crud.order import create_order, delete_order, get_orders_data_version, update_order
+from crud.order_item import create_order_item, update_order_item
+from models.order import Order
+from models.order_item import OrderItem
+
+async def test_data_version_changes_when_quantities_are_swapped(session, users):
+    _, user1, user2 = users
+    order_1 = await create_order(session, Order(user_id=user1.id))
+    order_2 = await create_order(session, Order(user_id=user2.id))
+    await create_order_item(session, OrderItem(order_id=order_1.id, product_id=1, quantity=2))
+    await create_order_item(session, OrderItem(order_id=order_2.id, product_id=1, quantity=3))
+    before = await get_orders_data_version(session)
+
+    # Mismo número de líneas y mismas sumas de cantidades: la exportación cambia y la versión también
+    await update_order_item(session, OrderItem(order_id=order_1.id, product_id=1, quantity=3))
+    await update_order_item(session, OrderItem(order_id=order_2.id, product_id=1, quantity=2))
+
+    assert await get_orders_data_version(session) > before
+
+async def test_data_version_is_scoped_by_user(session, users):
+    anonymous, user1, user2 = users
+    order = await create_order(session, Order(user_id=user1.id))
+    versions = [await get_orders_data_version(session, user_id) for user_id in (None, user1.id, user2.id)]
+
+    await create_order_item(session, OrderItem(order_id=order.id, product_id=1, quantity=1))
+    after_item = [await get_orders_data_version(session, user_id) for user_id in (None, user1.id, user2.id)]
+    await update_order(session, order.id, {"status": "paid", "user_id": user2.id})
+    after_move = [await get_orders_data_version(session, user_id) for user_id in (None, user1.id, user2.id)]
+    await delete_order(session, order.id, None)
+
+    assert after_item[0] > versions[0] and after_item[1] > versions[1] and after_item[2] == versions[2]
+    assert after_move[1] > after_item[1] and after_move[2] > after_item[2]
+    assert await get_orders_data_version(session, user2.id) > after_move[2]
+    assert await get_orders_data_version(session, anonymous.id) == 1
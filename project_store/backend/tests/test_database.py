@@ -0,0 +1,70 @@
+from sqlalchemy import insert, text
+from sqlmodel import SQLModel, select
+from crud.stat import backfill_stats, get_top_products, get_user_order_counts
+from db.database import create_db_and_tables
+from models.order import Order
+from models.order_item import OrderItem
+from models.stat import OrderDataVersion, ProductQuantityStat, UserOrderStat
+from models.order_event import OrderEvent
+from models.user import User
+
+# Tablas añadidas después de la primera versión del esquema
+NEW_TABLES = [UserOrderStat.__table__, ProductQuantityStat.__table__, OrderDataVersion.__table__, OrderEvent.__table__]
+
+async def test_startup_creates_missing_tables_and_backfills_stats(engine, session):
+    # Base de datos existente: órdenes y líneas, pero sin las tablas nuevas
+    async with engine.begin() as connection:
+        await connection.run_sync(SQLModel.metadata.drop_all, tables=NEW_TABLES)
+        await connection.execute(insert(User).values(id=1, username="user1", email="user1@example.com", hashed_password="-"))
+        await connection.execute(insert(Order).values(id=1, status="paid", user_id=1))
+        await connection.execute(insert(OrderItem), [
+            {"order_id": 1, "product_id": 1, "quantity": 2},
+            {"order_id": 1, "product_id": 2, "quantity": 5},
+        ])
+
+    await create_db_and_tables(engine)
+    assert await backfill_stats(session)
+
+    assert [(stat.user_id, stat.order_count) for stat in await get_user_order_counts(session)] == [(1, 1)]
+    assert [(stat.product_id, stat.total_quantity) for stat in await get_top_products(session)] == [(2, 5), (1, 2)]
+
+    # Reinicio: las tablas ya existen y los resúmenes no se vuelven a calcular
+    await create_db_and_tables(engine)
+    assert not await backfill_stats(session)
+    assert (await session.exec(select(Order.status))).all() == ["paid"]
+
+async def test_backfill_does_nothing_on_an_empty_database(engine, session):
+    await create_db_and_tables(engine)
+
+    assert not await backfill_stats(session)
+
+# Consultas de las rutas más frecuentes y el índice que debe resolverlas
+INDEXED_QUERIES = [
+    ('SELECT order_id, quantity FROM orderitem WHERE product_id = 1', "ix_orderitem_product_id"),
+    ('SELECT id, status FROM "order" WHERE user_id = 1 AND id > 5 ORDER BY id LIMIT 20', "ix_order_user_id_id"),
+    ('SELECT id FROM "order" WHERE created_at >= \'2026-01-01\'', "ix_order_created_at"),
+    ('SELECT id FROM "user" WHERE refresh_token = \'token\'', "ix_user_refresh_token"),
+]
+
+async def _plan(session, query: str) -> str:
+    if session.get_bind().dialect.name == "postgresql":
+        # Con las tablas vacías el planificador preferiría un seq scan: se desactiva para comprobar que el índice es utilizable
+        await session.exec(text("SET LOCAL enable_seqscan = off"))
+        return "\n".join(row[0] for row in (await session.exec(text(f"EXPLAIN {query}"))).all())
+    return "\n".join(row[-1] for row in (await session.exec(text(f"EXPLAIN QUERY PLAN {query}"))).all())
+
+async def test_hot_queries_use_the_model_indexes(engine, session):
+    for query, index in INDEXED_QUERIES:
+        assert index in await _plan(session, query), query
+
+async def test_startup_creates_missing_indexes_idempotently(engine, session):
+    # Base de datos creada antes de declarar los índices
+    async with engine.begin() as connection:
+        for _, index in INDEXED_QUERIES:
+            await connection.execute(text(f"DROP INDEX {index}"))
+
+    await create_db_and_tables(engine)
+    await create_db_and_tables(engine)
+
+    for query, index in INDEXED_QUERIES:
+        assert index in await _plan(session, query), query
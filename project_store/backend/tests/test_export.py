@@ -0,0 +1,133 @@
+import io
+import logging
+import os
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import insert
+import routes.export as export
+import utils.api_dummy_products
+from models.order import Order
+from models.order_item import OrderItem
+from utils.product_catalog import ProductCatalog
+
+PRODUCTS = 10
+
+async def _seed(session, users, rows: int):
+    user_id = users[1].id
+    orders = rows // PRODUCTS
+    await session.exec(insert(Order).values([{"id": order_id, "status": "paid", "user_id": user_id} for order_id in range(1, orders + 1)]))
+    await session.exec(insert(OrderItem).values([
+        {"order_id": order_id, "product_id": product_id, "quantity": 1}
+        for order_id in range(1, orders + 1) for product_id in range(1, PRODUCTS + 1)
+    ]))
+    await session.commit()
+
+ADMIN = {"user_id": 1, "role": "admin"}
+
+@pytest.fixture
+def export_db(engine, monkeypatch):
+    """Las exportaciones abren su propia sesión con el engine del módulo: se apunta a la base de datos de los tests."""
+    catalog = ProductCatalog()
+    catalog.update([{"id": id, "title": f"Product {id}", "description": "", "price": float(id)} for id in range(1, PRODUCTS + 1)])
+    monkeypatch.setattr(utils.api_dummy_products, "catalog", catalog)
+    monkeypatch.setattr(export, "engine", engine)
+    return engine
+
+def _fail_on_batch(monkeypatch, batch: int):
+    """Hace fallar la resolución de productos a partir del lote indicado (contando desde 1)."""
+    calls = []
+
+    async def fetch_products_by_ids(ids):
+        calls.append(ids)
+        if len(calls) >= batch:
+            raise RuntimeError("product API unavailable")
+        return await utils.api_dummy_products.fetch_products_by_ids(ids)
+    monkeypatch.setattr(export, "fetch_products_by_ids", fetch_products_by_ids)
+
+async def _body(response) -> str:
+    return "".join([chunk async for chunk in response.body_iterator])
+
+async def _collect(format: str) -> bytes:
+    return b"".join([chunk async for chunk in export._stream_arrow(None, format)])
+
+async def test_columnar_exports_buffer_batches_into_large_row_groups(export_db, session, users, monkeypatch):
+    # Lotes de lectura de 1000 líneas (iter_order_lines) acumulados en row groups de 1500
+    monkeypatch.setattr(export, "EXPORT_ROW_GROUP_SIZE", 1500)
+    await _seed(session, users, 4000)
+
+    parquet = pq.ParquetFile(io.BytesIO(await _collect("parquet")))
+    assert [parquet.metadata.row_group(i).num_rows for i in range(parquet.num_row_groups)] == [1500, 1500, 1000]
+    table = parquet.read()
+    assert table.num_rows == 4000
+    assert table.column("title")[0].as_py() == "Product 1"
+
+    reader = pa.ipc.open_stream(await _collect("arrow"))
+    assert [batch.num_rows for batch in reader] == [1500, 1500, 1000]
+
+async def test_csv_export_streams_header_and_rows(export_db, session, users):
+    assert await _body(await export.get_csv(ADMIN)) == "order_id,product_id,title,quantity,price\n"
+
+    await _seed(session, users, 2500)
+    lines = (await _body(await export.get_csv(ADMIN))).splitlines()
+
+    assert lines[:2] == ["order_id,product_id,title,quantity,price", "1,1,Product 1,1,1.0"]
+    assert len(lines) == 2501
+
+async def test_csv_export_error_before_the_first_chunk_is_a_500(export_db, session, users, monkeypatch):
+    await _seed(session, users, 100)
+    _fail_on_batch(monkeypatch, 1)
+
+    with pytest.raises(HTTPException) as error:
+        await export.get_csv(ADMIN)
+    assert error.value.status_code == 500
+
+async def test_csv_export_error_after_the_first_chunk_aborts_the_stream(export_db, session, users, monkeypatch, caplog):
+    # Tres lotes de lectura: el segundo falla cuando la respuesta ya ha empezado
+    await _seed(session, users, 2500)
+    _fail_on_batch(monkeypatch, 2)
+
+    response = await export.get_csv(ADMIN)
+    assert response.status_code == 200
+    with caplog.at_level(logging.ERROR, logger=export.logger.name), pytest.raises(Exception, match="product API unavailable"):
+        await _body(response)
+    assert "Exportación interrumpida" in caplog.text
+
+async def test_excel_export_error_is_a_500_and_removes_the_temporary_file(export_db, session, users, monkeypatch):
+    await _seed(session, users, 2500)
+    _fail_on_batch(monkeypatch, 2)
+    paths = []
+    write_excel = export._write_excel
+
+    async def record_path(path, user_id=None, progress=None):
+        paths.append(path)
+        await write_excel(path, user_id, progress)
+    monkeypatch.setattr(export, "_write_excel", record_path)
+
+    with pytest.raises(HTTPException) as error:
+        await export.get_excel(ADMIN)
+    assert error.value.status_code == 500
+    assert len(paths) == 1 and not os.path.exists(paths[0])
+
+@pytest.mark.parametrize("route", [export.get_parquet, export.get_arrow])
+async def test_columnar_export_error_before_the_first_chunk_is_a_500(export_db, session, users, monkeypatch, route):
+    await _seed(session, users, 100)
+    _fail_on_batch(monkeypatch, 1)
+
+    with pytest.raises(HTTPException) as error:
+        await route(ADMIN)
+    assert error.value.status_code == 500
+
+async def test_columnar_export_error_after_the_first_chunk_aborts_the_stream(export_db, session, users, monkeypatch, caplog):
+    # El primer row group (1000 filas) se envía antes de que falle el segundo lote
+    monkeypatch.setattr(export, "EXPORT_ROW_GROUP_SIZE", 1000)
+    await _seed(session, users, 2500)
+    _fail_on_batch(monkeypatch, 2)
+
+    response = await export.get_parquet(ADMIN)
+    assert response.status_code == 200
+    with caplog.at_level(logging.ERROR, logger=export.logger.name), pytest.raises(Exception, match="product API unavailable"):
+        async for _ in response.body_iterator:
+            pass
+    assert "Exportación interrumpida" in caplog.text
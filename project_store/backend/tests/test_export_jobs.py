@@ -0,0 +1,157 @@
+import asyncio
+import os
+import time
+import pytest
+from utils.export_jobs import DONE, FAILED, RUNNING, ExportJobManager, MemoryJobStore, RedisJobStore
+
+USER = {"user_id": 2, "role": "user"}
+
+class StubWriter:
+    """Exportación de prueba: cuenta las llamadas y, opcionalmente, espera a que el test la libere."""
+
+    def __init__(self, blocking: bool = False, error: str = None):
+        self.calls = 0
+        self.error = error
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+        if not blocking:
+            self.release.set()
+
+    async def __call__(self, path: str, current_user: dict, progress):
+        self.calls += 1
+        progress(1, 4)
+        self.started.set()
+        await self.release.wait()
+        if self.error:
+            raise RuntimeError(self.error)
+        progress(4, 4)
+        with open(path, "w") as file:
+            file.write(f"export of user {current_user['user_id']}")
+
+@pytest.fixture
+async def make_manager(tmp_path):
+    """Crea gestores de trabajos sobre un directorio temporal (se detienen al terminar el test)."""
+    managers = []
+
+    def make(writer, store=None, result_ttl=3600):
+        manager = ExportJobManager(store or MemoryJobStore(), workers=2, result_ttl=result_ttl, directory=str(tmp_path))
+        manager.register("csv", "csv", "text/csv", writer)
+        managers.append(manager)
+        return manager
+    yield make
+    for manager in managers:
+        await manager.stop()
+
+async def _finish(manager):
+    await manager._queue.join()
+
+async def test_identical_in_flight_requests_share_one_job(make_manager):
+    writer = StubWriter(blocking=True)
+    manager = make_manager(writer)
+
+    jobs = await asyncio.gather(*(manager.submit(USER, "csv", "v1") for _ in range(5)))
+    await writer.started.wait()
+
+    assert len({job["id"] for job in jobs}) == 1
+    writer.release.set()
+    await _finish(manager)
+    assert writer.calls == 1
+    assert (await manager.get(jobs[0]["id"]))["status"] == DONE
+
+async def test_finished_result_is_served_until_the_data_version_changes(make_manager):
+    writer = StubWriter()
+    manager = make_manager(writer)
+    first = await manager.submit(USER, "csv", "v1")
+    await _finish(manager)
+
+    again = await manager.submit(USER, "csv", "v1")
+    assert again["id"] == first["id"]
+    assert manager.result_path(again) is not None
+    assert writer.calls == 1
+
+    changed = await manager.submit(USER, "csv", "v2")
+    await _finish(manager)
+    assert changed["id"] != first["id"]
+    assert writer.calls == 2
+    assert manager.result_path(await manager.get(changed["id"])) != manager.result_path(again)
+
+async def test_result_file_is_reused_by_another_worker(make_manager):
+    # Otro worker (con su propio estado) encuentra el fichero por la clave de contenido
+    writer = StubWriter()
+    first = make_manager(writer)
+    await first.submit(USER, "csv", "v1")
+    await _finish(first)
+
+    job = await make_manager(writer).submit(USER, "csv", "v1")
+    assert job["status"] == DONE
+    assert writer.calls == 1
+
+async def test_progress_is_reported_while_the_job_runs(make_manager):
+    writer = StubWriter(blocking=True)
+    manager = make_manager(writer)
+    job = await manager.submit(USER, "csv", "v1")
+    await writer.started.wait()
+
+    running = await manager.get(job["id"])
+    assert (running["status"], running["processed"], running["total"]) == (RUNNING, 1, 4)
+
+    writer.release.set()
+    await _finish(manager)
+    done = await manager.get(job["id"])
+    assert (done["status"], done["processed"], done["total"]) == (DONE, 4, 4)
+
+async def test_failed_job_records_the_error_and_is_retried(make_manager, tmp_path):
+    writer = StubWriter(error="database unavailable")
+    manager = make_manager(writer)
+    job = await manager.submit(USER, "csv", "v1")
+    await _finish(manager)
+
+    failed = await manager.get(job["id"])
+    assert (failed["status"], failed["error"]) == (FAILED, "database unavailable")
+    assert manager.result_path(failed) is None
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".partial")]
+
+    # Un trabajo fallido no se reutiliza: la siguiente petición lo vuelve a generar
+    writer.error = None
+    retry = await manager.submit(USER, "csv", "v1")
+    await _finish(manager)
+    assert retry["id"] != job["id"]
+    assert (await manager.get(retry["id"]))["status"] == DONE
+
+async def test_expired_results_and_jobs_are_evicted(make_manager, tmp_path):
+    writer = StubWriter()
+    manager = make_manager(writer, result_ttl=60)
+    job = await manager.submit(USER, "csv", "v1")
+    await _finish(manager)
+    path = manager.result_path(await manager.get(job["id"]))
+
+    await manager.evict()
+    assert os.path.exists(path)
+
+    # Fichero y trabajo actualizados antes del TTL
+    expired = time.time() - 120
+    os.utime(path, (expired, expired))
+    (await manager.get(job["id"]))["updated_at"] = expired
+    await manager.evict()
+
+    assert not os.path.exists(path)
+    assert await manager.get(job["id"]) is None
+    again = await manager.submit(USER, "csv", "v1")
+    await _finish(manager)
+    assert again["id"] != job["id"]
+    assert writer.calls == 2
+
+async def test_redis_store_shares_jobs_between_workers(make_manager, fake_redis):
+    writer = StubWriter(blocking=True)
+    first = make_manager(writer, store=RedisJobStore())
+    second = make_manager(writer, store=RedisJobStore())
+
+    job = await first.submit(USER, "csv", "v1")
+    await writer.started.wait()
+    # El otro worker ve el trabajo en curso y no lo repite
+    assert (await second.submit(USER, "csv", "v1"))["id"] == job["id"]
+
+    writer.release.set()
+    await _finish(first)
+    assert (await second.get(job["id"]))["status"] == DONE
+    assert writer.calls == 1
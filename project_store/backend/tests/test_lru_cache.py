@@ -0,0 +1,84 @@
+import asyncio
+import json
+import pytest
+import utils.lru_cache
+import utils.product_redis as product_redis
+from utils.lru_cache import LRUCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(utils.lru_cache.time, "monotonic", clock)
+    return clock
+
+def test_least_recently_used_entry_is_evicted_first():
+    cache = LRUCache(max_entries=2, ttl=60)
+    cache.set(1, "a")
+    cache.set(2, "b")
+    # La lectura convierte la entrada 1 en la más reciente: se desaloja la 2
+    assert cache.get(1) == "a"
+    cache.set(3, "c")
+
+    assert (cache.get(1), cache.get(2), cache.get(3)) == ("a", None, "c")
+    assert cache.stats()["evictions"] == 1
+
+def test_memory_budget_evicts_until_it_fits():
+    cache = LRUCache(max_entries=10, ttl=60, max_bytes=100)
+    cache.set(1, "a", size=40)
+    cache.set(2, "b", size=40)
+    cache.set(3, "c", size=40)
+
+    assert cache.get(1) is None
+    assert cache.stats()["bytes"] == 80
+    # Sobrescribir una clave descuenta el tamaño anterior
+    cache.set(2, "b2", size=10)
+    assert cache.stats()["bytes"] == 50
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = LRUCache(max_entries=10, ttl=60)
+    cache.set(1, "a")
+
+    clock.now += 59
+    assert cache.get(1) == "a"
+    clock.now += 1
+    assert cache.get(1) is None
+    stats = cache.stats()
+    assert (stats["entries"], stats["hits"], stats["misses"]) == (0, 1, 1)
+
+async def _wait_for(condition, timeout: float = 2):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not await condition():
+        assert asyncio.get_running_loop().time() < deadline, "condition not met in time"
+        await asyncio.sleep(0.01)
+
+async def test_invalidations_from_other_workers_evict_local_copies(fake_redis, monkeypatch):
+    local_cache = LRUCache(max_entries=10, ttl=60)
+    monkeypatch.setattr(product_redis, "local_cache", local_cache)
+    for product_id in (1, 2, 3):
+        local_cache.set(product_id, ({"id": product_id}, 0))
+    listener = asyncio.create_task(product_redis.listen_product_invalidations())
+    try:
+        channel = product_redis.PRODUCT_INVALIDATION_CHANNEL
+
+        async def subscribed():
+            return (await fake_redis.pubsub_numsub(channel))[0][1] > 0
+
+        async def invalidated():
+            return local_cache.get(2) is None and local_cache.get(3) is None
+
+        await _wait_for(subscribed)
+        # Los avisos del propio worker se ignoran; los de otro worker descartan la copia local
+        await fake_redis.publish(channel, json.dumps({"origin": product_redis.WORKER_ID, "ids": [1]}))
+        await fake_redis.publish(channel, json.dumps({"origin": "other-worker", "ids": [2, 3]}))
+        await _wait_for(invalidated)
+        assert local_cache.get(1) == ({"id": 1}, 0)
+    finally:
+        listener.cancel()
+        await asyncio.gather(listener, return_exceptions=True)
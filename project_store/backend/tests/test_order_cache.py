@@ -0,0 +1,98 @@
+import asyncio
+import json
+import pytest
+from fastapi import Response
+import routes.order
+import utils.order_cache
+from crud.order import create_order, update_order
+from models.order import Order
+from utils.order_cache import ORDER_INVALIDATION_CHANNEL, WORKER_ID, OrderListingCache, listen_order_invalidations
+
+CLIENT = "cliente"
+
+@pytest.fixture
+def order_cache(monkeypatch):
+    """Caché de listados vacía para cada test (la del módulo es compartida por todo el proceso)."""
+    cache = OrderListingCache(max_entries=100, ttl=60)
+    monkeypatch.setattr(utils.order_cache, "order_cache", cache)
+    monkeypatch.setattr(routes.order, "order_cache", cache)
+    return cache
+
+async def _wait_for(condition, timeout: float = 2):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not await condition():
+        assert asyncio.get_running_loop().time() < deadline, "condition not met in time"
+        await asyncio.sleep(0.01)
+
+async def _list(session, user_id: int, role: str = CLIENT) -> list[int]:
+    orders = await routes.order.find_all(response=Response(), session=session, current_user={"user_id": user_id, "role": role})
+    return [order.id for order in orders]
+
+def test_hits_are_served_while_the_version_is_unchanged(order_cache):
+    key = order_cache.key(1, None, None, 20, None)
+    assert order_cache.get(key) is None
+    order_cache.set(key, [{"id": 1}])
+
+    assert order_cache.get(order_cache.key(1, None, None, 20, None)) == [{"id": 1}]
+    # Otros filtros u otro usuario son otras entradas
+    assert order_cache.get(order_cache.key(1, None, None, 10, None)) is None
+    assert order_cache.get(order_cache.key(2, None, None, 20, None)) is None
+    assert order_cache.stats()["hits"] == 1
+
+def test_bump_changes_the_user_and_global_versions(order_cache):
+    user1, user2, admin = order_cache.key(1, None), order_cache.key(2, None), order_cache.key(None, None)
+    for key in (user1, user2, admin):
+        order_cache.set(key, [])
+
+    order_cache.bump([1])
+
+    assert order_cache.get(order_cache.key(1, None)) is None
+    assert order_cache.get(order_cache.key(None, None)) is None
+    assert order_cache.get(order_cache.key(2, None)) == []
+    assert order_cache.stats()["global_version"] == 1
+
+async def test_order_writes_invalidate_the_owner_and_admin_listings(session, users, order_cache):
+    user1_id, user2_id = users[1].id, users[2].id
+    first = (await create_order(session, Order(user_id=user1_id))).id
+    await create_order(session, Order(user_id=user2_id))
+    assert await _list(session, user1_id) == [first]
+    assert len(await _list(session, None, "admin")) == 2
+    await _list(session, user2_id)
+    misses = order_cache.stats()["misses"]
+
+    # Sin escrituras: las tres lecturas salen de la caché
+    assert await _list(session, user1_id) == [first]
+    assert len(await _list(session, None, "admin")) == 2
+    await _list(session, user2_id)
+    assert order_cache.stats()["misses"] == misses
+
+    second = (await create_order(session, Order(user_id=user1_id))).id
+    await update_order(session, first, {"status": "paid", "user_id": user1_id})
+
+    assert await _list(session, user1_id) == [first, second]
+    assert len(await _list(session, None, "admin")) == 3
+    await _list(session, user2_id)
+    # Fallan el listado del propietario y el de administrador; el del otro usuario sigue en caché
+    assert order_cache.stats()["misses"] == misses + 2
+
+async def test_invalidations_from_other_workers_bump_the_local_version(fake_redis, order_cache):
+    order_cache.set(order_cache.key(1, None), [])
+    order_cache.set(order_cache.key(2, None), [])
+    listener = asyncio.create_task(listen_order_invalidations())
+    try:
+        async def subscribed():
+            return (await fake_redis.pubsub_numsub(ORDER_INVALIDATION_CHANNEL))[0][1] > 0
+
+        async def invalidated():
+            return order_cache.get(order_cache.key(2, None)) is None
+
+        await _wait_for(subscribed)
+        # Los avisos del propio worker ya se aplicaron al publicarlos y se ignoran; los de otro worker invalidan
+        await fake_redis.publish(ORDER_INVALIDATION_CHANNEL, json.dumps({"origin": WORKER_ID, "user_ids": [1]}))
+        await fake_redis.publish(ORDER_INVALIDATION_CHANNEL, json.dumps({"origin": "other-worker", "user_ids": [2]}))
+        await _wait_for(invalidated)
+        assert order_cache.get(order_cache.key(1, None)) == []
+        assert order_cache.stats()["global_version"] == 1
+    finally:
+        listener.cancel()
+        await asyncio.gather(listener, return_exceptions=True)
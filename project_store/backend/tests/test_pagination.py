@@ -0,0 +1,101 @@
+import base64
+import json
+from datetime import datetime, timezone
+import pytest
+from fastapi import HTTPException, Response
+from sqlalchemy import insert
+import routes.order
+import routes.order_item
+import routes.user
+import utils.api_dummy_products
+from models.order import Order
+from models.order_item import OrderItem
+from models.user import User
+from utils.pagination import decode_cursor, encode_cursor, fetch_limit, paginate
+from utils.product_catalog import ProductCatalog
+
+ADMIN = {"user_id": 1, "role": "admin"}
+
+async def _pages(find_all, limit: int, **params) -> list[tuple[list, str | None]]:
+    """Recorre un listado siguiendo la cabecera X-Next-Cursor; devuelve (ids de la página, cabecera) de cada página."""
+    pages, after = [], None
+    while True:
+        response = Response()
+        rows = await find_all(limit=limit, after=after, response=response, **params)
+        after = response.headers.get("X-Next-Cursor")
+        pages.append(([row.product_id if isinstance(row, OrderItem) else row.id for row in rows], after))
+        if after is None:
+            return pages
+        assert len(pages) <= 100, "pagination does not terminate"
+
+@pytest.fixture
+async def orders(session, users, monkeypatch):
+    """Diez órdenes creadas en el mismo instante (created_at empatado); las dos primeras con los mismos productos."""
+    catalog = ProductCatalog()
+    catalog.update([{"id": id, "title": f"Product {id}", "description": "", "price": float(id)} for id in range(1, 8)])
+    monkeypatch.setattr(utils.api_dummy_products, "catalog", catalog)
+    created_at = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    await session.exec(insert(Order).values([
+        {"id": order_id, "status": "paid", "user_id": users[1].id, "created_at": created_at} for order_id in range(1, 11)
+    ]))
+    await session.exec(insert(OrderItem).values([
+        {"order_id": order_id, "product_id": product_id, "quantity": 1}
+        for order_id in (1, 2) for product_id in range(1, 8)
+    ]))
+    await session.commit()
+
+def test_cursor_round_trip_and_invalid_cursors():
+    cursor = encode_cursor({"id": 42})
+    assert decode_cursor(cursor, ["id"]) == {"id": 42}
+
+    tampered = base64.urlsafe_b64encode(json.dumps({"id": "42 OR 1=1"}).encode()).decode()
+    for invalid in ("not-a-cursor", tampered, encode_cursor({"product_id": 1}), encode_cursor([42])):
+        with pytest.raises(ValueError, match="Invalid pagination cursor"):
+            decode_cursor(invalid, ["id"])
+
+def test_paginate_only_returns_a_cursor_when_there_are_more_rows():
+    rows = [{"id": id} for id in range(1, 5)]
+    assert fetch_limit(3) == 4 and fetch_limit(None) is None
+
+    assert paginate(rows, 3, "id") == (rows[:3], encode_cursor({"id": 3}))
+    assert paginate(rows[:3], 3, "id") == (rows[:3], None)
+    assert paginate(rows, None, "id") == (rows, None)
+
+@pytest.mark.parametrize("limit", [1, 3, 5, 10])
+async def test_orders_pages_have_no_duplicates_or_gaps(session, orders, limit):
+    pages = await _pages(routes.order.find_all, limit, session=session, current_user=ADMIN)
+
+    ids = [id for page, _ in pages for id in page]
+    assert ids == list(range(1, 11))
+    assert all(len(page) == limit for page, _ in pages[:-1])
+    # La última página (aunque esté completa) no devuelve la cabecera
+    assert pages[-1][0] and pages[-1][1] is None
+    assert len(pages) == -(-10 // limit)
+
+async def test_order_items_pages_stay_inside_the_order(session, orders):
+    # Las dos órdenes tienen los mismos product_id: el cursor no salta a las líneas de la otra orden
+    pages = await _pages(routes.order_item.find_all, 2, order_id=2, session=session, current_user=ADMIN)
+
+    assert [page for page, _ in pages] == [[1, 2], [3, 4], [5, 6], [7]]
+    assert pages[-1][1] is None
+
+async def test_users_pages_have_no_duplicates_or_gaps(session, users):
+    session.add_all([User(username=f"extra{i}", email=f"extra{i}@example.com", hashed_password="-") for i in range(4)])
+    await session.commit()
+    expected = [user.id for user in users[1:]] + list(range(users[-1].id + 1, users[-1].id + 5))
+
+    pages = await _pages(routes.user.find_all, 3, session=session, current_user=ADMIN)
+
+    assert [id for page, _ in pages for id in page] == expected
+    assert [len(page) for page, _ in pages] == [3, 3]
+    assert pages[-1][1] is None
+
+@pytest.mark.parametrize("find_all, params", [
+    (routes.order.find_all, {}),
+    (routes.user.find_all, {}),
+    (routes.order_item.find_all, {"order_id": 1}),
+])
+async def test_invalid_cursor_is_a_400(session, orders, find_all, params):
+    with pytest.raises(HTTPException) as error:
+        await find_all(limit=2, after="bm90LWpzb24=", response=Response(), session=session, current_user=ADMIN, **params)
+    assert error.value.status_code == 400
@@ -0,0 +1,94 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from fastapi import HTTPException
+from jinja2 import Environment
+import routes.export as export
+import utils.pdf_renderer as pdf_renderer_module
+from utils.pdf_renderer import PdfRenderer
+
+ADMIN = {"user_id": 1, "role": "admin"}
+
+def _slow_render(template_name: str, context: dict) -> bytes:
+    time.sleep(context.get("seconds", 0.2))
+    return b"%PDF-stub"
+
+@pytest.fixture
+def renderer(monkeypatch):
+    """Renderer de la ruta con una cola de un único PDF y un render lento en hilos en lugar de procesos."""
+    renderer = PdfRenderer(workers=1, max_pending=1, timeout=0.1)
+    renderer._executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(pdf_renderer_module, "_render_pdf", _slow_render)
+    monkeypatch.setattr(export, "pdf_renderer", renderer)
+
+    async def find_all(session, current_user):
+        return []
+    monkeypatch.setattr(export, "find_all", find_all)
+    yield renderer
+    renderer._executor.shutdown(wait=True)
+
+async def _get_pdf():
+    return await export.get_pdf(session=None, current_user=ADMIN)
+
+async def test_pdf_route_returns_504_when_the_render_times_out(renderer):
+    with pytest.raises(HTTPException) as error:
+        await _get_pdf()
+
+    assert error.value.status_code == 504
+    assert renderer.stats()["timeouts"] == 1
+
+async def test_pdf_route_returns_429_when_the_queue_is_full(renderer):
+    renderer.timeout = 5
+    first = asyncio.create_task(_get_pdf())
+    await asyncio.sleep(0.05)
+
+    with pytest.raises(HTTPException) as error:
+        await _get_pdf()
+    assert error.value.status_code == 429
+
+    # El hueco se libera al terminar el render en curso
+    assert (await first).body == b"%PDF-stub"
+    assert (await _get_pdf()).status_code == 200
+    stats = renderer.stats()
+    assert (stats["rejected"], stats["rendered"], stats["pending"]) == (1, 2, 0)
+
+async def test_timed_out_render_keeps_its_slot_until_it_finishes(renderer):
+    with pytest.raises(HTTPException):
+        await _get_pdf()
+    # El proceso sigue trabajando: la cola sigue llena aunque la petición haya expirado
+    with pytest.raises(HTTPException) as error:
+        await _get_pdf()
+    assert error.value.status_code == 429
+
+    await asyncio.sleep(0.2)
+    assert renderer.stats()["pending"] == 0
+
+def test_compiled_templates_are_reused(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_renderer_module, "TEMPLATES_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(pdf_renderer_module, "_environment", None)
+    compiled = []
+    compile = Environment.compile
+
+    def counting_compile(self, *args, **kwargs):
+        compiled.append(args)
+        return compile(self, *args, **kwargs)
+    monkeypatch.setattr(Environment, "compile", counting_compile)
+
+    environment = pdf_renderer_module._get_environment()
+    template = environment.get_template("pdf_template.html")
+    assert pdf_renderer_module._get_environment() is environment
+    assert environment.get_template("pdf_template.html") is template
+    assert len(compiled) == 1
+
+    # Un proceso nuevo del pool carga el bytecode compilado del disco en lugar de volver a compilar
+    monkeypatch.setattr(pdf_renderer_module, "_environment", None)
+    pdf_renderer_module._get_environment().get_template("pdf_template.html")
+    assert len(compiled) == 1
+    assert len(list(tmp_path.iterdir())) == 1
+
+def test_template_renders_to_pdf(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_renderer_module, "TEMPLATES_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(pdf_renderer_module, "_environment", None)
+
+    assert pdf_renderer_module._render_pdf("pdf_template.html", {"order_data": []}).startswith(b"%PDF")
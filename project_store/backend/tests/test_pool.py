@@ -0,0 +1,16 @@
+from sqlalchemy.ext.asyncio import create_async_engine
+from db.pool import InstrumentedPool, pool_status
+
+SETTINGS = {"pool_size": 2, "max_overflow": 3, "pool_timeout": 5.0, "pool_recycle": 60, "pool_pre_ping": True}
+
+async def test_pool_status_reports_usage_and_configured_settings(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}", poolclass=InstrumentedPool, **SETTINGS)
+    try:
+        async with engine.connect():
+            status = pool_status(engine, SETTINGS)
+    finally:
+        await engine.dispose()
+
+    assert status["pool_class"] == "InstrumentedPool"
+    assert (status["size"], status["checked_out"], status["overflow"]) == (2, 1, 0)
+    assert (status["max_overflow"], status["timeout"], status["recycle"], status["pre_ping"]) == (3, 5.0, 60, True)
@@ -0,0 +1,76 @@
+import httpx
+import pytest
+import utils.product_catalog as product_catalog
+from utils.product_catalog import ProductCatalog, sync_catalog
+
+PRODUCTS_V1 = [
+    {"id": 1, "title": "Red phone", "description": "Smartphone with a red case", "price": 100.0},
+    {"id": 2, "title": "Blue phone", "description": "Smartphone with a blue case", "price": 120.0},
+    {"id": 3, "title": "Laptop", "description": "Thin laptop", "price": 900.0},
+]
+# Cambia el producto 2, elimina el 3 y añade el 4
+PRODUCTS_V2 = [
+    PRODUCTS_V1[0],
+    {"id": 2, "title": "Green phone", "description": "Smartphone with a green case", "price": 110.0},
+    {"id": 4, "title": "Tablet", "description": "Tablet with a stylus", "price": 300.0},
+]
+
+class DummyJsonStub:
+    """API de productos local que responde 304 si el If-None-Match coincide con la versión actual."""
+
+    def __init__(self):
+        self.version = 1
+        self.requests: list[httpx.Request] = []
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        etag = f'"v{self.version}"'
+        if request.headers.get("If-None-Match") == etag:
+            return httpx.Response(304, headers={"ETag": etag})
+        products = PRODUCTS_V1 if self.version == 1 else PRODUCTS_V2
+        return httpx.Response(200, json={"products": products, "total": len(products)}, headers={"ETag": etag})
+
+@pytest.fixture
+def catalog(monkeypatch):
+    catalog = ProductCatalog()
+    monkeypatch.setattr(product_catalog, "catalog", catalog)
+    return catalog
+
+def _ids(products: list[dict]) -> list[int]:
+    return [product["id"] for product in products]
+
+async def test_sync_keeps_the_index_on_304_and_updates_it_on_200(catalog):
+    stub = DummyJsonStub()
+    async with httpx.AsyncClient(transport=httpx.MockTransport(stub.handler)) as client:
+        assert await sync_catalog(client)
+        assert (catalog.ready, catalog.etag) == (True, '"v1"')
+        assert _ids(catalog.search("blue")) == [2]
+        index = catalog.index
+
+        # Sin cambios: petición condicional, 304 y el índice se mantiene
+        assert not await sync_catalog(client)
+        assert stub.requests[-1].headers["If-None-Match"] == '"v1"'
+        assert catalog.index is index
+        assert _ids(catalog.search("blue")) == [2]
+
+        # Nueva versión: 200 y reindexado de los productos modificados, añadidos y eliminados
+        stub.version = 2
+        assert await sync_catalog(client)
+
+    assert catalog.etag == '"v2"'
+    assert _ids(catalog.search("blue")) == []
+    assert _ids(catalog.search("green")) == [2]
+    assert _ids(catalog.search("laptop")) == []
+    assert _ids(catalog.search("tablet")) == [4]
+    assert catalog.get(3) is None
+
+def test_local_search_and_pagination(catalog):
+    catalog.update(PRODUCTS_V1)
+
+    assert _ids(catalog.search()) == [1, 2, 3]
+    assert _ids(catalog.search(skip=1, limit=1)) == [2]
+    assert _ids(catalog.search(limit=0)) == [1, 2, 3]
+    # Búsqueda por prefijo en título y descripción
+    assert sorted(_ids(catalog.search("smart"))) == [1, 2]
+    assert _ids(catalog.search("red phone")) == [1]
+    assert len(catalog.search("phone", skip=1, limit=5)) == 1
@@ -0,0 +1,64 @@
+import asyncio
+import httpx
+import pytest
+import utils.api_dummy_products as api_dummy_products
+import utils.product_redis as product_redis
+from utils.api_dummy_products import fetch_products_by_ids
+from utils.lru_cache import LRUCache
+from utils.product_catalog import ProductCatalog
+from utils.product_redis import retrieve_product, retrieve_product_entries, store_product
+
+CONCURRENT_MISSES = 20
+
+class DummyJsonStub:
+    """API de productos local: cuenta las peticiones y puede retenerlas hasta que se libera el evento."""
+
+    def __init__(self, title: str = "Phone"):
+        self.title = title
+        self.requests = 0
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        await self.release.wait()
+        product_id = int(request.url.path.rsplit("/", 1)[-1])
+        return httpx.Response(200, json={"id": product_id, "title": self.title, "description": "", "price": 9.5})
+
+@pytest.fixture(autouse=True)
+def empty_caches(monkeypatch):
+    """Catálogo local vacío y caché en memoria propia para que cada test llegue a Redis y a la API."""
+    monkeypatch.setattr(api_dummy_products, "catalog", ProductCatalog())
+    monkeypatch.setattr(product_redis, "local_cache", LRUCache(max_entries=100, ttl=60))
+
+async def test_concurrent_misses_for_one_product_share_one_upstream_fetch():
+    stub = DummyJsonStub()
+    stub.release.clear()
+    async with httpx.AsyncClient(transport=httpx.MockTransport(stub.handler)) as client:
+        requests = [asyncio.create_task(fetch_products_by_ids([7], client=client)) for _ in range(CONCURRENT_MISSES)]
+        # Todas las peticiones fallan la caché antes de que responda la API
+        await asyncio.sleep(0.05)
+        stub.release.set()
+        results = await asyncio.gather(*requests)
+
+    assert stub.requests == 1
+    assert all(result[7]["title"] == "Phone" for result in results)
+    assert (await retrieve_product(7))["title"] == "Phone"
+
+async def test_stale_product_is_served_immediately_and_refreshed_in_background(monkeypatch):
+    monkeypatch.setattr(product_redis, "PRODUCT_CACHE_TTL_JITTER", 0)
+    # Producto expirado pero dentro de la ventana stale
+    await store_product({"id": 7, "title": "Old phone", "description": "", "price": 9.5}, expiration=-1)
+    assert await retrieve_product(7) is None
+    stub = DummyJsonStub(title="New phone")
+    stub.release.clear()
+    async with httpx.AsyncClient(transport=httpx.MockTransport(stub.handler)) as client:
+        result = await fetch_products_by_ids([7], client=client)
+        assert result[7]["title"] == "Old phone"
+
+        stub.release.set()
+        await asyncio.gather(*api_dummy_products._background_refreshes)
+
+    assert stub.requests == 1
+    product, stale = (await retrieve_product_entries([7]))[7]
+    assert (product["title"], stale) == ("New phone", False)
@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from crud.order import create_order
+from crud.order_item import create_order_item, products_ranking_window
+from models.order import Order
+from models.order_item import OrderItem
+from utils.product_rank import ProductRankTracker, product_rank
+
+async def test_all_time_ranking_is_read_from_the_stats_table(session, users):
+    order = await create_order(session, Order(user_id=users[1].id))
+    await create_order_item(session, OrderItem(order_id=order.id, product_id=1, quantity=2))
+    await create_order_item(session, OrderItem(order_id=order.id, product_id=2, quantity=5))
+    # El ranking por ventanas no interviene en la ventana "all"
+    await product_rank.load([])
+
+    assert await products_ranking_window(session, 10, "all") == [
+        {"rank": 1, "product_id": 2, "total_quantity": 5},
+        {"rank": 2, "product_id": 1, "total_quantity": 2},
+    ]
+    assert await products_ranking_window(session, 1, "all") == [{"rank": 1, "product_id": 2, "total_quantity": 5}]
+
+async def test_time_windows_are_served_from_redis(session):
+    await product_rank.record({3: 4}, datetime.now(timezone.utc))
+
+    assert await products_ranking_window(session, 10, "hour") == [{"rank": 1, "product_id": 3, "total_quantity": 4}]
+    with pytest.raises(ValueError):
+        await products_ranking_window(session, 10, "month")
+
+async def test_order_item_writes_update_the_time_windows(session, users):
+    order = await create_order(session, Order(user_id=users[1].id))
+    await create_order_item(session, OrderItem(order_id=order.id, product_id=7, quantity=3))
+
+    assert await products_ranking_window(session, 10, "day") == [{"rank": 1, "product_id": 7, "total_quantity": 3}]
+
+async def test_tracker_only_keeps_lines_inside_the_windows():
+    tracker = ProductRankTracker()
+    now = datetime.now(timezone.utc)
+    await tracker.load([(1, now - timedelta(hours=2), 3), (2, now - timedelta(days=30), 9)])
+    await tracker.record({1: 1}, now)
+
+    assert await tracker.top(10, "hour") == [{"rank": 1, "product_id": 1, "total_quantity": 1}]
+    assert await tracker.top(10, "day") == [{"rank": 1, "product_id": 1, "total_quantity": 4}]
+    with pytest.raises(ValueError):
+        await tracker.top(10, "all")
+
+async def test_lines_slide_out_of_the_window_and_removed_quantities_are_subtracted():
+    tracker = ProductRankTracker()
+    # Los buckets expiran en Redis con el reloj real: la línea es reciente y se consulta la ventana en el futuro
+    created_at = datetime.now(timezone.utc)
+    start = created_at.timestamp()
+    await tracker.record({1: 5, 2: 2}, created_at, now=start)
+    await tracker.record({1: -5}, created_at, now=start)
+
+    assert await tracker.top(10, "hour", now=start + 60) == [{"rank": 1, "product_id": 2, "total_quantity": 2}]
+    assert await tracker.top(10, "hour", now=start + 2 * 3600) == []
+    assert await tracker.top(10, "day", now=start + 2 * 3600) == [{"rank": 1, "product_id": 2, "total_quantity": 2}]
+
+async def test_trackers_of_different_workers_share_the_ranking():
+    # Dos workers con su propio tracker sobre el mismo Redis
+    first, second = ProductRankTracker(), ProductRankTracker()
+    now = datetime.now(timezone.utc)
+    await first.record({1: 2, 2: 1}, now)
+    await second.record({2: 4}, now)
+
+    expected = [{"rank": 1, "product_id": 2, "total_quantity": 5}, {"rank": 2, "product_id": 1, "total_quantity": 2}]
+    assert await first.top(10, "week") == expected
+    assert await second.top(10, "week") == expected
+
+    # Reconstruir el ranking al arrancar otro worker reemplaza los buckets en lugar de sumarlos dos veces
+    await second.load([(1, now, 2), (2, now, 5)])
+    assert await first.top(10, "hour") == expected
@@ -1,6 +1,9 @@
+import asyncio
 import httpx
 import logging
-from utils.product_redis import store_product, retrieve_product
+from utils.product_redis import store_product, store_products, retrieve_product_entries
+from utils.http_client import http_get
+from utils.product_catalog import catalog
 
 # Configurar el logger
 logging.basicConfig(
@@ -16,12 +19,23 @@ logger = logging.getLogger(__name__)
 # Omitir logs de SQLAlchemy
 logging.getLogger("sqlalchemy.engine").setLevel(logging.DEBUG)
 
-async def fetch_products(q: str, limit: int, skip: int):
+# Número máximo de peticiones simultáneas a la API externa al resolver productos
+PRODUCT_FETCH_CONCURRENCY = 10
+_fetch_semaphore = asyncio.Semaphore(PRODUCT_FETCH_CONCURRENCY)
+
+# Peticiones en curso por ID de producto (single-flight): las peticiones concurrentes
+# que fallan la caché para el mismo producto esperan a una única llamada a la API externa
+_in_flight: dict[int, asyncio.Task] = {}
+# Referencias a las tareas de refresco en segundo plano (stale-while-revalidate)
+_background_refreshes: set[asyncio.Task] = set()
+
+async def fetch_products(q: str, limit: int, skip: int, client: httpx.AsyncClient = None):
     """Función para obtener los datos de products de la API Dummy.
     Args:
         - q: Query to search by that term
         - limit: Number of registers to return
         - skip: Number of registers to skip
+        - client: HTTP client to use (defaults to the shared application client)
     API call example:
         https://dummyjson.com/products?q=phone&limit=10&skip=10
     """
@@ -33,12 +47,11 @@ async def fetch_products(q: str, limit: int, skip: int):
     if skip:
         url = url + f"&skip={skip}"
     try:
-        async with httpx.AsyncClient(verify=False) as client:
-            response = await client.get(url, timeout=10.0)
-            response.raise_for_status()
-            data = response.json()
+        response = await http_get(url, client=client)
+        response.raise_for_status()
+        data = response.json()
 
-            return data["products"]
+        return data["products"]
         
     except httpx.RequestError as e:
         raise Exception(f"Error de conexión al consultar la API externa: {str(e)}")
@@ -48,27 +61,78 @@ async def fetch_products(q: str, limit: int, skip: int):
         raise Exception(f"Ocurrió un error inesperado: {str(e)}")
     
 
-async def fetch_product_by_id(id: str):
-    """Función para obtener los datos de un producto por ID.
+async def _request_product(id: int, client: httpx.AsyncClient = None) -> dict:
+    """Llama a la API externa para obtener un producto por ID."""
+    async with _fetch_semaphore:
+        url = f"https://dummyjson.com/products/{id}?select=id,title,description,price"
+        response = await http_get(url, client=client)
+        response.raise_for_status()
+        data = response.json()
+        logger.info(f"Producto obtenido: {data}")
+        return data
+
+def _single_flight(id: int, client: httpx.AsyncClient = None) -> tuple[asyncio.Task, bool]:
+    """Devuelve la petición en curso para el producto o crea una nueva.
+    Returns (task, created): created is True when the caller owns the new request and must cache its result.
+    """
+    task = _in_flight.get(id)
+    if task is not None:
+        return task, False
+    task = asyncio.create_task(_request_product(id, client))
+    _in_flight[id] = task
+    task.add_done_callback(lambda _: _in_flight.pop(id, None))
+    return task, True
+
+def _refresh_in_background(id: int, client: httpx.AsyncClient = None):
+    """Refresca un producto stale en segundo plano si no hay ya una petición en curso."""
+    if id in _in_flight:
+        return
+    async def refresh():
+        try:
+            task, _ = _single_flight(id, client)
+            await store_product(await task)
+        except Exception as e:
+            logger.error(f"Error refrescando el producto {id}: {str(e)}")
+    refresh_task = asyncio.create_task(refresh())
+    _background_refreshes.add(refresh_task)
+    refresh_task.add_done_callback(_background_refreshes.discard)
+
+async def fetch_products_by_ids(ids: list[int], client: httpx.AsyncClient = None) -> dict:
+    """Función para obtener los datos de varios productos por ID en lote.
+    Los productos del catálogo local se sirven directamente, los cacheados se obtienen de la caché
+    (local y Redis con un único MGET) y los que faltan se piden a la API externa de forma concurrente
+    (como máximo PRODUCT_FETCH_CONCURRENCY a la vez),
+    compartiendo las peticiones que ya estén en curso para el mismo producto.
+    Los productos stale se devuelven directamente y se refrescan en segundo plano.
     Args:
-        - id: ID of the product to fetch
-    API call example:
-        https://dummyjson.com/products/{id}
+        - ids: IDs of the products to fetch (duplicates are ignored)
+        - client: HTTP client to use (defaults to the shared application client)
+    Returns:
+        Dict {product_id: product}
     """
-    url = f"https://dummyjson.com/products/{id}?select=id,title,description,price"
+    product_ids = list(dict.fromkeys(int(id) for id in ids))
     try:
-        product = retrieve_product(id)
-        if product is None:
-            async with httpx.AsyncClient(verify=False) as client:
-                response = await client.get(url, timeout=10.0)
-                response.raise_for_status()
-                data = response.json()
-                logger.info(f"Producto obtenido: {data}")
-                store_product(data)
-                return data
-        else:
-            return product
-        
+        # Primero el catálogo local sincronizado, después la caché y por último la API externa
+        products = {}
+        for id in product_ids:
+            product = catalog.get(id)
+            if product is not None:
+                products[id] = product
+        cache_ids = [id for id in product_ids if id not in products]
+        for product_id, (product, stale) in (await retrieve_product_entries(cache_ids)).items():
+            products[product_id] = product
+            if stale:
+                _refresh_in_background(product_id, client)
+        missing_ids = [id for id in product_ids if id not in products]
+        if missing_ids:
+            flights = [_single_flight(id, client) for id in missing_ids]
+            # shield: si esta petición se cancela, la llamada compartida sigue para el resto
+            fetched = await asyncio.gather(*(asyncio.shield(task) for task, _ in flights))
+            await store_products([data for data, (_, created) in zip(fetched, flights) if created])
+            for data in fetched:
+                products[data["id"]] = data
+        return products
+
     except httpx.RequestError as e:
         raise Exception(f"Error de conexión al consultar la API externa: {str(e)}")
     except httpx.HTTPStatusError as e:
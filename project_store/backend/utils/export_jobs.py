@@ -0,0 +1,234 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+import uuid
+from typing import Awaitable, Callable
+from db.redis import redis_client
+
+from dotenv import load_dotenv
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Directorio donde se guardan los ficheros generados (direccionados por contenido)
+EXPORT_JOBS_DIR = os.getenv("EXPORT_JOBS_DIR", os.path.join(tempfile.gettempdir(), "project_store_exports"))
+# Número de tareas que generan exportaciones en paralelo
+EXPORT_JOBS_WORKERS = int(os.getenv("EXPORT_JOBS_WORKERS", 2))
+# Segundos que se conservan los ficheros generados y los trabajos terminados
+EXPORT_RESULT_TTL = int(os.getenv("EXPORT_RESULT_TTL", 3600))
+# Dónde se guarda el estado de los trabajos: "memory" (proceso actual) o "redis" (compartido entre workers)
+EXPORT_JOBS_BACKEND = os.getenv("EXPORT_JOBS_BACKEND", "memory")
+
+# Estados de un trabajo de exportación
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Firma de las funciones que generan una exportación: (path, current_user, progress)
+ExportWriter = Callable[[str, dict, Callable[[int, int], None]], Awaitable[None]]
+
+class MemoryJobStore:
+    """Estado de los trabajos en memoria del proceso."""
+
+    def __init__(self):
+        self._jobs: dict[str, dict] = {}
+        self._by_cache_key: dict[str, str] = {}
+
+    async def get(self, job_id: str) -> dict | None:
+        return self._jobs.get(job_id)
+
+    async def save(self, job: dict):
+        self._jobs[job["id"]] = job
+        self._by_cache_key[job["cache_key"]] = job["id"]
+
+    async def find_by_cache_key(self, cache_key: str) -> dict | None:
+        job_id = self._by_cache_key.get(cache_key)
+        return self._jobs.get(job_id) if job_id else None
+
+    async def evict(self, older_than: float):
+        for job_id, job in list(self._jobs.items()):
+            if job["updated_at"] < older_than:
+                del self._jobs[job_id]
+                if self._by_cache_key.get(job["cache_key"]) == job_id:
+                    del self._by_cache_key[job["cache_key"]]
+
+class RedisJobStore:
+    """Estado de los trabajos en Redis para que cualquier worker pueda consultarlos (expiran solos)."""
+
+    async def get(self, job_id: str) -> dict | None:
+        value = await redis_client.get(f"export_job:{job_id}")
+        return json.loads(value) if value is not None else None
+
+    async def save(self, job: dict):
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.setex(f"export_job:{job['id']}", EXPORT_RESULT_TTL, json.dumps(job))
+            pipe.setex(f"export_job_key:{job['cache_key']}", EXPORT_RESULT_TTL, job["id"])
+            await pipe.execute()
+
+    async def find_by_cache_key(self, cache_key: str) -> dict | None:
+        job_id = await redis_client.get(f"export_job_key:{cache_key}")
+        return await self.get(job_id) if job_id else None
+
+    async def evict(self, older_than: float):
+        # Las claves de Redis expiran con el TTL
+        pass
+
+class ExportJobManager:
+    """Cola de trabajos de exportación en segundo plano con caché de resultados en disco.
+    Jobs for the same (user, format, data version) share the same content-addressed result file.
+    """
+
+    def __init__(self, store, workers: int, result_ttl: int, directory: str):
+        self.store = store
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self.directory = directory
+        self._writers: dict[str, tuple[str, str, ExportWriter]] = {}
+        self._queue: asyncio.Queue | None = None
+        self._tasks: list[asyncio.Task] = []
+
+    def register(self, format: str, extension: str, media_type: str, writer: ExportWriter):
+        """Registra la función que genera un formato de exportación."""
+        self._writers[format] = (extension, media_type, writer)
+
+    @property
+    def formats(self) -> list[str]:
+        return list(self._writers)
+
+    def media_type(self, format: str) -> str:
+        return self._writers[format][1]
+
+    def start(self):
+        if self._queue is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._evict_periodically()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    def _result_path(self, cache_key: str, format: str) -> str:
+        return os.path.join(self.directory, f"{cache_key}.{self._writers[format][0]}")
+
+    def _is_fresh(self, path: str) -> bool:
+        return os.path.exists(path) and os.path.getmtime(path) > time.time() - self.result_ttl
+
+    async def submit(self, current_user: dict, format: str, data_version: str) -> dict:
+        """Crea un trabajo de exportación o reutiliza uno equivalente (en curso o con el resultado en caché)."""
+        if format not in self._writers:
+            raise ValueError(f"Invalid export format. Possible values are: {', '.join(self.formats)}.")
+        self.start()
+        scope = "all" if current_user["role"] == "admin" else f"user:{current_user['user_id']}"
+        cache_key = hashlib.sha256(f"{scope}|{format}|{data_version}".encode("utf-8")).hexdigest()
+        path = self._result_path(cache_key, format)
+        existing = await self.store.find_by_cache_key(cache_key)
+        if existing and existing["user_id"] == current_user["user_id"]:
+            if existing["status"] in (PENDING, RUNNING) or (existing["status"] == DONE and self._is_fresh(path)):
+                return existing
+        now = time.time()
+        job = {
+            "id": uuid.uuid4().hex,
+            "user_id": current_user["user_id"],
+            "role": current_user["role"],
+            "format": format,
+            "cache_key": cache_key,
+            "status": PENDING,
+            "processed": 0,
+            "total": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        # Mismo usuario/formato/versión de datos ya generado: el trabajo nace terminado
+        if self._is_fresh(path):
+            job["status"] = DONE
+            await self.store.save(job)
+            return job
+        await self.store.save(job)
+        await self._queue.put(job["id"])
+        return job
+
+    async def get(self, job_id: str) -> dict | None:
+        return await self.store.get(job_id)
+
+    def result_path(self, job: dict) -> str | None:
+        """Ruta del fichero de un trabajo terminado (None si ya no está disponible)."""
+        path = self._result_path(job["cache_key"], job["format"])
+        return path if job["status"] == DONE and os.path.exists(path) else None
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str):
+        job = await self.store.get(job_id)
+        if job is None:
+            return
+        job.update(status=RUNNING, updated_at=time.time())
+        await self.store.save(job)
+        path = self._result_path(job["cache_key"], job["format"])
+        partial_path = f"{path}.{job_id}.partial"
+
+        def progress(processed: int, total: int = None):
+            job["processed"] = processed
+            if total is not None:
+                job["total"] = total
+            job["updated_at"] = time.time()
+
+        try:
+            writer = self._writers[job["format"]][2]
+            current_user = {"user_id": job["user_id"], "role": job["role"]}
+            # El progreso se publica en el store mientras se genera el fichero
+            run = asyncio.create_task(writer(partial_path, current_user, progress))
+            while not run.done():
+                await asyncio.wait({run}, timeout=1)
+                await self.store.save(job)
+            run.result()
+            os.replace(partial_path, path)
+            job.update(status=DONE, updated_at=time.time())
+        except Exception as e:
+            logger.error(f"Error generando la exportación {job_id}: {str(e)}")
+            job.update(status=FAILED, error=str(e), updated_at=time.time())
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+        await self.store.save(job)
+
+    async def _evict_periodically(self):
+        """Elimina los ficheros y trabajos que han superado el TTL."""
+        while True:
+            await asyncio.sleep(min(self.result_ttl, 300))
+            try:
+                await self.evict()
+            except Exception as e:
+                logger.error(f"Error eliminando exportaciones caducadas: {str(e)}")
+
+    async def evict(self):
+        """Elimina los ficheros y trabajos actualizados hace más de result_ttl segundos."""
+        older_than = time.time() - self.result_ttl
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not name.endswith(".partial") and os.path.getmtime(path) < older_than:
+                os.remove(path)
+        await self.store.evict(older_than)
+
+export_jobs = ExportJobManager(
+    RedisJobStore() if EXPORT_JOBS_BACKEND == "redis" else MemoryJobStore(),
+    EXPORT_JOBS_WORKERS,
+    EXPORT_RESULT_TTL,
+    EXPORT_JOBS_DIR,
+)
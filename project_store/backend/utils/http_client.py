@@ -0,0 +1,53 @@
+import asyncio
+import os
+from urllib.parse import urlsplit
+import httpx
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# Configuración del pool de conexiones del cliente HTTP compartido
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 100))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", 20))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 30))
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", 20))
+HTTP_HTTP2 = os.getenv("HTTP_HTTP2", "true").lower() == "true"
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 10))
+
+_client: httpx.AsyncClient | None = None
+_host_semaphores: dict[str, asyncio.Semaphore] = {}
+
+def open_http_client() -> httpx.AsyncClient:
+    """Crea el cliente HTTP compartido por toda la aplicación (se llama desde el lifespan de FastAPI)."""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            verify=False,
+            http2=HTTP_HTTP2,
+            timeout=HTTP_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+        )
+    return _client
+
+async def close_http_client():
+    """Cierra el cliente HTTP compartido y sus conexiones keep-alive."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """Devuelve el cliente HTTP compartido, creándolo si la aplicación no lo ha abierto todavía."""
+    return open_http_client()
+
+async def http_get(url: str, client: httpx.AsyncClient = None, **kwargs) -> httpx.Response:
+    """GET limitando el número de peticiones simultáneas por host a HTTP_MAX_CONNECTIONS_PER_HOST."""
+    client = client or get_http_client()
+    host = urlsplit(url).netloc
+    semaphore = _host_semaphores.setdefault(host, asyncio.Semaphore(HTTP_MAX_CONNECTIONS_PER_HOST))
+    async with semaphore:
+        return await client.get(url, **kwargs)
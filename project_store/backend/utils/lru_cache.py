@@ -0,0 +1,77 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+
+class LRUCache:
+    """Caché en memoria del proceso con política LRU y expiración por TTL.
+    Args:
+        - max_entries: Maximum number of entries kept in memory
+        - ttl: Seconds an entry is considered valid
+        - max_bytes: Optional memory budget (sum of the sizes given to set())
+    """
+
+    def __init__(self, max_entries: int, ttl: float, max_bytes: int = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, _, value = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, size: int = 1):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, size, value)
+            self._bytes += size
+            while self._entries and (
+                len(self._entries) > self.max_entries
+                or (self.max_bytes is not None and self._bytes > self.max_bytes)
+            ):
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / requests if requests else 0.0,
+            }
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
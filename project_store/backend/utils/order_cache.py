@@ -0,0 +1,102 @@
+import asyncio
+import json
+import logging
+import os
+import uuid
+from threading import Lock
+from db.redis import redis_client
+from utils.lru_cache import LRUCache
+
+from dotenv import load_dotenv
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Caché en memoria de los listados de órdenes: límite de entradas, de memoria (bytes aproximados del JSON) y TTL.
+# El TTL acota lo que puede durar un listado obsoleto si se pierde algún aviso entre workers.
+ORDER_CACHE_MAX_ENTRIES = int(os.getenv("ORDER_CACHE_MAX_ENTRIES", 1000))
+ORDER_CACHE_MAX_BYTES = int(os.getenv("ORDER_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+ORDER_CACHE_TTL = float(os.getenv("ORDER_CACHE_TTL", 60))
+
+# Canal de Redis por el que los workers se avisan de los usuarios cuyas órdenes han cambiado
+ORDER_INVALIDATION_CHANNEL = "orders:invalidate"
+# Identificador de este proceso para ignorar sus propios avisos
+WORKER_ID = uuid.uuid4().hex
+
+class OrderListingCache:
+    """Caché cache-aside de los listados de órdenes por (usuario, filtros, cursor).
+    Las claves incluyen la versión del usuario; cualquier escritura sobre sus órdenes o líneas incrementa la versión,
+    de modo que las entradas anteriores dejan de ser alcanzables y la LRU las acaba desalojando.
+    Los listados de administrador (user_id None) usan una versión global que se incrementa con cualquier escritura.
+    """
+
+    def __init__(self, max_entries: int = ORDER_CACHE_MAX_ENTRIES, ttl: float = ORDER_CACHE_TTL,
+                 max_bytes: int = ORDER_CACHE_MAX_BYTES):
+        self._cache = LRUCache(max_entries=max_entries, ttl=ttl, max_bytes=max_bytes)
+        self._versions: dict[int, int] = {}
+        self._global_version = 0
+        self._lock = Lock()
+
+    def key(self, user_id: int, *filters) -> tuple:
+        """Clave con la versión actual: obtenerla antes de leer de la base de datos para que un resultado
+        leído antes de una escritura concurrente quede guardado bajo una versión ya obsoleta."""
+        with self._lock:
+            version = self._global_version if user_id is None else self._versions.get(user_id, 0)
+        return (user_id, version, filters)
+
+    def get(self, key: tuple):
+        return self._cache.get(key)
+
+    def set(self, key: tuple, orders: list[dict]):
+        self._cache.set(key, orders, size=len(json.dumps(orders, default=str)))
+
+    def bump(self, user_ids):
+        """Invalida los listados de los usuarios indicados (y todos los listados de administrador)."""
+        with self._lock:
+            for user_id in user_ids:
+                if user_id is not None:
+                    self._versions[user_id] = self._versions.get(user_id, 0) + 1
+            self._global_version += 1
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            versions = {"users": len(self._versions), "global_version": self._global_version}
+        return {**self._cache.stats(), **versions}
+
+order_cache = OrderListingCache()
+
+async def invalidate_user_orders(user_ids):
+    """Invalida los listados cacheados de los usuarios en este worker y avisa al resto. Llamar tras el commit."""
+    user_ids = sorted({user_id for user_id in user_ids if user_id is not None})
+    order_cache.bump(user_ids)
+    try:
+        await redis_client.publish(ORDER_INVALIDATION_CHANNEL, json.dumps({"origin": WORKER_ID, "user_ids": user_ids}))
+    except Exception as e:
+        # La escritura ya está confirmada: el resto de workers servirán el listado anterior como mucho ORDER_CACHE_TTL
+        logger.error(f"Error publicando la invalidación de órdenes: {str(e)}")
+
+async def listen_order_invalidations():
+    """Tarea en segundo plano que aplica las invalidaciones de listados de órdenes de otros workers."""
+    while True:
+        pubsub = redis_client.pubsub()
+        try:
+            await pubsub.subscribe(ORDER_INVALIDATION_CHANNEL)
+            async for message in pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                data = json.loads(message["data"])
+                if data["origin"] == WORKER_ID:
+                    continue
+                order_cache.bump(data["user_ids"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Sin avisos no se puede garantizar la coherencia: se vacía la caché y se reintenta
+            logger.error(f"Error en la suscripción de invalidación de órdenes: {str(e)}")
+            order_cache.clear()
+            await asyncio.sleep(5)
+        finally:
+            await pubsub.aclose()
@@ -0,0 +1,33 @@
+import logging
+import os
+from db.redis import redis_client
+
+from dotenv import load_dotenv
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Stream de Redis en el que se publican los eventos de las órdenes (created, status_changed) tras el commit
+ORDER_EVENTS_STREAM = os.getenv("ORDER_EVENTS_STREAM", "orders:events")
+# Longitud aproximada máxima del stream (MAXLEN ~): los consumidores atrasados pueden releer el registro order_event
+ORDER_EVENTS_MAXLEN = int(os.getenv("ORDER_EVENTS_MAXLEN", 100000))
+
+def _stream_fields(event: dict) -> dict:
+    # Los campos de un stream son cadenas: los valores nulos se envían vacíos
+    return {key: "" if value is None else value.isoformat() if hasattr(value, "isoformat") else str(value) for key, value in event.items()}
+
+async def publish_order_events(events: list[dict]):
+    """Publica los eventos ya confirmados en el stream de Redis (un XADD por evento en un único pipeline).
+    Llamar tras el commit: un consumidor (XREAD/XREADGROUP) nunca recibe eventos de una transacción deshecha.
+    Cada evento lleva el ID de su fila en order_event para que los consumidores puedan descartar duplicados.
+    """
+    if not events:
+        return
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for event in events:
+                pipe.xadd(ORDER_EVENTS_STREAM, _stream_fields(event), maxlen=ORDER_EVENTS_MAXLEN, approximate=True)
+            await pipe.execute()
+    except Exception as e:
+        # La escritura ya está confirmada y el evento está en order_event: los consumidores pueden recuperarlo de ahí
+        logger.error(f"Error publicando {len(events)} eventos de órdenes: {str(e)}")
@@ -0,0 +1,28 @@
+import base64
+import json
+
+def encode_cursor(values: dict) -> str:
+    """Codifica la posición de la última fila devuelta como un token opaco para la paginación por cursor."""
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(",", ":")).encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str, keys: list[str]) -> dict:
+    """Decodifica un token de paginación comprobando que contiene las claves esperadas."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if not isinstance(values, dict) or any(not isinstance(values.get(key), int) for key in keys):
+            raise ValueError()
+        return values
+    except Exception:
+        raise ValueError("Invalid pagination cursor.")
+
+def fetch_limit(limit: int | None) -> int | None:
+    """Filas a pedir a la base de datos para una página: una más que el límite para saber si hay página siguiente."""
+    return limit + 1 if limit is not None and limit > 0 else limit
+
+def paginate(rows: list, limit: int | None, key: str) -> tuple[list, str | None]:
+    """Recorta las filas leídas con fetch_limit a la página y calcula el cursor de la siguiente (None en la última página)."""
+    if limit is None or limit <= 0 or len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor({key: last[key] if isinstance(last, dict) else getattr(last, key)})
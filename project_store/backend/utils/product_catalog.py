@@ -0,0 +1,90 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+import httpx
+from utils.http_client import http_get
+from utils.product_search import ProductSearchIndex
+
+logger = logging.getLogger(__name__)
+
+# Catálogo completo de la API externa (limit=0 devuelve todos los productos)
+PRODUCT_CATALOG_URL = "https://dummyjson.com/products?limit=0&select=id,title,description,price"
+# Segundos entre sincronizaciones del catálogo local
+PRODUCT_CATALOG_SYNC_INTERVAL = int(os.getenv("PRODUCT_CATALOG_SYNC_INTERVAL", 300))
+# Número de productos devueltos por defecto cuando no se indica limit (igual que la API externa)
+DEFAULT_LIMIT = 30
+
+class ProductCatalog:
+    """Copia local en memoria del catálogo de productos de la API externa."""
+
+    def __init__(self):
+        self._products: dict[int, dict] = {}
+        self._ordered: list[dict] = []
+        self.index = ProductSearchIndex()
+        self.etag: str | None = None
+        self.last_sync: datetime | None = None
+
+    @property
+    def ready(self) -> bool:
+        """True una vez que el catálogo se ha sincronizado al menos una vez."""
+        return self.last_sync is not None
+
+    def get(self, product_id: int) -> dict | None:
+        return self._products.get(int(product_id))
+
+    def update(self, products: list[dict]) -> tuple[list[dict], list[int]]:
+        """Sustituye el catálogo por la nueva lista de productos.
+        Returns (changed, removed_ids): products added or modified since the last sync and IDs that disappeared.
+        """
+        new_products = {product["id"]: product for product in products}
+        changed = [product for id, product in new_products.items() if self._products.get(id) != product]
+        removed_ids = [id for id in self._products if id not in new_products]
+        self._products = new_products
+        self._ordered = sorted(new_products.values(), key=lambda product: product["id"])
+        # Solo se reindexan los productos que han cambiado
+        self.index.update(changed, removed_ids)
+        self.last_sync = datetime.now(timezone.utc)
+        return changed, removed_ids
+
+    def search(self, q: str = None, skip: int = None, limit: int = None) -> list[dict]:
+        """Busca productos por título o descripción y pagina el resultado.
+        Args:
+            - q: Query to search by those terms (prefix match, results ranked by relevance)
+            - skip: Number of registers to skip
+            - limit: Number of registers to return (0 returns all of them)
+        """
+        products = self._ordered
+        if q:
+            products = [self._products[product_id] for product_id in self.index.search(q)]
+        skip = skip or 0
+        limit = DEFAULT_LIMIT if limit is None else limit
+        return products[skip:skip + limit] if limit > 0 else products[skip:]
+
+catalog = ProductCatalog()
+
+async def sync_catalog(client: httpx.AsyncClient = None) -> bool:
+    """Descarga el catálogo de la API externa si ha cambiado (If-None-Match con el último ETag).
+    Returns True when the local catalog was updated.
+    """
+    headers = {"If-None-Match": catalog.etag} if catalog.etag else {}
+    response = await http_get(PRODUCT_CATALOG_URL, client=client, headers=headers)
+    if response.status_code == 304:
+        catalog.last_sync = datetime.now(timezone.utc)
+        return False
+    response.raise_for_status()
+    changed, removed_ids = catalog.update(response.json()["products"])
+    catalog.etag = response.headers.get("ETag")
+    logger.info(f"Catálogo de productos sincronizado: {len(changed)} modificados, {len(removed_ids)} eliminados")
+    return True
+
+async def run_catalog_sync():
+    """Tarea en segundo plano que mantiene sincronizado el catálogo local."""
+    while True:
+        try:
+            await sync_catalog()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error sincronizando el catálogo de productos: {str(e)}")
+        await asyncio.sleep(PRODUCT_CATALOG_SYNC_INTERVAL)
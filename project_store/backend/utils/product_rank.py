@@ -0,0 +1,102 @@
+import logging
+from datetime import datetime, timezone
+from db.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Ventanas de tiempo disponibles (segundos) sobre la fecha de creación de la orden
+RANK_WINDOWS = {"hour": 3600, "day": 86400, "week": 604800}
+# Buckets en los que se divide cada ventana (hour: 1 minuto, day: 24 minutos, week: 2,8 horas)
+RANK_BUCKETS_PER_WINDOW = 60
+# Prefijo de las claves de Redis del ranking
+RANK_KEY_PREFIX = "product_rank"
+
+def _timestamp(value: datetime) -> float:
+    # Las fechas se guardan en UTC; las que llegan sin zona horaria desde la base de datos se interpretan como UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+class ProductRankTracker:
+    """Ranking top-K de productos por cantidad pedida en ventanas deslizantes (hour, day, week), compartido en Redis.
+    Every window is split in time buckets stored as sorted sets (product_id -> quantity) that expire once they
+    slide out of the window. Writes add their deltas with ZINCRBY and reads sum the buckets of the window with
+    ZUNIONSTORE, so every worker sees the writes of the others and reading the top K never scans the order tables.
+    """
+
+    def __init__(self, windows: dict = RANK_WINDOWS, buckets_per_window: int = RANK_BUCKETS_PER_WINDOW,
+                 prefix: str = RANK_KEY_PREFIX):
+        self.windows = windows
+        self.buckets_per_window = buckets_per_window
+        self.prefix = prefix
+
+    def _bucket_seconds(self, window: str) -> int:
+        return max(self.windows[window] // self.buckets_per_window, 1)
+
+    def _bucket_key(self, window: str, bucket: int) -> str:
+        return f"{self.prefix}:{window}:{bucket}"
+
+    def _window_keys(self, window: str, now: float) -> list[str]:
+        """Buckets incluidos en la ventana que termina en now (el último, en curso, incluido)."""
+        last = int(now // self._bucket_seconds(window))
+        return [self._bucket_key(window, bucket) for bucket in range(last - self.buckets_per_window + 1, last + 1)]
+
+    def _add(self, pipe, quantities: dict[int, int], created_at: datetime, now: float):
+        """Añade las cantidades al bucket de cada ventana que todavía incluye created_at."""
+        timestamp = _timestamp(created_at)
+        for window, seconds in self.windows.items():
+            bucket_seconds = self._bucket_seconds(window)
+            bucket = int(timestamp // bucket_seconds)
+            if bucket <= int(now // bucket_seconds) - self.buckets_per_window:
+                continue
+            key = self._bucket_key(window, bucket)
+            for product_id, quantity in quantities.items():
+                if quantity != 0:
+                    pipe.zincrby(key, quantity, product_id)
+            # El bucket expira cuando sale de la ventana
+            pipe.expireat(key, int((bucket + 1) * bucket_seconds + seconds) + 1)
+
+    async def record(self, quantities: dict[int, int], created_at: datetime, now: float = None):
+        """Registra las variaciones de la cantidad pedida de los productos de una orden creada en created_at.
+        Llamar tras el commit."""
+        quantities = {product_id: quantity for product_id, quantity in quantities.items() if quantity != 0}
+        if not quantities:
+            return
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                self._add(pipe, quantities, created_at, now or datetime.now(timezone.utc).timestamp())
+                await pipe.execute()
+        except Exception as e:
+            # La escritura ya está confirmada: el ranking por ventanas se corrige al reconstruirlo desde la base de datos
+            logger.error(f"Error actualizando el ranking de productos: {str(e)}")
+
+    async def load(self, recent: list[tuple[int, datetime, int]], now: float = None):
+        """Reconstruye el ranking con las líneas de las órdenes recientes (product_id, created_at, quantity).
+        The buckets are replaced in a single transaction, so workers starting at the same time do not add the lines twice.
+        """
+        now = now or datetime.now(timezone.utc).timestamp()
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.delete(*[key for window in self.windows for key in self._window_keys(window, now)])
+            for product_id, created_at, quantity in recent:
+                self._add(pipe, {product_id: quantity}, created_at, now)
+            await pipe.execute()
+
+    async def top(self, k: int = 10, window: str = "day", now: float = None) -> list[dict]:
+        """Devuelve los K productos más pedidos en la ventana ("hour", "day" o "week")."""
+        if window not in self.windows:
+            raise ValueError(f"Invalid window. Possible values are: 'all', {', '.join(repr(name) for name in self.windows)}.")
+        now = now or datetime.now(timezone.utc).timestamp()
+        destination = f"{self.prefix}:{window}:top"
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.zunionstore(destination, self._window_keys(window, now))
+            # Las cantidades que se han quedado a cero o en negativo (líneas borradas) no cuentan
+            pipe.zrevrangebyscore(destination, "+inf", "(0", start=0, num=k, withscores=True)
+            pipe.delete(destination)
+            _, top, _ = await pipe.execute()
+        top = sorted(((int(product_id), int(quantity)) for product_id, quantity in top), key=lambda item: (-item[1], item[0]))
+        return [
+            {"rank": idx + 1, "product_id": product_id, "total_quantity": quantity}
+            for idx, (product_id, quantity) in enumerate(top)
+        ]
+
+product_rank = ProductRankTracker()
@@ -1,21 +1,132 @@
-import redis
+import asyncio
 from datetime import timedelta
-import os
 import json
+import logging
+import os
+import random
+import time
+import uuid
 from models.product import Product
+from db.redis import redis_client
+from utils.lru_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# TTL de los productos en Redis: jitter aleatorio para repartir las expiraciones y ventana
+# durante la que un producto expirado se sigue sirviendo mientras se refresca (stale-while-revalidate)
+PRODUCT_CACHE_TTL = int(os.getenv("PRODUCT_CACHE_TTL", 600))
+PRODUCT_CACHE_TTL_JITTER = int(os.getenv("PRODUCT_CACHE_TTL_JITTER", 60))
+PRODUCT_CACHE_STALE_TTL = int(os.getenv("PRODUCT_CACHE_STALE_TTL", 300))
+
+# Caché en memoria delante de Redis para los productos más consultados
+PRODUCT_LOCAL_CACHE_SIZE = int(os.getenv("PRODUCT_LOCAL_CACHE_SIZE", 1000))
+PRODUCT_LOCAL_CACHE_TTL = float(os.getenv("PRODUCT_LOCAL_CACHE_TTL", 60))
+local_cache = LRUCache(max_entries=PRODUCT_LOCAL_CACHE_SIZE, ttl=PRODUCT_LOCAL_CACHE_TTL)
+
+# Canal de Redis por el que los workers se avisan de los productos modificados
+PRODUCT_INVALIDATION_CHANNEL = "product:invalidate"
+# Identificador de este proceso para ignorar sus propios avisos
+WORKER_ID = uuid.uuid4().hex
+
+def _product_key(product_id: int) -> str:
+    """Clave de Redis de un producto (con prefijo para no mezclarla con los tokens revocados)."""
+    return f"product:{product_id}"
+
+async def _publish_invalidation(product_ids: list[int]):
+    """Avisa al resto de workers para que descarten su copia local de los productos."""
+    message = json.dumps({"origin": WORKER_ID, "ids": product_ids})
+    await redis_client.publish(PRODUCT_INVALIDATION_CHANNEL, message)
+
+def _cache_ttl(expiration: int) -> float:
+    """TTL de frescura con jitter para que los productos cacheados a la vez no expiren a la vez."""
+    return expiration + random.uniform(0, PRODUCT_CACHE_TTL_JITTER)
+
+def _serialize(product: Product, expiration: int) -> tuple[str, int]:
+    """Devuelve el valor a guardar en Redis y su TTL real (frescura + ventana stale)."""
+    fresh_for = _cache_ttl(expiration)
+    value = json.dumps({"product": product, "fresh_until": time.time() + fresh_for})
+    return value, int(fresh_for + PRODUCT_CACHE_STALE_TTL)
+
+def _deserialize(value: str) -> tuple[dict, float]:
+    data = json.loads(value)
+    return data["product"], data["fresh_until"]
+
+async def store_product(product: Product, expiration: int = PRODUCT_CACHE_TTL):
+    """Stores a product for 10 minutes (plus jitter and the stale window)."""
+    value, ttl = _serialize(product, expiration)
+    await redis_client.setex(_product_key(product['id']), timedelta(seconds=ttl), value)
+    local_cache.set(product['id'], _deserialize(value), size=len(value))
+    await _publish_invalidation([product['id']])
+
+async def store_products(products: list[Product], expiration: int = PRODUCT_CACHE_TTL):
+    """Stores several products for 10 minutes (plus jitter and the stale window) with a single SETEX pipeline."""
+    if not products:
+        return
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for product in products:
+            value, ttl = _serialize(product, expiration)
+            pipe.setex(_product_key(product['id']), timedelta(seconds=ttl), value)
+            local_cache.set(product['id'], _deserialize(value), size=len(value))
+        pipe.publish(PRODUCT_INVALIDATION_CHANNEL, json.dumps({"origin": WORKER_ID, "ids": [product['id'] for product in products]}))
+        await pipe.execute()
 
-from dotenv import load_dotenv
-load_dotenv()
+async def retrieve_product_entries(product_ids: list[int]) -> dict:
+    """Get several products by ID from the local cache and a single MGET for the rest.
+    Returns a dict {product_id: (product, is_stale)} containing only the cached products.
+    A product is stale once its TTL has expired but it is still inside the stale window.
+    """
+    entries = {}
+    remote_ids = []
+    for product_id in product_ids:
+        entry = local_cache.get(product_id)
+        if entry is not None:
+            entries[product_id] = entry
+        else:
+            remote_ids.append(product_id)
+    if remote_ids:
+        # MGET devuelve None para las claves inexistentes o expiradas: un único round trip sin carrera EXISTS/GET
+        values = await redis_client.mget([_product_key(product_id) for product_id in remote_ids])
+        for product_id, value in zip(remote_ids, values):
+            if value is not None:
+                entries[product_id] = _deserialize(value)
+                local_cache.set(product_id, entries[product_id], size=len(value))
+    now = time.time()
+    return {
+        product_id: (product, fresh_until <= now)
+        for product_id, (product, fresh_until) in entries.items()
+    }
 
-# Conexión a Redis
-REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
-REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
-redis_client = redis.StrictRedis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
+async def retrieve_products(product_ids: list[int]) -> dict:
+    """Get several fresh products by ID.
+    Returns a dict {product_id: product} containing only the cached, non-stale products.
+    """
+    entries = await retrieve_product_entries(product_ids)
+    return {product_id: product for product_id, (product, stale) in entries.items() if not stale}
 
-def store_product(product: Product, expiration: int = 600):
-    """Stores a product for 10 minutes."""
-    redis_client.setex(product['id'], timedelta(seconds=expiration), json.dumps(product))
+async def retrieve_product(product_id: int) -> dict | None:
+    """Get a fresh product by ID (None if it is not cached or is stale)."""
+    return (await retrieve_products([product_id])).get(product_id)
 
-def retrieve_product(product_id: int) -> bool:
-    """Get product by ID."""
-    return json.loads(redis_client.get(product_id)) if redis_client.exists(product_id) == 1 else None
+async def listen_product_invalidations():
+    """Tarea en segundo plano que descarta de la caché local los productos modificados por otros workers."""
+    while True:
+        pubsub = redis_client.pubsub()
+        try:
+            await pubsub.subscribe(PRODUCT_INVALIDATION_CHANNEL)
+            async for message in pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                data = json.loads(message["data"])
+                if data["origin"] == WORKER_ID:
+                    continue
+                for product_id in data["ids"]:
+                    local_cache.delete(product_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Sin avisos no se puede garantizar la coherencia: se vacía la caché local y se reintenta
+            logger.error(f"Error en la suscripción de invalidación de productos: {str(e)}")
+            local_cache.clear()
+            await asyncio.sleep(5)
+        finally:
+            await pubsub.aclose()
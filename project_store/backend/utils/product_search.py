@@ -0,0 +1,109 @@
+import math
+import re
+from bisect import bisect_left
+from collections import defaultdict
+
+# Parámetros de ranking BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+def tokenize(text: str) -> list[str]:
+    """Divide un texto en términos en minúsculas."""
+    return _TOKEN_PATTERN.findall(text.lower()) if text else []
+
+class ProductSearchIndex:
+    """Índice invertido en memoria sobre el título y la descripción de los productos.
+    Supports prefix matching on every query term, BM25 ranking and incremental updates.
+    """
+
+    def __init__(self):
+        # término -> {product_id: frecuencia del término en el producto}
+        self._postings: dict[str, dict[int, int]] = defaultdict(dict)
+        # product_id -> número de términos del producto
+        self._lengths: dict[int, int] = {}
+        # product_id -> términos distintos del producto (para poder eliminarlo sin recorrer el vocabulario)
+        self._document_terms: dict[int, list[str]] = {}
+        self._total_length = 0
+        # Vocabulario ordenado para la búsqueda por prefijo (se reconstruye bajo demanda)
+        self._vocabulary: list[str] = []
+        self._vocabulary_dirty = False
+
+    def __len__(self):
+        return len(self._lengths)
+
+    def add(self, product: dict):
+        """Indexa un producto (si ya estaba indexado se sustituye)."""
+        product_id = product["id"]
+        self.remove(product_id)
+        terms = tokenize(product.get("title", "")) + tokenize(product.get("description", ""))
+        frequencies: dict[str, int] = defaultdict(int)
+        for term in terms:
+            frequencies[term] += 1
+        for term, frequency in frequencies.items():
+            if term not in self._postings:
+                self._vocabulary_dirty = True
+            self._postings[term][product_id] = frequency
+        self._lengths[product_id] = len(terms)
+        self._document_terms[product_id] = list(frequencies)
+        self._total_length += len(terms)
+
+    def remove(self, product_id: int):
+        """Elimina un producto del índice."""
+        length = self._lengths.pop(product_id, None)
+        if length is None:
+            return
+        self._total_length -= length
+        for term in self._document_terms.pop(product_id):
+            del self._postings[term][product_id]
+            if not self._postings[term]:
+                del self._postings[term]
+                self._vocabulary_dirty = True
+
+    def update(self, changed: list[dict], removed_ids: list[int] = ()):
+        """Aplica los cambios de una sincronización del catálogo."""
+        for product_id in removed_ids:
+            self.remove(product_id)
+        for product in changed:
+            self.add(product)
+
+    def _expand(self, prefix: str) -> list[str]:
+        """Términos del vocabulario que empiezan por el prefijo."""
+        if self._vocabulary_dirty:
+            self._vocabulary = sorted(self._postings)
+            self._vocabulary_dirty = False
+        start = bisect_left(self._vocabulary, prefix)
+        terms = []
+        for term in self._vocabulary[start:]:
+            if not term.startswith(prefix):
+                break
+            terms.append(term)
+        return terms
+
+    def search(self, q: str) -> list[int]:
+        """Devuelve los IDs de los productos que contienen todos los términos de la consulta
+        (cada término se compara por prefijo), ordenados por relevancia BM25.
+        """
+        query_terms = tokenize(q)
+        if not query_terms or not self._lengths:
+            return []
+        documents = len(self._lengths)
+        average_length = self._total_length / documents
+        scores: dict[int, float] | None = None
+        for query_term in query_terms:
+            term_scores: dict[int, float] = defaultdict(float)
+            for term in self._expand(query_term):
+                postings = self._postings[term]
+                idf = math.log(1 + (documents - len(postings) + 0.5) / (len(postings) + 0.5))
+                for product_id, frequency in postings.items():
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[product_id] / average_length)
+                    term_scores[product_id] += idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+            # Todos los términos de la consulta deben aparecer en el producto
+            if scores is None:
+                scores = dict(term_scores)
+            else:
+                scores = {product_id: score + term_scores[product_id] for product_id, score in scores.items() if product_id in term_scores}
+            if not scores:
+                return []
+        return sorted(scores, key=lambda product_id: (-scores[product_id], product_id))